@@ -1,4 +1,5 @@
 #!/bin/bash
 pip install -r requirements.txt
 python manage.py collectstatic --no-input
-python manage.py migrate
\ No newline at end of file
+python manage.py migrate
+python -m chatbot_app.build_personas
\ No newline at end of file
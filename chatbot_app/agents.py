@@ -3,151 +3,349 @@ Defines the specialized agents (workers) for the multi-agent system.
 Each agent has a specific persona, instructions, and set of capabilities.
 """
 
-from typing import Dict, Any, List
-from enum import Enum
-from dataclasses import dataclass
+import functools
+import hashlib
+import mmap
+import re
+import sys
+import textwrap
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Callable, Dict, Any, Final, List, Optional, Tuple
+from enum import IntEnum
+from dataclasses import dataclass, field
 
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
 
-class AgentType(Enum):
-    ORCHESTRATOR = "orchestrator"
-    GENERALIST = "generalist"
-    CODER = "coder"
-    RESEARCHER = "researcher"
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
+try:
+    import blake3
+except ImportError:
+    blake3 = None
 
-@dataclass
+
+class AgentType(IntEnum):
+    # Worker values double as indexes into the persona registry.
+    GENERALIST = 0
+    CODER = 1
+    RESEARCHER = 2
+    REVIEWER = 3
+    ORCHESTRATOR = 4
+
+    @property
+    def key(self) -> str:
+        """Name used by the orchestrator's JSON output, e.g. 'coder'."""
+        return self.name.lower()
+
+
+@dataclass(frozen=True, slots=True)
 class AgentPersona:
     name: str
     role: str
     description: str
-    system_prompt: str
+    # Identity + capabilities. Rarely edited, so it is cached on its own.
+    static_core: str
+    # Output/format rules that tend to drift (viz, suggestions, ...).
+    volatile_rules: str
     response_style: str
+    # Per-request data (dates, user names, ...). Never part of system_prompt so
+    # the static prefix stays byte-identical and provider prompt caches hit.
+    dynamic_context: str = ""
+    # Tokenized system prompt, computed once when the persona is defined.
+    # Derived from the prompt, so excluded from eq/hash (lists are unhashable).
+    tokens: List[int] = field(
+        default_factory=list, init=False, repr=False, compare=False
+    )
+    n_tokens: int = field(default=0, init=False, compare=False)
+    # Content hash of system_prompt; versions cache keys for this persona.
+    digest: str = field(default="", init=False, repr=False, compare=False)
 
+    def __post_init__(self):
+        # Frozen dataclass: derived fields have to bypass __setattr__.
+        for name in ("static_core", "volatile_rules", "dynamic_context"):
+            object.__setattr__(self, name, normalize_prompt(getattr(self, name)))
+        tokens = encode_prompt(self.system_prompt)
+        object.__setattr__(self, "tokens", tokens)
+        object.__setattr__(self, "n_tokens", count_tokens(self.system_prompt, tokens))
+        object.__setattr__(self, "digest", prompt_digest(self.system_prompt))
 
-# 1. The Generalist (Default Chatbot)
-GENERALIST_AGENT = AgentPersona(
-    name="Generalist",
-    role="Helpful Assistant",
-    description="Handles general queries, small talk, and basic questions.",
-    system_prompt="""You are a friendly, helpful AI assistant. 
-    Your goal is to provide clear, concise, and accurate information.
-    
-    You have access to the following tools:
-    - Calculator: TOOL: calculator(expression)
-    - Web Search: TOOL: web_search(query)
-    
-    If the user asks about current events, weather, or real-time factual info, use the Web Search tool.
-    Example: "What is the capital of France?" -> Paris (no tool needed)
-    Example: "Who won the Super Bowl this year?" -> TOOL: web_search(Super Bowl winner 2024)
-    
-    RELEVANT CONTEXT & UI:
-    - DATA VISUALIZATION RULES:
-    - You generally should avoid charts unless explicitly asked or if data is very complex.
-    - If you DO generate a chart, you MUST have reclaimed real data from a tool (Web Search) first.
-    - NEVER invent or hallucinate data for a chart.
-    - Chart format:
-      ```json-chart
-      {"type": "bar", "data": {"Label1": 10, "Label2": 20}, "title": "Chart Title"}
-      ```
-    - ALWAYS finish every response with exactly one suggestions block:
-      ```json-suggestions
-      ["Follow up question 1", "Follow up question 2"]
-      ```
-    
-    Keep responses conversational. Close with suggestions.""",
-    response_style="Conversational, friendly, concise.",
+    @property
+    def system_prompt(self) -> str:
+        return "\n\n".join(
+            part for part in (self.static_core, self.volatile_rules) if part
+        )
+
+    def to_messages(self, model_id: str) -> List[Dict[str, Any]]:
+        """
+        Serialize the system prompt into provider-specific message(s).
+        Anthropic models need explicit cache breakpoints; OpenAI, Gemini,
+        Groq etc. cache long prefixes automatically.
+        """
+        if is_anthropic_model(model_id):
+            return [
+                {
+                    "role": "system",
+                    "content": build_anthropic_system(
+                        [
+                            {"text": self.static_core, "cache_control": True},
+                            {"text": self.volatile_rules, "cache_control": True},
+                        ]
+                    ),
+                }
+            ]
+        return [{"role": "system", "content": self.system_prompt}]
+
+
+_BLANK_RUNS = re.compile(r"\n{3,}")
+
+
+def normalize_prompt(text: str) -> str:
+    """
+    Dedent, strip trailing whitespace from every line and collapse runs of
+    blank lines. Deterministic, so the result stays a stable cacheable prefix.
+    """
+    lines = textwrap.dedent(text).splitlines()
+    return _BLANK_RUNS.sub("\n\n", "\n".join(line.rstrip() for line in lines)).strip()
+
+
+def prompt_digest(text: str) -> str:
+    """16 hex chars identifying a prompt; blake3 when installed, else blake2b."""
+    data = text.encode()
+    if blake3 is not None:
+        return blake3.blake3(data).hexdigest()[:16]
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+@functools.lru_cache(maxsize=1)
+def _get_encoding():
+    """cl100k_base encoding, or None when tiktoken is unavailable."""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # First use downloads the BPE file; don't fail imports when offline.
+        return None
+
+
+def encode_prompt(text: str) -> List[int]:
+    encoding = _get_encoding()
+    if encoding is None:
+        return []
+    return encoding.encode(text)
+
+
+def count_tokens(text: str, tokens: List[int] = None) -> int:
+    """Exact count when tiktoken is available, ~4 chars/token otherwise."""
+    if tokens:
+        return len(tokens)
+    if _get_encoding() is not None:
+        return len(encode_prompt(text))
+    return len(text) // 4
+
+
+# Anthropic allows at most 4 cache breakpoints per request.
+MAX_CACHE_BREAKPOINTS = 4
+
+
+def is_anthropic_model(model_id: str) -> bool:
+    """True for Claude model ids, including OpenRouter's 'anthropic/...' form."""
+    model_id = (model_id or "").lower()
+    return "anthropic" in model_id or "claude" in model_id
+
+
+def build_anthropic_system(blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Turn [{"text": ..., "cache_control": bool}, ...] into Anthropic text blocks.
+    Static blocks must come first: a breakpoint after the static core keeps
+    its cache entry valid when only the later (volatile) blocks change.
+    """
+    content = []
+    breakpoints = 0
+    for block in blocks:
+        if not block.get("text"):
+            continue
+        part = {"type": "text", "text": block["text"]}
+        if block.get("cache_control") and breakpoints < MAX_CACHE_BREAKPOINTS:
+            part["cache_control"] = {"type": "ephemeral", "ttl": "1h"}
+            breakpoints += 1
+        content.append(part)
+    return content
+
+
+def build_prompt(
+    identity: str = "",
+    tools: List[str] = (),
+    rules: List[str] = (),
+    examples: List[str] = (),
+) -> str:
+    """
+    Assemble a system prompt in a fixed section order:
+    [identity] -> [tool list] -> [output rules] -> [examples].
+    The output is deterministic so the prompt is a stable cacheable prefix.
+    """
+    sections = []
+    if identity:
+        sections.append(identity.strip())
+    if tools:
+        sections.append(
+            "You have access to the following tools:\n"
+            + "\n".join(f"- {tool}" for tool in tools)
+        )
+    if rules:
+        sections.append("\n".join(f"- {rule}" for rule in rules))
+    if examples:
+        sections.append("\n".join(f"Example: {example}" for example in examples))
+    return "\n\n".join(sections)
+
+
+# Shared prompt fragments. Every persona reuses the exact same bytes, and tool
+# specs are always listed in the same order (calculator, web, url).
+TOOL_SPEC_CALC = "Calculator: TOOL: calculator(expression)"
+TOOL_SPEC_WEB = "Web Search: TOOL: web_search(query)"
+TOOL_SPEC_URL = "URL Reader: TOOL: read_url(url)"
+
+VIZ_RULES = (
+    "DATA VISUALIZATION RULES:",
+    "You generally should avoid charts unless explicitly asked or if data is very complex.",
+    "If you DO generate a chart, you MUST have reclaimed real data from a tool (Web Search) first.",
+    "NEVER invent or hallucinate data for a chart.",
+    """Chart format:
+```json-chart
+{"type": "bar", "data": {"Label1": 10, "Label2": 20}, "title": "Chart Title"}
+```""",
 )
 
+SUGGESTIONS_FOOTER = """ALWAYS finish every response with exactly one suggestions block:
+```json-suggestions
+["Follow up question 1", "Follow up question 2"]
+```"""
+
+
+# 1. The Generalist (Default Chatbot)
+def _build_generalist() -> AgentPersona:
+    return AgentPersona(
+        name="Generalist",
+        role="Helpful Assistant",
+        description="Handles general queries, small talk, and basic questions.",
+        static_core=build_prompt(
+            identity="""You are a friendly, helpful AI assistant.
+Your goal is to provide clear, concise, and accurate information.""",
+            tools=[TOOL_SPEC_CALC, TOOL_SPEC_WEB],
+        ),
+        volatile_rules=build_prompt(
+            rules=[
+                "If the user asks about current events, weather, or real-time factual info, use the Web Search tool.",
+                "Keep responses conversational. Close with suggestions.",
+                *VIZ_RULES,
+                SUGGESTIONS_FOOTER,
+            ],
+            examples=[
+                '"What is the capital of France?" -> Paris (no tool needed)',
+                '"Who won the Super Bowl this year?" -> TOOL: web_search(Super Bowl winner 2024)',
+            ],
+        ),
+        response_style="Conversational, friendly, concise.",
+    )
+
+
 # 2. The Coder (Software Engineer)
-CODER_AGENT = AgentPersona(
-    name="Coder",
-    role="Senior Software Engineer",
-    description="Specializes in writing, debugging, and explaining code.",
-    system_prompt="""You are an expert Senior Software Engineer.
-    Your capabilities include:
-    - Writing clean, efficient, and well-documented code in Python, JavaScript, SQL, and more.
-    - Debugging complex errors and explaining the root cause.
-    - Suggesting architectural improvements and best practices.
-    Your goal is to write clean, efficient, and well-documented code.
-    Always use markdown code blocks for your code.
-    Explain your logic briefly before or after the code.
-    
-    You have access to the following tools:
-    - Calculator: TOOL: calculator(expression)
-    - Web Search: TOOL: web_search(query)
-    - URL Reader: TOOL: read_url(url)
-    
-    Use Web Search if you need to find the latest documentation or library versions.
-    Use URL Reader if the user provides a documentation link.
-    
-    If the user asks for code, provide code.
-    - Anticipate edge cases and potential errors.
-    - If the user asks for a specific framework (e.g., Django, React), adhere to its best practices.
-    - ALWAYS end with: ```json-suggestions ["Debug this", "Explain architecture"] ```""",
-    response_style="Technical, precise, structured.",
-)
+def _build_coder() -> AgentPersona:
+    return AgentPersona(
+        name="Coder",
+        role="Senior Software Engineer",
+        description="Specializes in writing, debugging, and explaining code.",
+        static_core=build_prompt(
+            identity="""You are an expert Senior Software Engineer.
+Your capabilities include:
+- Writing clean, efficient, and well-documented code in Python, JavaScript, SQL, and more.
+- Debugging complex errors and explaining the root cause.
+- Suggesting architectural improvements and best practices.
+Your goal is to write clean, efficient, and well-documented code.""",
+            tools=[TOOL_SPEC_CALC, TOOL_SPEC_WEB, TOOL_SPEC_URL],
+        ),
+        volatile_rules=build_prompt(
+            rules=[
+                "Use Web Search if you need to find the latest documentation or library versions.",
+                "Use URL Reader if the user provides a documentation link.",
+                "If the user asks for code, provide code.",
+                "Always use markdown code blocks for your code.",
+                "Explain your logic briefly before or after the code.",
+                "Anticipate edge cases and potential errors.",
+                "If the user asks for a specific framework (e.g., Django, React), adhere to its best practices.",
+                SUGGESTIONS_FOOTER,
+            ],
+        ),
+        response_style="Technical, precise, structured.",
+    )
+
 
 # 3. The Researcher (Data Analyst / Fact Checker)
-RESEARCHER_AGENT = AgentPersona(
-    name="Researcher",
-    role="Deep Research Analyst",
-    description="Focuses on gathering detailed information, analyzing data, and synthesizing complex topics.",
-    system_prompt="""You are a diligent Research Analyst.
-    Your goal is to provide comprehensive, well-structured, and factual responses.
-    
-    You have access to the following tools:
-    - Web Search: TOOL: web_search(query)
-    - URL Reader: TOOL: read_url(url)
-    - Calculator: TOOL: calculator(expression)
-    
-    ALWAYS use Web Search for questions about current events, market data, or recent history.
-    If the user provides a link, use URL Reader to read it before answering.
-    
-    - Break down complex topics into understandable parts.
-    - Citations (if simulated) should be clear.
-    - Analyze pros and cons, history, and context.
-    - Avoid helping with illegal or unethical requests.
-    - DATA VISUALIZATION RULES:
-    - You generally should avoid charts unless explicitly asked or if data is very complex.
-    - If you DO generate a chart, you MUST have reclaimed real data from a tool (Web Search) first.
-    - NEVER invent or hallucinate data for a chart.
-    - Chart format:
-      ```json-chart
-      {"type": "line", "data": {"Point 1": 100, "Point 2": 150}, "title": "Data Breakdown"}
-      ```
-    - ALWAYS end with: ```json-suggestions ["Deep dive into X", "Compare with Y"] ```
-    - Use bullet points and headers. Organization is key.""",
-    response_style="Detailed, objective, analytical.",
-)
+def _build_researcher() -> AgentPersona:
+    return AgentPersona(
+        name="Researcher",
+        role="Deep Research Analyst",
+        description="Focuses on gathering detailed information, analyzing data, and synthesizing complex topics.",
+        static_core=build_prompt(
+            identity="""You are a diligent Research Analyst.
+Your goal is to provide comprehensive, well-structured, and factual responses.""",
+            tools=[TOOL_SPEC_CALC, TOOL_SPEC_WEB, TOOL_SPEC_URL],
+        ),
+        volatile_rules=build_prompt(
+            rules=[
+                "ALWAYS use Web Search for questions about current events, market data, or recent history.",
+                "If the user provides a link, use URL Reader to read it before answering.",
+                "Break down complex topics into understandable parts.",
+                "Citations (if simulated) should be clear.",
+                "Analyze pros and cons, history, and context.",
+                "Avoid helping with illegal or unethical requests.",
+                "Use bullet points and headers. Organization is key.",
+                *VIZ_RULES,
+                SUGGESTIONS_FOOTER,
+            ],
+        ),
+        response_style="Detailed, objective, analytical.",
+    )
+
 
 # 4. The Reviewer (QA / Code Reviewer)
-REVIEWER_AGENT = AgentPersona(
-    name="Reviewer",
-    role="QA Engineer",
-    description="Validates code, checks for security issues, and ensures quality.",
-    system_prompt="""You are a meticulous QA Engineer and Code Reviewer.
-    Your goal is to catch bugs, security vulnerabilities, and logic errors.
-    
-    You have access to the following tools:
-    - Web Search: TOOL: web_search(query)
-    - URL Reader: TOOL: read_url(url)
-    
-    When reviewing code:
-    - Check for syntax errors.
-    - Check for security flaws (SQL injection, XSS).
-    - Suggest performance improvements.
-    - If the code is good, simply state "Code looks good."
-    
-    When reviewing facts:
-    - Verify claims using Web Search.
-    - Point out inconsistencies.""",
-    response_style="Critical, constructive, thorough.",
-)
+def _build_reviewer() -> AgentPersona:
+    return AgentPersona(
+        name="Reviewer",
+        role="QA Engineer",
+        description="Validates code, checks for security issues, and ensures quality.",
+        static_core=build_prompt(
+            identity="""You are a meticulous QA Engineer and Code Reviewer.
+Your goal is to catch bugs, security vulnerabilities, and logic errors.""",
+            tools=[TOOL_SPEC_WEB, TOOL_SPEC_URL],
+        ),
+        volatile_rules=build_prompt(
+            rules=[
+                "When reviewing code: check for syntax errors.",
+                "When reviewing code: check for security flaws (SQL injection, XSS).",
+                "When reviewing code: suggest performance improvements.",
+                'If the code is good, simply state "Code looks good."',
+                "When reviewing facts: verify claims using Web Search.",
+                "When reviewing facts: point out inconsistencies.",
+            ],
+        ),
+        response_style="Critical, constructive, thorough.",
+    )
+
 
 # 5. The Orchestrator (Router)
 # Note: The Orchestrator's prompt is used to DECIDE which agent to call, not to generate the final answer.
-ORCHESTRATOR_PROMPT = """You are the Lead Orchestrator of an AI agent team.
-Your ONLY job is to analyze the user's input and decide which expert agent is best suited to handle it.
+_ROUTING_INSTRUCTIONS = normalize_prompt(
+    """You are the Lead Orchestrator of an AI agent team.
+Your ONLY job is to pick the expert agent best suited to the user's input.
 
 Available Agents:
 1. 'coder': For programming questions, debugging, code snippets, software architecture, technical errors.
@@ -155,16 +353,263 @@ Available Agents:
 3. 'reviewer': For double-checking code, verifying facts, or security audits.
 4. 'generalist': For casual conversation, greetings, simple questions, or anything that doesn't fit the others.
 
-Output ONLY the agent name in JSON format: {"agent": "agent_name", "reason": "brief reason"}
-Example 1: Input: "How do I fix this Django migration error?" -> {"agent": "coder", "reason": "Debugging a Django error"}
-Example 2: Input: "Tell me about the history of the Roman Empire." -> {"agent": "researcher", "reason": "Historical analysis"}
-Example 3: Input: "Can you check this code for bugs?" -> {"agent": "reviewer", "reason": "Code review request"}
-Example 4: Input: "Hello, how are you?" -> {"agent": "generalist", "reason": "Casual greeting"}
+examples: coder="fix django error", researcher="roman empire history", reviewer="check my code", generalist="hello"
+"""
+)
+ORCHESTRATOR_PROMPT = (
+    f"{_ROUTING_INSTRUCTIONS}\nRespond in JSON with the keys agent (the agent name) "
+    "and reason (a brief reason)."
+)
+
+# Structured output for the routing call; the schema enforces the agent names,
+# so the prompt only needs a one-line hint per agent instead of worked examples.
+ROUTER_RESPONSE_FORMAT: Final[Dict[str, Any]] = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "agent_route",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "agent": {
+                    "type": "string",
+                    "enum": ["coder", "researcher", "reviewer", "generalist"],
+                },
+                "reason": {"type": "string", "maxLength": 80},
+            },
+            "required": ["agent", "reason"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# One pre-agent call that routes the message and extracts what graph memory
+# needs, instead of separate routing and entity-extraction calls.
+COMBINED_PREFLIGHT_PROMPT = normalize_prompt(
+    f"""{_ROUTING_INSTRUCTIONS}
+
+Also extract, for knowledge-graph lookups:
+- message_entities: the 3 most important entities (nouns/subjects/objects) in the input
+- triplets: factual relationships stated in the input as [entity1, relation, entity2], entities 1-3 words
+Respond in JSON with the keys agent, reason, message_entities and triplets.
 """
+)
 
-AGENTS: Dict[str, AgentPersona] = {
-    AgentType.GENERALIST.value: GENERALIST_AGENT,
-    AgentType.CODER.value: CODER_AGENT,
-    AgentType.RESEARCHER.value: RESEARCHER_AGENT,
-    "reviewer": REVIEWER_AGENT,
+_ENTITY_LIST_SCHEMA: Final[Dict[str, Any]] = {
+    "type": "array",
+    "items": {"type": "string"},
+    "maxItems": 3,
 }
+
+PREFLIGHT_RESPONSE_FORMAT: Final[Dict[str, Any]] = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "agent_preflight",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                **ROUTER_RESPONSE_FORMAT["json_schema"]["schema"]["properties"],
+                "message_entities": _ENTITY_LIST_SCHEMA,
+                "triplets": {
+                    "type": "array",
+                    "items": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "minItems": 3,
+                        "maxItems": 3,
+                    },
+                },
+            },
+            "required": ["agent", "reason", "message_entities", "triplets"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# Prebuilt persona blob, written by `python -m chatbot_app.build_personas`.
+PERSONAS_BLOB = Path(__file__).with_name("personas.mp")
+_PERSONA_FIELDS = (
+    "name",
+    "role",
+    "description",
+    "static_core",
+    "volatile_rules",
+    "response_style",
+    "dynamic_context",
+)
+
+
+def dump_personas(personas: Dict[str, AgentPersona], path: Path = PERSONAS_BLOB):
+    """Serialize personas (init fields only) to a msgpack blob."""
+    payload = {
+        key: {name: getattr(persona, name) for name in _PERSONA_FIELDS}
+        for key, persona in personas.items()
+    }
+    with open(path, "wb") as f:
+        f.write(msgpack.packb(payload, use_bin_type=True))
+
+
+def load_persona_fields(path: Path = PERSONAS_BLOB) -> Dict[str, Dict[str, str]]:
+    """
+    Read persona init fields from the blob via a read-only mmap.
+    Returns {} when msgpack or the blob is missing, or when the blob is
+    older than this module (i.e. the persona source was edited since).
+    """
+    if msgpack is None:
+        return {}
+    try:
+        if path.stat().st_mtime < Path(__file__).stat().st_mtime:
+            return {}
+        with open(path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                return msgpack.unpackb(buf, raw=False)
+    except (OSError, ValueError, TypeError):
+        return {}
+
+
+_AGENT_INDEX: Final[Dict[str, AgentType]] = {
+    sys.intern(agent_type.key): agent_type
+    for agent_type in AgentType
+    if agent_type is not AgentType.ORCHESTRATOR
+}
+
+# Persona factories, in AgentType order. Nothing is built until first use.
+_LAZY: Final[Dict[str, Callable[[], AgentPersona]]] = {
+    AgentType.GENERALIST.key: _build_generalist,
+    AgentType.CODER.key: _build_coder,
+    AgentType.RESEARCHER.key: _build_researcher,
+    AgentType.REVIEWER.key: _build_reviewer,
+}
+
+ORCHESTRATOR_TOKENS: List[int] = encode_prompt(ORCHESTRATOR_PROMPT)
+
+# Token ids per prompt, filled in as personas are materialized.
+AGENT_TOKEN_CACHE: Dict[str, List[int]] = {
+    AgentType.ORCHESTRATOR.key: ORCHESTRATOR_TOKENS,
+}
+
+
+@functools.lru_cache(maxsize=1)
+def _frozen_persona_fields() -> Dict[str, Dict[str, str]]:
+    return load_persona_fields()
+
+
+class _AgentRegistry(Mapping):
+    """
+    Read-only name -> persona mapping that builds each persona on first
+    access (from the prebuilt blob when present, else its factory).
+    """
+
+    def __init__(self):
+        self._by_idx: List[Optional[AgentPersona]] = [None] * len(_LAZY)
+        self._lock = threading.Lock()
+
+    def by_index(self, agent_type: AgentType) -> AgentPersona:
+        persona = self._by_idx[agent_type]
+        if persona is None:
+            with self._lock:
+                persona = self._by_idx[agent_type]
+                if persona is None:
+                    key = agent_type.key
+                    fields = _frozen_persona_fields().get(key)
+                    persona = AgentPersona(**fields) if fields else _LAZY[key]()
+                    AGENT_TOKEN_CACHE[key] = persona.tokens
+                    self._by_idx[agent_type] = persona
+        return persona
+
+    def __getitem__(self, name: str) -> AgentPersona:
+        return self.by_index(_AGENT_INDEX[name])
+
+    def __iter__(self):
+        return iter(_LAZY)
+
+    def __len__(self) -> int:
+        return len(_LAZY)
+
+
+AGENTS: Mapping[str, AgentPersona] = _AgentRegistry()
+
+_LAZY_ATTRS: Final[Dict[str, AgentType]] = {
+    "GENERALIST_AGENT": AgentType.GENERALIST,
+    "CODER_AGENT": AgentType.CODER,
+    "RESEARCHER_AGENT": AgentType.RESEARCHER,
+    "REVIEWER_AGENT": AgentType.REVIEWER,
+}
+
+
+def __getattr__(name: str):
+    # Keeps `from .agents import CODER_AGENT` / AGENTS_BY_IDX working (PEP 562).
+    if name in _LAZY_ATTRS:
+        return AGENTS.by_index(_LAZY_ATTRS[name])
+    if name == "AGENTS_BY_IDX":
+        return tuple(AGENTS.by_index(_AGENT_INDEX[key]) for key in _LAZY)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def resolve(name: str) -> AgentPersona:
+    """Map an orchestrator agent name to its persona, defaulting to the generalist."""
+    # Names come from freshly parsed LLM output; interning them lets the dict
+    # lookup match the interned keys by identity instead of comparing bytes.
+    if isinstance(name, str):
+        name = sys.intern(name)
+    return AGENTS.by_index(_AGENT_INDEX.get(name, AgentType.GENERALIST))
+
+
+@functools.lru_cache(maxsize=None)
+def tokenize_persona(name: str) -> Tuple[int, ...]:
+    """Token ids for a persona's system prompt (or the orchestrator prompt)."""
+    if name in AGENT_TOKEN_CACHE:
+        return tuple(AGENT_TOKEN_CACHE[name])
+    return tuple(AGENTS[name].tokens)
+
+
+# Keyword router for the obvious cases, so they skip the orchestrator LLM call.
+_FAST_ROUTES: Final[Tuple[Tuple[str, "re.Pattern[str]"], ...]] = (
+    (
+        "coder",
+        re.compile(
+            r"\b(debug\w*|stack ?trace|traceback|exception|django|react|python|"
+            r"javascript|sql|bug|compile|syntax error)\b",
+            re.I,
+        ),
+    ),
+    (
+        "researcher",
+        re.compile(r"\b(history|compare|comparison|analy[sz]e|pros and cons)\b", re.I),
+    ),
+    (
+        "reviewer",
+        re.compile(r"\b(review|audit|security|vulnerab\w*|double[- ]check)\b", re.I),
+    ),
+    (
+        "generalist",
+        re.compile(
+            r"^\s*(hi|hello|hey|thanks|thank you|good (morning|afternoon|evening)|"
+            r"how are you)\b[\s\W]*$",
+            re.I,
+        ),
+    ),
+)
+
+
+def fast_route(text: str) -> Optional[str]:
+    """
+    Pick an agent without the LLM when exactly one keyword group matches.
+    Returns None for ambiguous or unmatched input; callers then fall back
+    to ORCHESTRATOR_PROMPT.
+    """
+    matches = [name for name, pattern in _FAST_ROUTES if pattern.search(text)]
+    return matches[0] if len(matches) == 1 else None
+
+
+def classify_complexity(text: str) -> str:
+    """
+    Cheap heuristic for how much model a message needs: "trivial" (short,
+    single line, no code), "complex" (code or long input) or "standard".
+    """
+    if "```" in text or len(text) > 1000:
+        return "complex"
+    if len(text) < 80 and "\n" not in text:
+        return "trivial"
+    return "standard"
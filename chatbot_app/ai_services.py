@@ -3,65 +3,293 @@ Abstracted AI service layer for multiple providers.
 Supports Gemini, OpenRouter, and easy switching between providers.
 """
 
-import time
+import asyncio
+import atexit
 import logging
+import random
+import time
+import weakref
 import httpx
 import os
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List, Union
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Any,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 from django.conf import settings
 from google import genai
 from google.genai import errors
+from .json_utils import (
+    dumps as json_dumps,
+    extract_first_json_object,
+    loads as json_loads,
+)
 from .observability import observability
 
+try:
+    import h2  # noqa: F401  (httpx needs it for HTTP/2)
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Request bodies are pre-serialized (orjson when available), so the
+# content type is set per request rather than on the pooled clients.
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing service for a while.
+    Opens after `fail_threshold` consecutive failures; once `reset_timeout`
+    seconds have passed, one probe call is let through (half-open, bounded
+    by `probe_timeout`) and its outcome closes or re-opens the breaker.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        fail_threshold: int = 3,
+        reset_timeout: float = 30.0,
+        probe_timeout: float = 5.0,
+    ):
+        self.fail_threshold = fail_threshold
+        self.reset_timeout = reset_timeout
+        self.probe_timeout = probe_timeout
+        self.state = self.CLOSED
+        self.failure_count = 0
+        self.opened_at = 0.0
+
+    def is_open(self) -> bool:
+        """True while calls should skip this service."""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return True
+            self.state = self.HALF_OPEN
+            return False
+        return False
+
+    @property
+    def half_open(self) -> bool:
+        return self.state == self.HALF_OPEN
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failure_count = 0
+
+    def record_failure(self):
+        self.failure_count += 1
+        if self.half_open or self.failure_count >= self.fail_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
 
 class AIServiceBase(ABC):
     """Base class for all AI services."""
 
+    base_url: str = ""
+
     def __init__(self, api_key: str, **kwargs):
         self.api_key = api_key
         self.timeout = kwargs.get("timeout", 30.0)
         self.max_retries = kwargs.get("max_retries", 3)
         self.retry_delay = kwargs.get("retry_delay", 1.0)
+        self.temperature = kwargs.get("temperature", 0.7)
+        self.breaker = CircuitBreaker()
+        # One keep-alive AsyncClient per event loop: httpx clients must not be
+        # shared across loops, and views may run each request in a new loop.
+        self._clients = weakref.WeakKeyDictionary()
+
+    def _default_headers(self) -> Dict[str, str]:
+        # No Content-Type here: httpx sets it per request (JSON or multipart).
+        return {"Authorization": f"Bearer {self.api_key}"}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the pooled client bound to the running event loop."""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(max_keepalive_connections=20, keepalive_expiry=30),
+                headers=self._default_headers(),
+            )
+            self._clients[loop] = client
+        return client
+
+    async def aclose(self):
+        """Close the pooled client bound to the running event loop."""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def close_all(self):
+        """Close clients whose loops are idle (e.g. at interpreter exit)."""
+        for loop, client in list(self._clients.items()):
+            if not loop.is_closed() and not loop.is_running():
+                loop.run_until_complete(client.aclose())
+        self._clients.clear()
+
+    def _temperature(self, temperature: float = None) -> float:
+        return self.temperature if temperature is None else temperature
 
     @abstractmethod
     async def generate_response(
         self,
         message: Union[str, List[Dict[str, Any]]],
         tools: list[Dict[str, Any]] = None,
+        response_format: Dict[str, Any] = None,
+        temperature: float = None,
     ) -> Dict[str, Any]:
         """
         Generate AI response.
+        `response_format` is an OpenAI-style structured output spec, e.g.
+        {"type": "json_schema", "json_schema": {...}}; services that cannot
+        enforce a schema downgrade it to plain JSON mode.
+        `temperature` overrides the service default when given.
         Returns a dict with:
         - 'content': str (The text response)
         - 'tool_calls': list (Optional tool calls)
         """
         pass
 
+    async def generate_response_stream(
+        self,
+        message: Union[str, List[Dict[str, Any]]],
+        tools: list[Dict[str, Any]] = None,
+        response_format: Dict[str, Any] = None,
+        temperature: float = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream an AI response.
+        Yields {"delta": str} events as text arrives, then one final
+        {"response": ...} event in the shape returned by generate_response.
+        Services without native streaming yield the whole answer at once.
+        """
+        response = await self.generate_response(
+            message,
+            tools=tools,
+            response_format=response_format,
+            temperature=temperature,
+        )
+        if response.get("content"):
+            yield {"delta": response["content"]}
+        yield {"response": response}
+
     @abstractmethod
     def validate_api_key(self) -> bool:
         """Validate the API key is working."""
         pass
 
-    def _retry_with_backoff(self, func, *args, **kwargs):
-        """Implement exponential backoff retry logic."""
+    async def _stream_chat_completions(
+        self, data: Dict[str, Any]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream an OpenAI-compatible /chat/completions request (SSE)."""
+        content = []
+        # Tool calls arrive as fragments keyed by their index
+        tool_calls: Dict[int, Dict[str, Any]] = {}
+
+        async with self._get_client().stream(
+            "POST",
+            "/chat/completions",
+            content=json_dumps({**data, "stream": True}),
+            headers=JSON_HEADERS,
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                payload = line[6:]
+                if payload.strip() == "[DONE]":
+                    break
+                choices = json_loads(payload).get("choices")
+                if not choices:
+                    continue
+                delta = choices[0].get("delta") or {}
+
+                if delta.get("content"):
+                    content.append(delta["content"])
+                    yield {"delta": delta["content"]}
+
+                for fragment in delta.get("tool_calls") or []:
+                    index = fragment.get("index", 0)
+                    call = tool_calls.setdefault(
+                        index,
+                        {
+                            "id": f"call_{index}",
+                            "type": "function",
+                            "function": {"name": "", "arguments": ""},
+                        },
+                    )
+                    if fragment.get("id"):
+                        call["id"] = fragment["id"]
+                    function = fragment.get("function") or {}
+                    call["function"]["name"] += function.get("name") or ""
+                    call["function"]["arguments"] += function.get("arguments") or ""
+
+        yield {
+            "response": {
+                "content": "".join(content),
+                "tool_calls": [tool_calls[i] for i in sorted(tool_calls)] or None,
+            }
+        }
+
+    @staticmethod
+    def _flatten_content(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Collapse Anthropic-style content blocks into plain strings for
+        providers that only accept text content (e.g. after a fallback).
+        """
+        flattened = []
+        for msg in messages:
+            content = msg.get("content")
+            if isinstance(content, list):
+                msg = {
+                    **msg,
+                    "content": "".join(
+                        block.get("text", "")
+                        for block in content
+                        if isinstance(block, dict)
+                    ),
+                }
+            flattened.append(msg)
+        return flattened
+
+    async def _retry_with_backoff_async(self, coro_func, *args, **kwargs):
+        """
+        Exponential backoff retry logic for coroutine functions.
+        Sleeps with asyncio.sleep so other requests on the loop keep running.
+        """
         for attempt in range(self.max_retries):
             try:
-                return func(*args, **kwargs)
+                return await coro_func(*args, **kwargs)
             except (httpx.ConnectTimeout, httpx.ReadTimeout, httpx.NetworkError) as e:
                 if attempt == self.max_retries - 1:
                     raise e
 
-                delay = self.retry_delay * (2**attempt)  # Exponential backoff
+                # Exponential backoff with up to 25% jitter against retry storms
+                delay = self.retry_delay * (2**attempt)
+                delay *= 1 + random.random() * 0.25
                 logger.warning(
-                    f"Attempt {attempt + 1} failed, retrying in {delay}s: {str(e)}"
+                    f"Attempt {attempt + 1} failed, retrying in {delay:.2f}s: {str(e)}"
                 )
-                time.sleep(delay)
-            except Exception as e:
-                # Don't retry on non-timeout errors
-                raise e
+                await asyncio.sleep(delay)
 
 
 class GeminiService(AIServiceBase):
@@ -78,19 +306,23 @@ class GeminiService(AIServiceBase):
         self,
         message: Union[str, List[Dict[str, Any]]],
         tools: list[Dict[str, Any]] = None,
+        response_format: Dict[str, Any] = None,
+        temperature: float = None,
     ) -> Dict[str, Any]:
         """Generate response using Gemini API."""
 
-        def _call_api():
+        async def _call_api():
             # Note: Gemini native tools implementation omitted for brevity in this phase
             # fallback to text only for now if tools provided, or implement later
-            response = self.client.models.generate_content(
-                model=self.model, contents=message
+            response = await self.client.aio.models.generate_content(
+                model=self.model,
+                contents=message,
+                config=self._config(response_format, temperature),
             )
             return {"content": response.text, "tool_calls": None}
 
         try:
-            return self._retry_with_backoff(_call_api)
+            return await self._retry_with_backoff_async(_call_api)
         except (httpx.ConnectTimeout, httpx.ReadTimeout) as e:
             logger.error(f"Gemini API timeout: {str(e)}")
             raise
@@ -101,6 +333,33 @@ class GeminiService(AIServiceBase):
             logger.error(f"Gemini unexpected error: {str(e)}")
             raise
 
+    async def generate_response_stream(
+        self,
+        message: Union[str, List[Dict[str, Any]]],
+        tools: list[Dict[str, Any]] = None,
+        response_format: Dict[str, Any] = None,
+        temperature: float = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a response using Gemini API (text only, like generate_response)."""
+        content = []
+        async for chunk in await self.client.aio.models.generate_content_stream(
+            model=self.model,
+            contents=message,
+            config=self._config(response_format, temperature),
+        ):
+            if chunk.text:
+                content.append(chunk.text)
+                yield {"delta": chunk.text}
+        yield {"response": {"content": "".join(content), "tool_calls": None}}
+
+    def _config(
+        self, response_format: Dict[str, Any] = None, temperature: float = None
+    ) -> Dict[str, Any]:
+        config = {"temperature": self._temperature(temperature)}
+        if response_format:
+            config["response_mime_type"] = "application/json"
+        return config
+
     def validate_api_key(self) -> bool:
         """Validate Gemini API key."""
         try:
@@ -129,57 +388,49 @@ class GeminiService(AIServiceBase):
 class OpenRouterService(AIServiceBase):
     """OpenRouter AI service (supports multiple models)."""
 
+    base_url = "https://openrouter.ai/api/v1"
+
     def __init__(self, api_key: str, model: str = "anthropic/claude-3-haiku", **kwargs):
         super().__init__(api_key, **kwargs)
         self.model = model
-        self.base_url = "https://openrouter.ai/api/v1"
+
+    def _default_headers(self) -> Dict[str, str]:
+        return {
+            **super()._default_headers(),
+            "HTTP-Referer": "http://127.0.0.1:8000",
+            "X-Title": "Chatbot Application",
+        }
 
     async def generate_response(
         self,
         message: Union[str, List[Dict[str, Any]]],
         tools: list[Dict[str, Any]] = None,
+        response_format: Dict[str, Any] = None,
+        temperature: float = None,
     ) -> Dict[str, Any]:
         """Generate response using OpenRouter API."""
+        body = json_dumps(self._payload(message, tools, response_format, temperature))
 
-        def _call_api():
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-                "HTTP-Referer": "http://127.0.0.1:8000",
-                "X-Title": "Chatbot Application",
-            }
-
-            data = {
-                "model": self.model,
-                "messages": message
-                if isinstance(message, list)
-                else [{"role": "user", "content": message}],
-                "max_tokens": 1000,
-                "temperature": 0.7,
-            }
-            if tools:
-                data["tools"] = tools
+        async def _call_api():
+            response = await self._get_client().post(
+                "/chat/completions", content=body, headers=JSON_HEADERS
+            )
+            response.raise_for_status()
 
-            with httpx.Client(timeout=self.timeout) as client:
-                response = client.post(
-                    f"{self.base_url}/chat/completions", headers=headers, json=data
+            result = json_loads(response.content)
+            try:
+                msg = result["choices"][0]["message"]
+                return {
+                    "content": msg.get("content", ""),
+                    "tool_calls": msg.get("tool_calls"),
+                }
+            except (KeyError, IndexError, TypeError) as parse_err:
+                raise ValueError(
+                    f"Unexpected response format: {parse_err}. Response keys: {list(result.keys()) if isinstance(result, dict) else 'non-dict'}"
                 )
-                response.raise_for_status()
-
-                result = response.json()
-                try:
-                    msg = result["choices"][0]["message"]
-                    return {
-                        "content": msg.get("content", ""),
-                        "tool_calls": msg.get("tool_calls"),
-                    }
-                except (KeyError, IndexError, TypeError) as parse_err:
-                    raise ValueError(
-                        f"Unexpected response format: {parse_err}. Response keys: {list(result.keys()) if isinstance(result, dict) else 'non-dict'}"
-                    )
 
         try:
-            return self._retry_with_backoff(_call_api)
+            return await self._retry_with_backoff_async(_call_api)
         except (httpx.ConnectTimeout, httpx.ReadTimeout, httpx.NetworkError) as e:
             logger.error(f"OpenRouter API timeout: {str(e)}")
             raise
@@ -192,6 +443,39 @@ class OpenRouterService(AIServiceBase):
             logger.error(f"OpenRouter unexpected error: {str(e)}")
             raise
 
+    async def generate_response_stream(
+        self,
+        message: Union[str, List[Dict[str, Any]]],
+        tools: list[Dict[str, Any]] = None,
+        response_format: Dict[str, Any] = None,
+        temperature: float = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a response using OpenRouter API."""
+        data = self._payload(message, tools, response_format, temperature)
+        async for event in self._stream_chat_completions(data):
+            yield event
+
+    def _payload(
+        self,
+        message: Union[str, List[Dict[str, Any]]],
+        tools: list[Dict[str, Any]] = None,
+        response_format: Dict[str, Any] = None,
+        temperature: float = None,
+    ) -> Dict[str, Any]:
+        data = {
+            "model": self.model,
+            "messages": message
+            if isinstance(message, list)
+            else [{"role": "user", "content": message}],
+            "max_tokens": 1000,
+            "temperature": self._temperature(temperature),
+        }
+        if tools:
+            data["tools"] = tools
+        if response_format:
+            data["response_format"] = response_format
+        return data
+
     def validate_api_key(self) -> bool:
         """Validate OpenRouter API key."""
         try:
@@ -219,73 +503,92 @@ class OpenRouterService(AIServiceBase):
 class GroqService(AIServiceBase):
     """Groq Cloud API service for ultra-fast Llama 3 models."""
 
+    base_url = "https://api.groq.com/openai/v1"
+
     def __init__(self, api_key: str, model: str = "llama-3.1-8b-instant", **kwargs):
         super().__init__(api_key, **kwargs)
         self.model = model
-        self.base_url = "https://api.groq.com/openai/v1"
 
     async def generate_response(
         self,
         message: Union[str, List[Dict[str, Any]]],
         tools: list[Dict[str, Any]] = None,
+        response_format: Dict[str, Any] = None,
+        temperature: float = None,
     ) -> Dict[str, Any]:
         """
         Generate response using Groq API.
         """
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
+        body = json_dumps(self._payload(message, tools, response_format, temperature))
+
+        async def make_request():
+            response = await self._get_client().post(
+                "/chat/completions", content=body, headers=JSON_HEADERS
+            )
+            response.raise_for_status()
+            result = json_loads(response.content)
+            try:
+                msg = result["choices"][0]["message"]
+                return {
+                    "content": msg.get("content", ""),
+                    "tool_calls": msg.get("tool_calls"),
+                }
+            except (KeyError, IndexError, TypeError) as parse_err:
+                raise ValueError(
+                    f"Unexpected response format: {parse_err}. Response keys: {list(result.keys()) if isinstance(result, dict) else 'non-dict'}"
+                )
+
+        return await self._retry_with_backoff_async(make_request)
 
+    async def generate_response_stream(
+        self,
+        message: Union[str, List[Dict[str, Any]]],
+        tools: list[Dict[str, Any]] = None,
+        response_format: Dict[str, Any] = None,
+        temperature: float = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a response using Groq API."""
+        data = self._payload(message, tools, response_format, temperature)
+        async for event in self._stream_chat_completions(data):
+            yield event
+
+    def _payload(
+        self,
+        message: Union[str, List[Dict[str, Any]]],
+        tools: list[Dict[str, Any]] = None,
+        response_format: Dict[str, Any] = None,
+        temperature: float = None,
+    ) -> Dict[str, Any]:
         data = {
             "model": self.model,
-            "messages": message
+            "messages": self._flatten_content(message)
             if isinstance(message, list)
             else [{"role": "user", "content": message}],
-            "temperature": 0.7,
+            "temperature": self._temperature(temperature),
             "max_tokens": 1024,
         }
         if tools:
             data["tools"] = tools
             data["tool_choice"] = "auto"
-
-        def make_request():
-            with httpx.Client(timeout=self.timeout) as client:
-                response = client.post(
-                    f"{self.base_url}/chat/completions", headers=headers, json=data
-                )
-                response.raise_for_status()
-                result = response.json()
-                try:
-                    msg = result["choices"][0]["message"]
-                    return {
-                        "content": msg.get("content", ""),
-                        "tool_calls": msg.get("tool_calls"),
-                    }
-                except (KeyError, IndexError, TypeError) as parse_err:
-                    raise ValueError(
-                        f"Unexpected response format: {parse_err}. Response keys: {list(result.keys()) if isinstance(result, dict) else 'non-dict'}"
-                    )
-
-        return self._retry_with_backoff(make_request)
+        if response_format:
+            # Groq's small Llama models only support JSON mode, not json_schema.
+            data["response_format"] = {"type": "json_object"}
+        return data
 
     async def transcribe_audio(self, audio_file) -> str:
         """
         Transcribe audio using Groq's Whisper API.
         """
-        url = "https://api.groq.com/openai/v1/audio/transcriptions"
-        headers = {"Authorization": f"Bearer {self.api_key}"}
-
-        # Read file content safely
-        content = audio_file.read()
-        files = {"file": ("audio.webm", content, "audio/webm")}
+        # Pass the file object itself: httpx reads it in chunks while
+        # building the multipart body instead of holding a full copy.
+        audio_file.seek(0)
+        files = {"file": ("audio.webm", audio_file, "audio/webm")}
         data = {"model": "distil-whisper-large-v3-en", "response_format": "json"}
 
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    url, headers=headers, files=files, data=data, timeout=30.0
-                )
+            response = await self._get_client().post(
+                "/audio/transcriptions", files=files, data=data, timeout=30.0
+            )
 
             if response.status_code == 200:
                 result = response.json()
@@ -322,128 +625,430 @@ class GroqService(AIServiceBase):
             return False
 
 
+@dataclass(frozen=True, slots=True)
+class AIConfig:
+    """Snapshot of the AI-related Django settings, read once at import."""
+
+    primary_service: str
+    timeout: float
+    max_retries: int
+    temperature: float
+    trivial_temperature: float
+    hedge_delay: float
+    groq_key: Optional[str]
+    groq_model: str
+    groq_fast_model: str
+    openrouter_key: Optional[str]
+    openrouter_model: str
+    gemini_key: Optional[str]
+    gemini_model: str
+    speculative_generalist: bool
+    combined_preflight: bool
+    coder_auto_review: bool
+    coalesce_requests: bool
+    batch_extraction: bool
+    deterministic_cache_ttl: int
+    response_cache: bool
+    response_cache_max_distance: float
+
+    @classmethod
+    def from_settings(cls) -> "AIConfig":
+        return cls(
+            primary_service=getattr(settings, "AI_PRIMARY_SERVICE", "groq"),
+            timeout=getattr(settings, "AI_TIMEOUT", 30.0),
+            max_retries=getattr(settings, "AI_MAX_RETRIES", 3),
+            temperature=getattr(settings, "AI_TEMPERATURE", 0.7),
+            trivial_temperature=getattr(
+                settings,
+                "AI_TRIVIAL_TEMPERATURE",
+                getattr(settings, "AI_TEMPERATURE", 0.7),
+            ),
+            hedge_delay=getattr(settings, "AI_HEDGE_DELAY", 0.8),
+            groq_key=getattr(settings, "GROQ_API_KEY", None)
+            or os.getenv("GROQ_API_KEY"),
+            groq_model=getattr(settings, "GROQ_MODEL", "llama3-8b-8192"),
+            groq_fast_model=getattr(
+                settings, "GROQ_FAST_MODEL", "llama-3.1-8b-instant"
+            ),
+            openrouter_key=getattr(settings, "OPENROUTER_API_KEY", None),
+            openrouter_model=getattr(
+                settings, "OPENROUTER_MODEL", "anthropic/claude-3-haiku"
+            ),
+            gemini_key=getattr(settings, "GEMINI_API_KEY", None),
+            gemini_model=getattr(settings, "GEMINI_MODEL", "models/gemini-2.5-flash"),
+            speculative_generalist=getattr(settings, "SPECULATIVE_GENERALIST", False),
+            combined_preflight=getattr(settings, "COMBINED_PREFLIGHT", True),
+            coder_auto_review=getattr(settings, "CODER_AUTO_REVIEW", False),
+            coalesce_requests=getattr(settings, "LLM_COALESCE_REQUESTS", False),
+            batch_extraction=getattr(settings, "LLM_BATCH_EXTRACTION", False),
+            deterministic_cache_ttl=getattr(settings, "DETERMINISTIC_CACHE_TTL", 86400),
+            response_cache=getattr(settings, "RESPONSE_CACHE", True),
+            response_cache_max_distance=getattr(
+                settings, "RESPONSE_CACHE_MAX_DISTANCE", 0.05
+            ),
+        )
+
+
+CFG = AIConfig.from_settings()
+
+# Structured output for AIServiceManager.generate_batch
+BATCH_RESPONSE_FORMAT: Dict[str, Any] = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "batch_answers",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {"answers": {"type": "array", "items": {"type": "string"}}},
+            "required": ["answers"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
 class AIServiceManager:
     """Manages multiple AI services with fallback support."""
 
     def __init__(self):
         self.services = []
         self.current_service_index = 0
+        # Cheaper model for trivial prompts and routing/extraction calls
+        self.fast_service = None
         self._initialize_services()
 
     def _initialize_services(self):
         """Initialize available AI services based on configuration."""
 
-        # Get primary service preference
-        primary_service = getattr(settings, "AI_PRIMARY_SERVICE", "groq")
+        common = {
+            "timeout": CFG.timeout,
+            "max_retries": CFG.max_retries,
+            "temperature": CFG.temperature,
+        }
+        # (preference name, label, role, factory) in fallback order
+        candidates = []
 
         # Groq Service (Primary - Global Access)
-        groq_key = getattr(settings, "GROQ_API_KEY", None) or os.getenv("GROQ_API_KEY")
-        if groq_key:
-            try:
-                groq_service = GroqService(
-                    api_key=groq_key,
-                    model=getattr(settings, "GROQ_MODEL", "llama3-8b-8192"),
-                    timeout=getattr(settings, "AI_TIMEOUT", 30.0),
-                    max_retries=getattr(settings, "AI_MAX_RETRIES", 3),
+        if CFG.groq_key:
+            candidates.append(
+                (
+                    "groq",
+                    "Groq",
+                    "Primary",
+                    lambda: GroqService(
+                        api_key=CFG.groq_key,
+                        model=CFG.groq_model,
+                        **common,
+                    ),
                 )
-                if groq_service.validate_api_key():
-                    self.services.append(groq_service)
-                    logger.info("Groq service initialized successfully (Primary)")
-                    # Set as primary if it's the preferred service
-                    if primary_service == "groq":
-                        self.current_service_index = 0
-                else:
-                    logger.warning("Groq API key validation failed")
-            except Exception as e:
-                logger.error(f"Failed to initialize Groq service: {str(e)}")
+            )
 
         # OpenRouter Service (Backup - Global Access)
-        openrouter_key = getattr(settings, "OPENROUTER_API_KEY", None)
-        if openrouter_key:
-            try:
-                openrouter_service = OpenRouterService(
-                    api_key=openrouter_key,
-                    model=getattr(
-                        settings, "OPENROUTER_MODEL", "anthropic/claude-3-haiku"
+        if CFG.openrouter_key:
+            candidates.append(
+                (
+                    "openrouter",
+                    "OpenRouter",
+                    "Backup",
+                    lambda: OpenRouterService(
+                        api_key=CFG.openrouter_key,
+                        model=CFG.openrouter_model,
+                        **common,
                     ),
-                    timeout=getattr(settings, "AI_TIMEOUT", 30.0),
-                    max_retries=getattr(settings, "AI_MAX_RETRIES", 3),
                 )
-                if openrouter_service.validate_api_key():
-                    self.services.append(openrouter_service)
-                    logger.info("OpenRouter service initialized successfully (Backup)")
-                    # Set as primary if it's the preferred service
-                    if primary_service == "openrouter":
-                        self.current_service_index = len(self.services) - 1
-                else:
-                    logger.warning("OpenRouter API key validation failed")
-            except Exception as e:
-                logger.error(f"Failed to initialize OpenRouter service: {str(e)}")
+            )
 
         # Gemini Service (Regional - May Not Be Available)
-        gemini_key = getattr(settings, "GEMINI_API_KEY", None)
-        if gemini_key:
-            try:
-                gemini_service = GeminiService(
-                    api_key=gemini_key,
-                    model=getattr(settings, "GEMINI_MODEL", "models/gemini-2.5-flash"),
-                    timeout=getattr(settings, "AI_TIMEOUT", 30.0),
-                    max_retries=getattr(settings, "AI_MAX_RETRIES", 3),
+        if CFG.gemini_key:
+            candidates.append(
+                (
+                    "gemini",
+                    "Gemini",
+                    "Regional",
+                    lambda: GeminiService(
+                        api_key=CFG.gemini_key,
+                        model=CFG.gemini_model,
+                        **common,
+                    ),
                 )
-                if gemini_service.validate_api_key():
-                    self.services.append(gemini_service)
-                    logger.info("Gemini service initialized successfully (Regional)")
-                    # Set as primary if it's the preferred service
-                    if primary_service == "gemini":
-                        self.current_service_index = len(self.services) - 1
-                else:
-                    logger.warning("Gemini API key validation failed")
+            )
+
+        def build_and_validate(factory):
+            service = factory()
+            return service, service.validate_api_key()
+
+        # Each validation is a blocking HTTP call; run them side by side so
+        # startup takes max(validation time) instead of the sum.
+        with ThreadPoolExecutor(max_workers=max(len(candidates), 1)) as pool:
+            futures = [
+                pool.submit(build_and_validate, factory) for *_, factory in candidates
+            ]
+
+        for (name, label, role, _), future in zip(candidates, futures):
+            try:
+                service, valid = future.result()
             except Exception as e:
-                logger.error(f"Failed to initialize Gemini service: {str(e)}")
+                logger.error(f"Failed to initialize {label} service: {str(e)}")
+                continue
+            if not valid:
+                logger.warning(f"{label} API key validation failed")
+                continue
+
+            self.services.append(service)
+            logger.info(f"{label} service initialized successfully ({role})")
+            # Set as primary if it's the preferred service
+            if CFG.primary_service == name:
+                self.current_service_index = len(self.services) - 1
 
         if not self.services:
             logger.error("No AI services are available!")
 
+        if CFG.groq_fast_model != CFG.groq_model and any(
+            isinstance(service, GroqService) for service in self.services
+        ):
+            # Same (already validated) key, smaller model
+            self.fast_service = GroqService(
+                api_key=CFG.groq_key, model=CFG.groq_fast_model, **common
+            )
+            logger.info(f"Fast model {CFG.groq_fast_model} enabled for simple prompts")
+
     @observability.trace(name="ai_manager_generate")
     async def generate_response(
         self,
         message: Union[str, List[Dict[str, Any]]],
         tools: list[Dict[str, Any]] = None,
+        response_format: Dict[str, Any] = None,
+        temperature: float = None,
+        cache_ttl: int = None,
+        fast: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Generate response using available AI services with fallback.
+        Pass `cache_ttl` (seconds) for prompts whose answer only depends on the
+        input (routing, extraction) to serve repeats from the exact-match cache.
+        Pass `fast=True` for simple prompts to try the cheaper fast model first.
+        """
+        if fast and self.fast_service is not None:
+            generate = lambda: self._generate_fast(
+                message, tools, response_format, temperature
+            )
+        else:
+            generate = lambda: self._generate_with_fallback(
+                message, tools, response_format, temperature
+            )
+
+        if cache_ttl:
+            key = request_cache_key(
+                self.model_for(fast), message, tools, response_format, temperature
+            )
+            return await cached_request(key, cache_ttl, generate)
+        return await generate()
+
+    async def generate_batch(
+        self,
+        prompts: List[str],
+        temperature: float = None,
+        cache_ttl: int = None,
+        fast: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Answer several independent text prompts with one LLM call.
+        Saves per-call overhead for short, structured outputs, but the single
+        call decodes every answer in sequence, so it is not always faster than
+        parallel calls. Falls back to one call per prompt if the batched
+        answer cannot be split.
+        """
+        kwargs = {"temperature": temperature, "cache_ttl": cache_ttl, "fast": fast}
+        if len(prompts) < 2:
+            return [await self.generate_response(p, **kwargs) for p in prompts]
+
+        tasks = "\n\n".join(
+            f"Task {i}:\n{prompt}" for i, prompt in enumerate(prompts, 1)
+        )
+        try:
+            res = await self.generate_response(
+                f"Complete each of the following {len(prompts)} independent tasks. "
+                'Respond in JSON as {"answers": [...]} with exactly one string '
+                f"answer per task, in order.\n\n{tasks}",
+                response_format=BATCH_RESPONSE_FORMAT,
+                **kwargs,
+            )
+            answers = json_loads(extract_first_json_object(res.get("content") or ""))[
+                "answers"
+            ]
+            if not isinstance(answers, list) or len(answers) != len(prompts):
+                raise ValueError(f"expected {len(prompts)} answers")
+            return [{"content": str(answer), "tool_calls": None} for answer in answers]
+        except Exception as e:
+            logger.warning(f"Batched prompts failed, answering individually: {e}")
+            return list(
+                await asyncio.gather(
+                    *[self.generate_response(p, **kwargs) for p in prompts]
+                )
+            )
+
+    async def _generate_fast(
+        self,
+        message: Union[str, List[Dict[str, Any]]],
+        tools: list[Dict[str, Any]] = None,
+        response_format: Dict[str, Any] = None,
+        temperature: float = None,
+    ) -> Dict[str, Any]:
+        service = self.fast_service
+        if not service.breaker.is_open():
+            try:
+                response = await service.generate_response(
+                    message,
+                    tools=tools,
+                    response_format=response_format,
+                    temperature=temperature,
+                )
+                service.breaker.record_success()
+                return response
+            except Exception as e:
+                service.breaker.record_failure()
+                logger.warning(f"Fast model {service.model} failed: {str(e)}")
+        return await self._generate_with_fallback(
+            message, tools, response_format, temperature
+        )
+
+    async def _generate_with_fallback(
+        self,
+        message: Union[str, List[Dict[str, Any]]],
+        tools: list[Dict[str, Any]] = None,
+        response_format: Dict[str, Any] = None,
+        temperature: float = None,
     ) -> Dict[str, Any]:
-        """Generate response using available AI services with fallback."""
         if not self.services:
             raise Exception("No AI services available")
 
-        # Try current service first
-        for attempt in range(len(self.services)):
-            service_index = (self.current_service_index + attempt) % len(self.services)
+        # Start with the current service. If it has not answered after
+        # AI_HEDGE_DELAY seconds, race the next one against it; a failure
+        # falls through to the next service immediately.
+        hedge_delay = CFG.hedge_delay
+        remaining = iter(self._service_order())
+        pending: Dict[asyncio.Task, int] = {}
+
+        def launch() -> bool:
+            service_index = next(remaining, None)
+            if service_index is None:
+                return False
             service = self.services[service_index]
+            logger.info(
+                f"Attempting to generate response using {service.__class__.__name__}"
+            )
+            call = service.generate_response(
+                message,
+                tools=tools,
+                response_format=response_format,
+                temperature=temperature,
+            )
+            if service.breaker.half_open:
+                # Probe a recovering service without spending the full timeout
+                call = asyncio.wait_for(call, service.breaker.probe_timeout)
+            task = asyncio.create_task(call)
+            pending[task] = service_index
+            return True
 
-            try:
-                logger.info(
-                    f"Attempting to generate response using {service.__class__.__name__}"
+        launch()
+        can_hedge = hedge_delay > 0
+        last_error = None
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=hedge_delay if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED,
                 )
-                response = await service.generate_response(message, tools=tools)
+                if not done:
+                    can_hedge = launch()
+                    if can_hedge:
+                        logger.info("Primary service is slow, hedging request...")
+                    continue
 
-                # Update current service if we successfully used a different one
-                if service_index != self.current_service_index:
-                    self.current_service_index = service_index
-                    logger.info(
-                        f"Switched to {service.__class__.__name__} as primary service"
+                for task in done:
+                    service_index = pending.pop(task)
+                    service = self.services[service_index]
+                    error = task.exception()
+                    if error is not None:
+                        service.breaker.record_failure()
+                        last_error = error
+                        logger.warning(
+                            f"Service {service.__class__.__name__} failed: {str(error)}"
+                        )
+                        if launch():
+                            logger.info(f"Falling back to next service...")
+                        continue
+
+                    service.breaker.record_success()
+                    # Update current service if we successfully used a different one
+                    if service_index != self.current_service_index:
+                        self.current_service_index = service_index
+                        logger.info(
+                            f"Switched to {service.__class__.__name__} as primary service"
+                        )
+                    observability.update_current_observation(
+                        metadata={"ai_service": service.__class__.__name__}
                     )
+                    return task.result()
+        finally:
+            # Cancel the losing request(s)
+            for task in pending:
+                task.cancel()
 
-                return response
+        # All services failed
+        raise Exception(f"All AI services failed. Last error: {str(last_error)}")
+
+    def _service_order(self) -> List[int]:
+        """
+        Service indexes to try, starting with the current service.
+        Services whose circuit breaker is open are skipped unless every
+        breaker is open.
+        """
+        order = [
+            (self.current_service_index + offset) % len(self.services)
+            for offset in range(len(self.services))
+        ]
+        return [i for i in order if not self.services[i].breaker.is_open()] or order
+
+    async def generate_response_stream(
+        self,
+        message: Union[str, List[Dict[str, Any]]],
+        tools: list[Dict[str, Any]] = None,
+        response_format: Dict[str, Any] = None,
+        temperature: float = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a response (see AIServiceBase.generate_response_stream).
+        Falls back to the next service only while nothing has been yielded;
+        streams are never hedged or cached.
+        """
+        if not self.services:
+            raise Exception("No AI services available")
 
+        last_error = None
+        for service_index in self._service_order():
+            service = self.services[service_index]
+            started = False
+            try:
+                async for event in service.generate_response_stream(
+                    message,
+                    tools=tools,
+                    response_format=response_format,
+                    temperature=temperature,
+                ):
+                    started = True
+                    yield event
+                service.breaker.record_success()
+                return
             except Exception as e:
+                service.breaker.record_failure()
+                if started:
+                    raise
+                last_error = e
                 logger.warning(f"Service {service.__class__.__name__} failed: {str(e)}")
 
-                # Try next service if available
-                if attempt < len(self.services) - 1:
-                    logger.info(f"Falling back to next service...")
-                    continue
-                else:
-                    # All services failed
-                    raise Exception(f"All AI services failed. Last error: {str(e)}")
+        raise Exception(f"All AI services failed. Last error: {str(last_error)}")
 
     async def transcribe_audio(self, audio_file) -> str:
         """
@@ -460,6 +1065,19 @@ class AIServiceManager:
 
         raise Exception("No service available for audio transcription")
 
+    @property
+    def current_model(self) -> str:
+        """Model id of the service that will be tried first."""
+        if not self.services:
+            return ""
+        return getattr(self.services[self.current_service_index], "model", "")
+
+    def model_for(self, fast: bool = False) -> str:
+        """Model id a `generate_response(..., fast=fast)` call will try first."""
+        if fast and self.fast_service is not None:
+            return self.fast_service.model
+        return self.current_model
+
     def get_service_status(self) -> Dict[str, Any]:
         """Get status of all configured services."""
         return {
@@ -475,6 +1093,8 @@ class AIServiceManager:
                     "model": getattr(service, "model", "unknown"),
                     "timeout": service.timeout,
                     "max_retries": service.max_retries,
+                    "circuit": service.breaker.state,
+                    "consecutive_failures": service.breaker.failure_count,
                 }
                 for service in self.services
             ],
@@ -484,13 +1104,122 @@ class AIServiceManager:
 # Global AI service manager instance
 ai_manager = AIServiceManager()
 
-from .agents import AGENTS, ORCHESTRATOR_PROMPT, AgentType
+
+@atexit.register
+def _close_service_clients():
+    for service in ai_manager.services:
+        try:
+            service.close_all()
+        except Exception as e:
+            logger.debug(f"Failed to close {service.__class__.__name__} client: {e}")
+
+
+from .agents import (
+    COMBINED_PREFLIGHT_PROMPT,
+    ORCHESTRATOR_PROMPT,
+    PREFLIGHT_RESPONSE_FORMAT,
+    ROUTER_RESPONSE_FORMAT,
+    classify_complexity,
+    fast_route,
+    resolve,
+)
 from .memory import memory_manager
-from .tools import tool_registry
+from .tools import tool_executor, tool_registry
 from .pii_masking import pii_masker
 from .graph_memory import graph_memory
-import json
+from .llm_cache import (
+    cached_completion,
+    cached_request,
+    request_cache_key,
+    semantic_cache,
+)
+from .agents import AgentPersona
+from .coalescer import request_coalescer
+import hashlib
 import re
+import threading
+from collections import OrderedDict
+
+# Generative UI blocks the personas append to their answers
+_UI_BLOCK_RE = re.compile(r"```json-(suggestions|chart)\n(.*?)\n```", re.DOTALL)
+
+
+def _extract_ui_blocks(text: str) -> Tuple[str, List[Any], List[Any]]:
+    """
+    Pull json-suggestions / json-chart blocks out of an answer in one pass.
+    Returns (text without the blocks, suggestions, charts); a block whose
+    JSON does not parse is left in the text.
+    """
+    suggestions: List[Any] = []
+    charts: List[Any] = []
+
+    def collect(match: re.Match) -> str:
+        try:
+            payload = json_loads(match.group(2))
+        except Exception as e:
+            logger.error(f"Failed to extract {match.group(1)}: {e}")
+            return match.group(0)
+        if match.group(1) == "chart":
+            charts.append(payload)
+        elif isinstance(payload, list):
+            suggestions.extend(payload)
+        else:
+            suggestions.append(payload)
+        return ""
+
+    return _UI_BLOCK_RE.sub(collect, text).strip(), suggestions, charts
+
+
+# Sub-agents are dispatched from their own threads onto the background loop
+# (below), so a specialist calling another agent never re-enters the caller's
+# loop.
+_SUBAGENT_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="subagent")
+SUBAGENT_WAIT_SECONDS = 20.0
+SUBAGENT_PENDING_CUE = (
+    "(A background task is still running; its result is not available yet.)"
+)
+
+# Post-response writes run here, off the event loop that serves requests:
+# they block (embedding, disk I/O) and must finish even if the caller's loop
+# goes away (sync callers still use asyncio.run). Graph enrichment waits on
+# an LLM call, so it gets its own pool and never holds up the memory writes.
+_BACKGROUND_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="enrich")
+_GRAPH_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="graph-enrich")
+
+# LLM calls made from those pool threads (and sub-agent threads) run on one
+# long-lived loop, so they reuse its pooled HTTP clients; asyncio.run per
+# call built a loop, and an httpx client that was never closed, every time
+_BACKGROUND_LOOP = asyncio.new_event_loop()
+_BACKGROUND_LOOP_THREAD = threading.Thread(
+    target=_BACKGROUND_LOOP.run_forever, name="ai-background-loop", daemon=True
+)
+_BACKGROUND_LOOP_THREAD.start()
+
+
+def _run_in_background_loop(coro):
+    """Run `coro` on the background loop and block this thread until it ends."""
+    return asyncio.run_coroutine_threadsafe(coro, _BACKGROUND_LOOP).result()
+
+
+@atexit.register
+def _drain_background_jobs():
+    _BACKGROUND_POOL.shutdown(wait=True)
+    _GRAPH_POOL.shutdown(wait=True)
+    # Stop (not close) the loop: _close_service_clients runs after this and
+    # closes its clients on it
+    _BACKGROUND_LOOP.call_soon_threadsafe(_BACKGROUND_LOOP.stop)
+    _BACKGROUND_LOOP_THREAD.join(timeout=5)
+
+
+# Tool-loop history limits: long tool outputs are cut, and once the history
+# passes MAX_CTX_CHARS the older turns are replaced by a summary.
+MAX_TOOL_CHARS = 2000
+MAX_CTX_CHARS = 24000
+DUPLICATE_TOOL_OUTPUT = "(same as previous)"
+
+# Verbatim repeats (button-driven UIs resend "main menu", "contact", ...)
+EXACT_CACHE_SIZE = 1024
+EXACT_CACHE_TTL = getattr(settings, "EXACT_CACHE_TTL", 300)
 
 
 class AgentOrchestrator:
@@ -504,56 +1233,139 @@ class AgentOrchestrator:
 
     def __init__(self, service_manager: AIServiceManager):
         self.service_manager = service_manager
+        # In-flight background jobs, for logging failures and inspection
+        self._background_jobs = set()
+        # Normalized message -> (expires_at, result), least recently used
+        # first; checked before the response cache
+        self._exact_cache: OrderedDict = OrderedDict()
+        self._exact_cache_lock = threading.Lock()
+
+    def _exact_cache_get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._exact_cache_lock:
+            entry = self._exact_cache.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._exact_cache[key]
+                return None
+            self._exact_cache.move_to_end(key)
+        return entry[1]
+
+    def _exact_cache_put(self, key: str, result: Dict[str, Any]):
+        with self._exact_cache_lock:
+            self._exact_cache[key] = (time.monotonic() + EXACT_CACHE_TTL, result)
+            self._exact_cache.move_to_end(key)
+            if len(self._exact_cache) > EXACT_CACHE_SIZE:
+                self._exact_cache.popitem(last=False)
+
+    def _submit_background(
+        self, fn: Callable, *args, pool: ThreadPoolExecutor = _BACKGROUND_POOL
+    ):
+        """Run `fn(*args)` on a background pool after the response."""
+        future = pool.submit(fn, *args)
+        self._background_jobs.add(future)
+        future.add_done_callback(self._background_done)
+
+    def _background_done(self, future):
+        self._background_jobs.discard(future)
+        if not future.cancelled() and future.exception():
+            logger.error(f"Background job failed: {future.exception()}")
+
+    def _enrich_graph_blocking(self, text: str):
+        # --- GRAPH ENRICHMENT (New Phase 13) ---
+        # Try to learn new relationships from the interaction
+        _run_in_background_loop(self._extract_and_store_graph_triplets(text))
+
+    @staticmethod
+    def _entity_prompt(text: str) -> str:
+        return f"""Extract the 3 most important entities (nouns/subjects/objects) from the following text. 
+            Return them as a simple comma-separated list.
+            Text: "{text}"
+            Entities:"""
+
+    @staticmethod
+    def _parse_entities(res: Dict[str, Any]) -> List[str]:
+        return list(filter(None, map(str.strip, res.get("content", "").split(","))))
 
     async def _extract_entities_for_graph(self, text: str) -> List[str]:
         """
         Use LLM to extract key entities for graph traversal.
         """
         try:
-            prompt = f"""Extract the 3 most important entities (nouns/subjects/objects) from the following text. 
-            Return them as a simple comma-separated list.
-            Text: "{text}"
-            Entities:"""
-            res = await self.service_manager.generate_response(prompt)
-            entities = [
-                e.strip() for e in res.get("content", "").split(",") if e.strip()
-            ]
-            return entities
+            res = await self.service_manager.generate_response(
+                self._entity_prompt(text),
+                cache_ttl=CFG.deterministic_cache_ttl,
+                fast=True,
+            )
+            return self._parse_entities(res)
         except Exception as e:
             logger.error(f"Entity extraction failed: {e}")
             return []
 
+    async def _extract_entities_batch(self, texts: List[str]) -> List[List[str]]:
+        """Entity extraction for several texts in one batched LLM call."""
+        try:
+            results = await self.service_manager.generate_batch(
+                [self._entity_prompt(text) for text in texts],
+                cache_ttl=CFG.deterministic_cache_ttl,
+                fast=True,
+            )
+            return [self._parse_entities(res) for res in results]
+        except Exception as e:
+            logger.error(f"Entity extraction failed: {e}")
+            return [[] for _ in texts]
+
     async def _multi_hop_graph_search(
-        self, message: str, initial_context: List[str]
+        self,
+        message: str,
+        initial_context: List[str],
+        message_entities: Awaitable[List[str]] = None,
+        context_entities: Awaitable[List[str]] = None,
     ) -> str:
         """
         Follow graph relationships to find hidden context.
+        `message_entities` / `context_entities` may be already-running
+        extractions for `message` and `initial_context`.
         """
         graph_facts = []
 
-        # 1. Extract entities from the user message
-        entities = await self._extract_entities_for_graph(message)
-
-        # 2. Extract entities from initial RAG context (first few docs)
-        if initial_context:
-            context_entities = await self._extract_entities_for_graph(
-                "\n".join(initial_context[:2])
+        # 1. Extract entities from the user message and, concurrently,
+        # 2. from the initial RAG context (first few docs)
+        if (
+            CFG.batch_extraction
+            and message_entities is None
+            and context_entities is None
+            and initial_context
+        ):
+            # Both extractions in one batched LLM call
+            entities, context_entities = await self._extract_entities_batch(
+                [message, "\n".join(initial_context[:2])]
             )
-            entities.extend(context_entities)
+            entities = entities + context_entities
+        else:
+            if message_entities is None:
+                message_entities = self._extract_entities_for_graph(message)
+            if initial_context:
+                if context_entities is None:
+                    context_entities = self._extract_entities_for_graph(
+                        "\n".join(initial_context[:2])
+                    )
+                entities, context_entities = await asyncio.gather(
+                    message_entities, context_entities
+                )
+                entities = entities + context_entities
+            else:
+                entities = await message_entities
 
-        # 3. Query Graph for relationships (Deduplicate)
+        # 3. Query Graph for relationships (Deduplicate on the raw tuples)
         seen_triplets = set()
         for entity in set(entities):
-            triplets = graph_memory.get_related_entities(entity, depth=2)
-            for u, r, v in triplets:
-                triplet_str = f"{u} --({r})--> {v}"
-                if triplet_str not in seen_triplets:
-                    graph_facts.append(triplet_str)
-                    seen_triplets.add(triplet_str)
-
-        if graph_facts:
-            return "\n- ".join(graph_facts)
-        return ""
+            for triplet in graph_memory.get_related_entities(entity, depth=2):
+                if triplet not in seen_triplets:
+                    seen_triplets.add(triplet)
+                    graph_facts.append(triplet)
+
+        return "\n- ".join(f"{u} --({r})--> {v}" for u, r, v in graph_facts)
 
     async def _extract_and_store_graph_triplets(self, text: str):
         """
@@ -565,14 +1377,16 @@ class AgentOrchestrator:
             Use one per line. Keep entities short (1-3 words).
             Text: "{text}"
             Triplets:"""
-            res = await self.service_manager.generate_response(prompt)
-            lines = res.get("content", "").strip().split("\n")
+            res = await self.service_manager.generate_response(prompt, fast=True)
+            lines = res.get("content", "").strip().splitlines()
+            triplets = []
             for line in lines:
                 if "|" in line:
                     parts = line.split("|")
                     if len(parts) == 3:
                         e1, r, e2 = parts
-                        graph_memory.add_relationship(e1, r, e2)
+                        triplets.append((e1, r, e2, None))
+            graph_memory.add_relationships(triplets)
 
             logger.info(
                 f"Enriched Knowledge Graph with {len(lines)} potential relationships."
@@ -580,28 +1394,365 @@ class AgentOrchestrator:
         except Exception as e:
             logger.error(f"Graph enrichment failed: {e}")
 
+    async def call_agent(
+        self,
+        persona: AgentPersona,
+        messages: List[Dict[str, Any]],
+        tools: list[Dict[str, Any]] = None,
+        temperature: float = None,
+        fast: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        One non-blocking LLM call on behalf of `persona`.
+        `fast=True` tries the cheaper fast model first (trivial prompts).
+        """
+        if (
+            CFG.coalesce_requests
+            and temperature == 0
+            and not tools
+            and [m["role"] for m in messages[:-1]] == ["system"] * (len(messages) - 1)
+            and messages[-1]["role"] == "user"
+        ):
+            # Independent deterministic prompts can share one LLM call.
+            return await request_coalescer.submit(
+                persona.digest,
+                messages,
+                lambda batch_messages: self.service_manager.generate_response(
+                    batch_messages, temperature=temperature, fast=fast
+                ),
+            )
+        return await cached_completion(
+            persona,
+            messages,
+            self.service_manager.model_for(fast),
+            temperature,
+            lambda: self.service_manager.generate_response(
+                messages, tools=tools, temperature=temperature, fast=fast
+            ),
+        )
+
+    async def stream_agent(
+        self,
+        persona: AgentPersona,
+        messages: List[Dict[str, Any]],
+        on_delta: Callable[[str], Awaitable[None]],
+        tools: list[Dict[str, Any]] = None,
+        temperature: float = None,
+    ) -> Dict[str, Any]:
+        """Like call_agent, but passes text to `on_delta` as it streams in."""
+        response = {"content": "", "tool_calls": None}
+        async for event in self.service_manager.generate_response_stream(
+            messages, tools=tools, temperature=temperature
+        ):
+            if "delta" in event:
+                await on_delta(event["delta"])
+            else:
+                response = event["response"]
+        return response
+
+    def _run_subagent_blocking(
+        self, persona: AgentPersona, messages: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        # Tool-free and deterministic, so concurrent sub-agent calls to the
+        # same persona can share one LLM call (LLM_COALESCE_REQUESTS)
+        return _run_in_background_loop(
+            self.call_agent(persona, messages, temperature=0)
+        )
+
+    async def run_subagents(
+        self,
+        jobs: List[tuple],
+        wait: float = SUBAGENT_WAIT_SECONDS,
+    ) -> List[Dict[str, Any]]:
+        """
+        Fan out (persona, messages) jobs to the sub-agent pool; sub-agents
+        answer at temperature 0 without tools.
+        Returns responses in job order; jobs still running after `wait`
+        seconds keep running in the background and get SUBAGENT_PENDING_CUE.
+        """
+        futures = [
+            asyncio.wrap_future(
+                _SUBAGENT_POOL.submit(self._run_subagent_blocking, persona, messages)
+            )
+            for persona, messages in jobs
+        ]
+        if not futures:
+            return []
+        await asyncio.wait(futures, timeout=wait)
+
+        results = []
+        for (persona, _), future in zip(jobs, futures):
+            if not future.done():
+                logger.info(f"Sub-agent {persona.name} still running in background")
+                results.append({"content": SUBAGENT_PENDING_CUE, "tool_calls": None})
+            elif future.exception():
+                logger.error(f"Sub-agent {persona.name} failed: {future.exception()}")
+                results.append({"content": "", "tool_calls": None})
+            else:
+                results.append(future.result())
+        return results
+
+    def _build_messages(
+        self, persona: AgentPersona, message: str, context_str: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Initialize conversation history:
+        [Static System Prompt] -> [Dynamic Context] -> [User Message]
+        The static prompt must stay byte-identical across requests so provider
+        prefix caches hit; anything per-request goes in the trailing message.
+        """
+        messages = persona.to_messages(self.service_manager.current_model)
+
+        dynamic_context = persona.dynamic_context
+        if context_str:
+            dynamic_context += f"\n\nRELEVANT CONTEXT FROM MEMORY:\n{context_str}\n\nUse the above context to answer if relevant."
+        if dynamic_context.strip():
+            messages.append({"role": "system", "content": dynamic_context.strip()})
+
+        messages.append({"role": "user", "content": message})
+        return messages
+
+    @staticmethod
+    def _message_chars(message: Dict[str, Any]) -> int:
+        content = message.get("content") or ""
+        if isinstance(content, list):
+            return sum(len(block.get("text", "")) for block in content)
+        return len(content)
+
+    async def _compact_history(
+        self, messages: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Keep the tool-loop prompt under MAX_CTX_CHARS.
+        The system prompt, the user message and the latest tool turn are kept
+        as they are; earlier tool turns are replaced by an LLM summary.
+        """
+        if sum(map(self._message_chars, messages)) <= MAX_CTX_CHARS:
+            return messages
+
+        roles = [m["role"] for m in messages]
+        head_end = roles.index("user") + 1
+        # The latest assistant tool-call message and its tool results
+        tail_start = len(roles) - 1 - roles[::-1].index("assistant")
+        middle = messages[head_end:tail_start]
+        if not middle:
+            return messages
+
+        transcript = "\n".join(
+            f"{m['role']}: {m.get('content') or m.get('tool_calls')}" for m in middle
+        )
+        try:
+            res = await self.service_manager.generate_response(
+                "Summarize the following tool calls and results in a few lines, "
+                f"keeping every fact needed to answer the user.\n\n{transcript}",
+                temperature=0,
+                fast=True,
+            )
+        except Exception as e:
+            logger.error(f"History summarization failed: {e}")
+            return messages
+
+        logger.info(f"Summarized {len(middle)} earlier tool-loop messages")
+        return (
+            messages[:head_end]
+            + [{"role": "system", "content": f"Summary so far: {res.get('content')}"}]
+            + messages[tail_start:]
+        )
+
+    async def _preflight(self, message: str) -> Dict[str, Any]:
+        """
+        Route the message and extract its graph entities in one LLM call.
+        It depends on the message alone, so it runs alongside memory retrieval
+        and is cached by the normalized text.
+        Triplets stated in the message are stored in the background (on a
+        cache miss only; a cached decision's triplets are already stored).
+        Returns {} on failure so callers fall back to the separate calls.
+        """
+        normalized = " ".join(message.split())
+        prompt = f'{COMBINED_PREFLIGHT_PROMPT}\n\nInput: "{normalized}"\n\nOutput JSON:'
+        try:
+            decision = await cached_request(
+                request_cache_key(COMBINED_PREFLIGHT_PROMPT, normalized.lower()),
+                CFG.deterministic_cache_ttl,
+                lambda: self._preflight_decision(prompt),
+            )
+        except Exception as e:
+            logger.error(f"Preflight failed, using separate calls: {e}")
+            return {}
+
+        logger.info(
+            f"Orchestrator routed to '{decision.get('agent')}' because: "
+            f"{decision.get('reason', '')}"
+        )
+        return decision
+
+    async def _preflight_decision(self, prompt: str) -> Dict[str, Any]:
+        res = await self.service_manager.generate_response(
+            prompt, response_format=PREFLIGHT_RESPONSE_FORMAT, fast=True
+        )
+        decision = json_loads(extract_first_json_object(res.get("content") or ""))
+        if not isinstance(decision.get("agent"), str):
+            raise ValueError("preflight response has no agent")
+        decision["agent"] = decision["agent"].lower()
+        if isinstance(decision.get("message_entities"), list):
+            decision["message_entities"] = list(
+                filter(None, (str(e).strip() for e in decision["message_entities"]))
+            )
+        else:
+            decision.pop("message_entities", None)
+        triplets = [
+            triplet
+            for triplet in decision.get("triplets") or []
+            if isinstance(triplet, list) and len(triplet) == 3
+        ]
+        if triplets:
+            # add_relationships persists the graph, so keep it off the loop
+            self._submit_background(self._store_triplets, triplets)
+        return decision
+
+    @staticmethod
+    def _store_triplets(triplets: List[List[str]]):
+        graph_memory.add_relationships(
+            [(str(e1), str(r), str(e2), None) for e1, r, e2 in triplets]
+        )
+
+    @staticmethod
+    async def _from_preflight(
+        preflight: Awaitable[Dict[str, Any]],
+        key: str,
+        fallback: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """`preflight[key]`, or the result of the separate call it replaces."""
+        decision = await preflight
+        if key in decision:
+            return decision[key]
+        return await fallback()
+
+    async def _llm_route_decision(self, message: str) -> Dict[str, Any]:
+        # Routing is a short classification, so it goes to the fast model
+        routing_prompt = f'{ORCHESTRATOR_PROMPT}\n\nInput: "{message}"\n\nOutput JSON:'
+        router_response_dict = await self.service_manager.generate_response(
+            routing_prompt, response_format=ROUTER_RESPONSE_FORMAT, fast=True
+        )
+        router_response = router_response_dict.get("content") or ""
+        # Models sometimes wrap the object in prose or ``` fences
+        return json_loads(extract_first_json_object(router_response))
+
+    async def _llm_route(self, message: str) -> str:
+        """Ask the orchestrator LLM which agent should handle the message."""
+        try:
+            # Routing depends only on the message, so decisions are cached by
+            # the normalized text (case and whitespace are ignored).
+            normalized = " ".join(message.split())
+            decision = await cached_request(
+                request_cache_key(ORCHESTRATOR_PROMPT, normalized.lower()),
+                CFG.deterministic_cache_ttl,
+                lambda: self._llm_route_decision(normalized),
+            )
+
+            agent_name = decision.get("agent", "generalist").lower()
+            reason = decision.get("reason", "Defaulting to generalist")
+
+            logger.info(f"Orchestrator routed to '{agent_name}' because: {reason}")
+            return agent_name
+
+        except Exception as e:
+            logger.error(f"Orchestration failed, falling back to Generalist: {e}")
+            return "generalist"
+
     @observability.trace(name="orchestrator_route_and_generate")
     async def route_and_generate(
-        self, message: str, draft_mode: bool = False
+        self,
+        message: str,
+        draft_mode: bool = False,
+        temperature: float = None,
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None,
     ) -> Dict[str, Any]:
         """
         Main entry point for the multi-agent system.
-        Returns a dictionary with 'response', 'agent', and optional 'tool'.
+        Returns a dictionary with 'response', 'agent', and optional 'tool';
+        'cacheable' is True when the answer may be replayed to other callers.
+        If `on_delta` is given, the agent's answer is streamed to it as it is
+        generated (see stream_route_and_generate).
         """
         # --- PII MASKING (Security) ---
         message = pii_masker.mask(message)
+        # Short, code-free prompts are answered by the fast model, at the
+        # trivial temperature unless the caller sets one; setting
+        # AI_TRIVIAL_TEMPERATURE=0 lets the answer caches below replay them
+        fast = classify_complexity(message) == "trivial"
+        if temperature is None:
+            temperature = CFG.trivial_temperature if fast else CFG.temperature
+
+        # A near-identical question answered before skips the whole pipeline
+        use_response_cache = CFG.response_cache and temperature == 0 and not draft_mode
+        exact_key = message.strip().lower()
+        if use_response_cache:
+            cached = self._exact_cache_get(exact_key)
+            if cached is None:
+                cached = await asyncio.to_thread(
+                    memory_manager.get_cached_response,
+                    message,
+                    CFG.response_cache_max_distance,
+                )
+            if cached is not None:
+                logger.info("Response cache hit")
+                if on_delta is not None and cached.get("response"):
+                    await on_delta(cached["response"])
+                return cached
         # ... (lines 497-599 remain same, need to be careful with context)
         # Actually I need to replace the signature and the tool execution block
 
         # ...
 
+        # Independent network/CPU work starts up front and is awaited when
+        # needed: memory search, entity extraction and the routing call.
+        memory_task = asyncio.create_task(
+            asyncio.to_thread(memory_manager.search_memory, message)
+        )
+        preflight_task = None
+        if CFG.combined_preflight:
+            # One LLM call answers routing and the message's entity extraction;
+            # context entities are extracted once the memory search returns
+            preflight_task = asyncio.create_task(self._preflight(message))
+            entities_task = asyncio.create_task(
+                self._from_preflight(
+                    preflight_task,
+                    "message_entities",
+                    lambda: self._extract_entities_for_graph(message),
+                )
+            )
+        elif CFG.batch_extraction:
+            # Extracted together with the context entities in one batched call
+            entities_task = None
+        else:
+            entities_task = asyncio.create_task(
+                self._extract_entities_for_graph(message)
+            )
+
+        speculative_response = None
+        route_task = None
+        agent_name = fast_route(message)
+        if agent_name:
+            logger.info(f"Fast-routed to '{agent_name}' by keyword match")
+        elif preflight_task is not None:
+            route_task = asyncio.create_task(
+                self._from_preflight(
+                    preflight_task, "agent", lambda: self._llm_route(message)
+                )
+            )
+        else:
+            route_task = asyncio.create_task(self._llm_route(message))
+
         # 0. MEMORY: Retrieve relevant context
         try:
             # 0.1 Semantic RAG
-            context_docs = memory_manager.search_memory(message)
+            context_docs = await memory_task
 
             # 0.2 Multi-hop Graph RAG (New Phase 13)
-            graph_context = await self._multi_hop_graph_search(message, context_docs)
+            graph_context = await self._multi_hop_graph_search(
+                message, context_docs, message_entities=entities_task
+            )
 
             context_str = "\n- ".join(context_docs) if context_docs else ""
             if graph_context:
@@ -611,51 +1762,59 @@ class AgentOrchestrator:
                 logger.info(f"Retrieved {len(context_docs)} memories and graph facts")
         except Exception as e:
             logger.error(f"Memory retrieval failed: {e}")
+            if entities_task is not None:
+                entities_task.cancel()
             context_str = ""
 
-        # 1. ORCHESTRATION: Decide which agent to use
-        try:
-            # We use the primary service (Groq) for fast routing
-            routing_prompt = (
-                f'{ORCHESTRATOR_PROMPT}\n\nInput: "{message}"\n\nOutput JSON:'
-            )
-            router_response_dict = await self.service_manager.generate_response(
-                routing_prompt
-            )
-            router_response = router_response_dict.get("content", "")
+        available_tools = tool_registry.get_schemas()
 
-            clean_json = (
-                router_response.replace("```json", "").replace("```", "").strip()
+        # 1. ORCHESTRATION: Decide which agent to use
+        speculate = CFG.speculative_generalist
+        if route_task is not None and speculate and not draft_mode:
+            # Overlap the routing call with the most likely answer; the
+            # speculative response is discarded unless routing agrees.
+            generalist = resolve("generalist")
+            agent_name, speculative_response = await asyncio.gather(
+                route_task,
+                self.call_agent(
+                    generalist,
+                    self._build_messages(generalist, message, context_str),
+                    tools=available_tools,
+                    temperature=temperature,
+                    fast=fast,
+                ),
+                return_exceptions=True,
             )
-            decision = json.loads(clean_json)
-
-            agent_name = decision.get("agent", "generalist").lower()
-            reason = decision.get("reason", "Defaulting to generalist")
-
-            logger.info(f"Orchestrator routed to '{agent_name}' because: {reason}")
-
-        except Exception as e:
-            logger.error(f"Orchestration failed, falling back to Generalist: {e}")
-            agent_name = "generalist"
+            if isinstance(agent_name, BaseException):
+                agent_name = "generalist"
+            if isinstance(speculative_response, BaseException) or (
+                agent_name != "generalist"
+            ):
+                speculative_response = None
+        elif route_task is not None:
+            agent_name = await route_task
 
         # 2. EXECUTION: Call the selected agent with Tool Loop
-        selected_agent = AGENTS.get(agent_name, AGENTS[AgentType.GENERALIST.value])
-
-        # Initialize conversation history with System Prompt and Context
-        system_content = selected_agent.system_prompt
-        if context_str:
-            system_content += f"\n\nRELEVANT CONTEXT FROM MEMORY:\n{context_str}\n\nUse the above context to answer if relevant."
+        selected_agent = resolve(agent_name)
 
-        messages = [
-            {"role": "system", "content": system_content},
-            {"role": "user", "content": message},
-        ]
+        if temperature == 0 and not draft_mode:
+            # Embedding the message blocks, so it runs off the shared loop
+            cached = await asyncio.to_thread(
+                semantic_cache.get, selected_agent, message
+            )
+            if cached is not None:
+                logger.info(f"Semantic cache hit for agent '{agent_name}'")
+                if on_delta is not None and cached.get("response"):
+                    await on_delta(cached["response"])
+                return {**cached, "agent": agent_name}
 
-        available_tools = tool_registry.get_schemas()
+        messages = self._build_messages(selected_agent, message, context_str)
 
         final_response_text = ""
         tool_used = None
         tool_output = None
+        failed = False
+        seen_tool_outputs = set()
 
         # Max turns to prevent infinite loops (e.g., agent keeps calling tools)
         MAX_TURNS = 5
@@ -663,9 +1822,26 @@ class AgentOrchestrator:
         for turn in range(MAX_TURNS):
             try:
                 # Call AI Service
-                response_dict = await self.service_manager.generate_response(
-                    messages, tools=available_tools
-                )
+                if turn == 0 and speculative_response is not None:
+                    response_dict = speculative_response
+                    if on_delta is not None and not response_dict.get("tool_calls"):
+                        await on_delta(response_dict.get("content") or "")
+                elif on_delta is not None:
+                    response_dict = await self.stream_agent(
+                        selected_agent,
+                        messages,
+                        on_delta,
+                        tools=available_tools,
+                        temperature=temperature,
+                    )
+                else:
+                    response_dict = await self.call_agent(
+                        selected_agent,
+                        messages,
+                        tools=available_tools,
+                        temperature=temperature,
+                        fast=fast,
+                    )
 
                 response_content = response_dict.get("content")
                 tool_calls = response_dict.get("tool_calls")
@@ -707,50 +1883,30 @@ class AgentOrchestrator:
                         f"Executing {len(tool_calls)} tool calls (Turn {turn + 1})"
                     )
 
-                    for tool_call in tool_calls:
+                    tool_results = await tool_executor.execute_parallel(tool_calls)
+
+                    for tool_call, tool_result in zip(tool_calls, tool_results):
                         function_name = tool_call["function"]["name"]
-                        function_args_str = tool_call["function"]["arguments"]
                         tool_call_id = tool_call.get(
                             "id", f"call_{function_name}_{turn}"
                         )  # ID is required for tool role
 
                         tool_used = function_name
-                        tool_result = f"Error: Tool {function_name} not found"
-
-                        tool = tool_registry.get_tool(function_name)
-                        if tool:
-                            try:
-                                # Parse args
-                                try:
-                                    kwargs = json.loads(function_args_str)
-                                except json.JSONDecodeError:
-                                    # Fallback hacks for bad JSON
-                                    kwargs = (
-                                        {"expression": function_args_str}
-                                        if function_name == "calculator"
-                                        else {"query": function_args_str}
-                                    )
-
-                                # Execute
-                                try:
-                                    tool_result = tool.execute(**kwargs)
-                                except TypeError:
-                                    if kwargs:
-                                        tool_result = tool.execute(
-                                            list(kwargs.values())[0]
-                                        )
-                                    else:
-                                        tool_result = tool.execute()
-                            except Exception as e:
-                                tool_result = f"Error executing tool: {e}"
-
-                        # Append Tool Output
+
+                        # Append Tool Output (truncated; repeats are not re-sent)
+                        content = str(tool_result)[:MAX_TOOL_CHARS]
+                        content_hash = hashlib.blake2b(
+                            content.encode(), digest_size=16
+                        ).digest()
+                        if content_hash in seen_tool_outputs:
+                            content = DUPLICATE_TOOL_OUTPUT
+                        seen_tool_outputs.add(content_hash)
                         messages.append(
                             {
                                 "role": "tool",
                                 "tool_call_id": tool_call_id,
                                 "name": function_name,
-                                "content": str(tool_result),
+                                "content": content,
                             }
                         )
 
@@ -759,74 +1915,131 @@ class AgentOrchestrator:
                             f"Tool '{function_name}' output: {str(tool_result)[:50]}..."
                         )
 
+                    messages = await self._compact_history(messages)
+
             except Exception as e:
                 logger.error(f"Error in execution loop: {e}")
+                failed = True
                 final_response_text = (
                     f"I encountered an error while processing your request: {e}"
                 )
                 break
 
+        # 2.5 SUB-AGENT REVIEW: let the Reviewer check the Coder's answer
+        if (
+            agent_name == "coder"
+            and final_response_text
+            and not draft_mode
+            and CFG.coder_auto_review
+        ):
+            reviewer = resolve("reviewer")
+            [review] = await self.run_subagents(
+                [
+                    (
+                        reviewer,
+                        self._build_messages(
+                            reviewer,
+                            f"Review this answer to: {message}\n\n{final_response_text}",
+                            "",
+                        ),
+                    )
+                ]
+            )
+            if review.get("content"):
+                final_response_text += f"\n\n**Review:** {review['content']}"
+
         # 2.6 STRUICTURED UI EXTRACTION (Generative UI)
         suggestions = []
         charts = []
 
         if final_response_text:
-            # Extract suggestions
-            try:
-                import re
-
-                sugg_match = re.search(
-                    r"```json-suggestions\n(.*?)\n```", final_response_text, re.DOTALL
-                )
-                if sugg_match:
-                    suggestions = json.loads(sugg_match.group(1))
-                    # Remove the block from the text to keep it clean
-                    final_response_text = final_response_text.replace(
-                        sugg_match.group(0), ""
-                    ).strip()
-            except Exception as e:
-                logger.error(f"Failed to extract suggestions: {e}")
-
-            # Extract charts
-            try:
-                chart_matches = re.finditer(
-                    r"```json-chart\n(.*?)\n```", final_response_text, re.DOTALL
-                )
-                for match in chart_matches:
-                    charts.append(json.loads(match.group(1)))
-                    final_response_text = final_response_text.replace(
-                        match.group(0), ""
-                    ).strip()
-            except Exception as e:
-                logger.error(f"Failed to extract charts: {e}")
+            final_response_text, suggestions, charts = _extract_ui_blocks(
+                final_response_text
+            )
 
-        # 3. MEMORY: Store the interaction
+        # 3. MEMORY: Store the interaction (after the response is returned)
         try:
             # We store the final User/Assistant pair
-            memory_manager.add_memory(message, {"role": "user", "agent": agent_name})
-
-            # --- GRAPH ENRICHMENT (New Phase 13) ---
-            # Try to learn new relationships from the interaction
-            import asyncio
-
-            asyncio.create_task(
-                self._extract_and_store_graph_triplets(
-                    f"User: {message}\nAssistant: {final_response_text}"
-                )
+            self._submit_background(
+                memory_manager.add_memory,
+                message,
+                {"role": "user", "agent": agent_name},
+            )
+            self._submit_background(
+                self._enrich_graph_blocking,
+                f"User: {message}\nAssistant: {final_response_text}",
+                pool=_GRAPH_POOL,
             )
         except Exception as e:
             logger.error(f"Failed to store memory or enrich graph: {e}")
 
-        return {
+        # Only deterministic (temperature=0), tool-free, successful answers are
+        # safe to replay; in practice these are the trivial prompts
+        cacheable = bool(
+            temperature == 0
+            and not tool_used
+            and not draft_mode
+            and not failed
+            and final_response_text
+        )
+        result = {
             "response": final_response_text,
             "agent": agent_name,
             "tool": tool_used,
             "tool_output": tool_output,
             "suggestions": suggestions,
             "charts": charts,
+            "cacheable": cacheable,
         }
 
+        if cacheable:
+            self._submit_background(semantic_cache.put, selected_agent, message, result)
+            if use_response_cache:
+                self._exact_cache_put(exact_key, result)
+                self._submit_background(memory_manager.cache_response, message, result)
+
+        return result
+
+    async def stream_route_and_generate(
+        self, message: str, draft_mode: bool = False, temperature: float = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of route_and_generate.
+        Yields {"type": "delta", "content": str} events while the agent answers,
+        then one {"type": "final", ...} event carrying the full result. The
+        final response is post-processed (suggestion/chart blocks removed,
+        review appended), so clients should replace the streamed text with it.
+        """
+        deltas: asyncio.Queue = asyncio.Queue()
+
+        async def on_delta(text: str):
+            deltas.put_nowait(text)
+
+        task = asyncio.create_task(
+            self.route_and_generate(
+                message,
+                draft_mode=draft_mode,
+                temperature=temperature,
+                on_delta=on_delta,
+            )
+        )
+        task.add_done_callback(lambda _: deltas.put_nowait(None))
+        try:
+            while (text := await deltas.get()) is not None:
+                if text:
+                    yield {"type": "delta", "content": text}
+            yield {"type": "final", **task.result()}
+        finally:
+            task.cancel()
+
 
 # Global Orchestrator instance
 # We need to initialize this *after* ai_manager is created
 orchestrator = AgentOrchestrator(ai_manager)
+
+
+def call_agent_sync(
+    persona: AgentPersona, messages: List[Dict[str, Any]], **kwargs
+) -> Dict[str, Any]:
+    """Blocking wrapper around `orchestrator.call_agent` for sync callers."""
+    return asyncio.run(orchestrator.call_agent(persona, messages, **kwargs))
@@ -0,0 +1,17 @@
+"""
+Freeze the persona definitions into chatbot_app/personas.mp.
+
+Usage:
+    python -m chatbot_app.build_personas
+"""
+
+from .agents import AGENTS, PERSONAS_BLOB, dump_personas
+
+
+def main():
+    dump_personas(AGENTS)
+    print(f"Wrote {len(AGENTS)} personas to {PERSONAS_BLOB}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Request coalescing for deterministic, tool-free agent calls.
+Concurrent requests to the same persona (with the same system messages) that
+arrive within a short window are answered by one LLM call: the persona
+prompt is sent once and the user turns are separated by a sentinel.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+BATCH_SENTINEL = "<<<NEXT ANSWER>>>"
+
+Generate = Callable[[List[Dict[str, Any]]], Awaitable[Dict[str, Any]]]
+
+
+class RequestCoalescer:
+    """
+    Batches up to `max_batch` user turns per (persona, system messages) key.
+    Callers run on different event loops (the shared views loop and the
+    background loop in ai_services), so batches are shared across threads
+    with a lock and concurrent futures; the first caller in a window is the
+    leader and makes the LLM call.
+    """
+
+    def __init__(self, window: float = 0.02, max_batch: int = 8):
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: Dict[str, List[Tuple[str, Future]]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _batch_key(digest: str, system_messages: List[Dict[str, Any]]) -> str:
+        system_hash = hashlib.sha256(
+            json.dumps(system_messages, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        return f"{digest}:{system_hash}"
+
+    async def submit(
+        self, digest: str, messages: List[Dict[str, Any]], generate: Generate
+    ) -> Dict[str, Any]:
+        """
+        `messages` must be system messages followed by exactly one user turn.
+        Returns the same shape as AIServiceManager.generate_response.
+        """
+        system_messages, user_message = messages[:-1], messages[-1]["content"]
+        key = self._batch_key(digest, system_messages)
+        future: Future = Future()
+
+        with self._lock:
+            batch = self._pending.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._pending[key] = []
+            batch.append((user_message, future))
+            if len(batch) >= self.max_batch:
+                # Full: later callers start a new batch.
+                self._pending.pop(key, None)
+
+        if leader:
+            try:
+                await asyncio.sleep(self.window)
+                with self._lock:
+                    if self._pending.get(key) is batch:
+                        del self._pending[key]
+                await self._flush(system_messages, batch, generate)
+            finally:
+                # A cancelled leader (timeout, hedge loser, client gone) must
+                # not leave its followers waiting forever
+                with self._lock:
+                    if self._pending.get(key) is batch:
+                        del self._pending[key]
+                for _, pending in batch:
+                    if not pending.done():
+                        pending.set_exception(
+                            RuntimeError("Coalesced batch was abandoned by its leader")
+                        )
+
+        return await asyncio.wrap_future(future)
+
+    async def _flush(
+        self,
+        system_messages: List[Dict[str, Any]],
+        batch: List[Tuple[str, Future]],
+        generate: Generate,
+    ):
+        if len(batch) > 1:
+            try:
+                answers = await self._generate_batched(system_messages, batch, generate)
+                for (_, future), answer in zip(batch, answers):
+                    future.set_result({"content": answer, "tool_calls": None})
+                logger.info(f"Coalesced {len(batch)} requests into one LLM call")
+                return
+            except Exception as e:
+                logger.warning(f"Batched call failed, answering individually: {e}")
+
+        # Single request, or the batched answer could not be split.
+        results = await asyncio.gather(
+            *[
+                generate(system_messages + [{"role": "user", "content": message}])
+                for message, _ in batch
+            ],
+            return_exceptions=True,
+        )
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def _generate_batched(
+        self,
+        system_messages: List[Dict[str, Any]],
+        batch: List[Tuple[str, Future]],
+        generate: Generate,
+    ) -> List[str]:
+        requests = "\n\n".join(
+            f"Request {i}:\n{message}" for i, (message, _) in enumerate(batch, 1)
+        )
+        prompt = (
+            f"Answer each of the following {len(batch)} independent requests on "
+            f"its own, in order. Put a line containing only {BATCH_SENTINEL} "
+            f"between consecutive answers and do not number them.\n\n{requests}"
+        )
+        response = await generate(
+            system_messages + [{"role": "user", "content": prompt}]
+        )
+        answers = [
+            part.strip()
+            for part in (response.get("content") or "").split(BATCH_SENTINEL)
+        ]
+        if len(answers) != len(batch) or not all(answers):
+            raise ValueError(f"expected {len(batch)} answers, got {len(answers)}")
+        return answers
+
+
+# Global instance
+request_coalescer = RequestCoalescer()
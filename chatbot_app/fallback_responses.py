@@ -3,13 +3,39 @@ Fallback response system for when the Gemini API is unavailable.
 Provides basic conversational responses with personality.
 """
 
+import functools
 import random
+import re
 from typing import Dict, List
 
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+WORD_RE = re.compile(r"[a-z']+")
+
 class FallbackResponses:
     """Fallback response generator for basic chatbot functionality."""
+
+    # (category, keywords) in priority order: greetings before help, etc.
+    KEYWORDS = (
+        ('greetings', ('hello', 'hi', 'hey', 'greetings')),
+        ('goodbyes', ('bye', 'goodbye', 'see you', 'farewell')),
+        ('thanks', ('thank', 'thanks', 'appreciate')),
+        ('how_are_you', ('how are you', 'how do you do', 'how are you doing')),
+        ('main_menu', ('menu', 'main menu', 'options', 'start', 'begin')),
+        ('contact', ('contact', 'phone', 'email', 'address', 'reach')),
+        ('services', ('service', 'services', 'offer', 'provide', 'consulting', 'support')),
+        ('hours', ('hours', 'time', 'schedule', 'open', 'close', 'available')),
+        ('location', ('location', 'direction', 'address', 'where', 'find', 'parking')),
+        ('human_support', ('human', 'person', 'agent', 'representative', 'talk to someone', 'live person')),
+        ('help', ('help', 'assist', 'support')),
+    )
     
     def __init__(self):
+        self._automaton = None
+        self._pattern = None
         self.responses = {
             'greetings': [
                 "👋 Hey there! Welcome! I'm so excited to help you today! What can I do for you?",
@@ -76,57 +102,55 @@ class FallbackResponses:
                 "That's fascinating! How can I help you with this topic? ✨",
             ]
         }
+        self.responses = {k: tuple(v) for k, v in self.responses.items()}
+        self._rng = random.Random()
+        self._build_matcher()
+        # Category per normalized input; the response itself is still random
+        self._classify = functools.lru_cache(maxsize=2048)(self._match_category)
     
+    def _build_matcher(self):
+        """
+        Map every keyword to its category's priority (first category wins).
+        Single words become a set-style lookup on the input's tokens; only
+        multi-word phrases are searched for in the text.
+        """
+        priorities = {}
+        for priority, (category, keywords) in enumerate(self.KEYWORDS):
+            for keyword in keywords:
+                priorities.setdefault(keyword, (priority, category))
+        self._words = {kw: value for kw, value in priorities.items() if ' ' not in kw}
+        phrases = {kw: value for kw, value in priorities.items() if ' ' in kw}
+
+        if ahocorasick is not None:
+            automaton = ahocorasick.Automaton()
+            for phrase, value in phrases.items():
+                automaton.add_word(phrase, value)
+            automaton.make_automaton()
+            self._automaton = automaton
+        else:
+            # Lookahead finds a match at every position; alternatives are in
+            # priority order, so each position reports its best phrase.
+            ordered = sorted(phrases, key=lambda kw: phrases[kw][0])
+            self._pattern = re.compile(
+                '(?=(' + '|'.join(map(re.escape, ordered)) + '))'
+            )
+        self._phrases = phrases
+
+    def _match_category(self, text: str) -> str:
+        """Tokenize once; the highest-priority word or phrase hit wins."""
+        words = self._words
+        hits = [words[token] for token in WORD_RE.findall(text) if token in words]
+        if self._automaton is not None:
+            hits.extend(value for _, value in self._automaton.iter(text))
+        else:
+            hits.extend(self._phrases[m.group(1)] for m in self._pattern.finditer(text))
+        best = min(hits, default=None)
+        return best[1] if best else 'unknown'
+
     def get_response(self, user_input: str) -> str:
         """Get a fallback response based on user input."""
         user_input_lower = user_input.lower().strip()
-        
-        # Check for greetings
-        if any(word in user_input_lower for word in ['hello', 'hi', 'hey', 'greetings']):
-            return random.choice(self.responses['greetings'])
-        
-        # Check for goodbyes
-        if any(word in user_input_lower for word in ['bye', 'goodbye', 'see you', 'farewell']):
-            return random.choice(self.responses['goodbyes'])
-        
-        # Check for thanks
-        if any(word in user_input_lower for word in ['thank', 'thanks', 'appreciate']):
-            return random.choice(self.responses['thanks'])
-        
-        # Check for "how are you"
-        if any(phrase in user_input_lower for phrase in ['how are you', 'how do you do', 'how are you doing']):
-            return random.choice(self.responses['how_are_you'])
-        
-        # Check for main menu requests
-        if any(word in user_input_lower for word in ['menu', 'main menu', 'options', 'start', 'begin']):
-            return random.choice(self.responses['main_menu'])
-        
-        # Check for contact information
-        if any(word in user_input_lower for word in ['contact', 'phone', 'email', 'address', 'reach']):
-            return random.choice(self.responses['contact'])
-        
-        # Check for services
-        if any(word in user_input_lower for word in ['service', 'services', 'offer', 'provide', 'consulting', 'support']):
-            return random.choice(self.responses['services'])
-        
-        # Check for business hours
-        if any(word in user_input_lower for word in ['hours', 'time', 'schedule', 'open', 'close', 'available']):
-            return random.choice(self.responses['hours'])
-        
-        # Check for location
-        if any(word in user_input_lower for word in ['location', 'direction', 'address', 'where', 'find', 'parking']):
-            return random.choice(self.responses['location'])
-        
-        # Check for human support
-        if any(word in user_input_lower for word in ['human', 'person', 'agent', 'representative', 'talk to someone', 'live person']):
-            return random.choice(self.responses['human_support'])
-        
-        # Check for help requests
-        if any(word in user_input_lower for word in ['help', 'assist', 'support']):
-            return random.choice(self.responses['help'])
-        
-        # Default response for unknown inputs
-        return random.choice(self.responses['unknown'])
+        return self._rng.choice(self.responses[self._classify(user_input_lower)])
 
 # Global instance
 fallback = FallbackResponses()
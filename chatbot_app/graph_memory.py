@@ -1,11 +1,24 @@
 import networkx as nx
+import atexit
 import logging
-import json
 import os
-from typing import List, Dict, Any, Tuple
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import List, Dict, Any, Optional, Tuple
+
+from .json_utils import dumps as json_dumps, loads as json_loads
 
 logger = logging.getLogger(__name__)
 
+# get_related_entities results are reused for this long (and dropped on writes)
+RELATED_CACHE_TTL = 60.0
+RELATED_CACHE_SIZE = 256
+
+# New edges are appended to a log next to the snapshot; the log is folded
+# into the snapshot after this many writes (and at shutdown)
+SNAPSHOT_EVERY = 500
+
 
 class GraphManager:
     """
@@ -16,14 +29,76 @@ class GraphManager:
     def __init__(self, persistence_path="graph_db.json"):
         self.persistence_path = persistence_path
         self.graph = nx.MultiDiGraph()
+        # (entity, depth) -> (expires_at, triplets), least recently used first
+        self._related_cache: OrderedDict = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Guards graph mutation, the edge log and snapshots
+        self._write_lock = threading.RLock()
+        self.log_path = f"{persistence_path}.log"
+        self._log = None
+        self._writes_since_snapshot = 0
+        # search_graph inverted index: lowercase word -> nodes / (u, key, v) edges
+        self._node_tokens: Dict[str, set] = defaultdict(set)
+        self._edge_tokens: Dict[str, set] = defaultdict(set)
+        # node -> lowercase name, so searches never re-lower node names
+        self._node_lower: Dict[str, str] = {}
         self._load_graph()
+        self._rebuild_index()
+        self._open_log()
+
+    def _index_node(self, node: str):
+        if node in self._node_lower:
+            return
+        lower = self._node_lower[node] = node.lower()
+        for word in lower.split():
+            self._node_tokens[word].add(node)
+
+    def _index_edge(self, u: str, key: str, v: str):
+        for word in key.lower().split():
+            self._edge_tokens[word].add((u, key, v))
+
+    def _rebuild_index(self):
+        self._node_tokens.clear()
+        self._edge_tokens.clear()
+        self._node_lower.clear()
+        for node in self.graph.nodes():
+            self._index_node(node)
+        for u, v, key in self.graph.edges(keys=True):
+            self._index_edge(u, key, v)
+
+    def _open_log(self):
+        try:
+            self._log = open(self.log_path, "a", buffering=1, encoding="utf-8")
+        except OSError as e:
+            logger.error(f"Failed to open graph log: {e}")
+
+    def _replay_log(self):
+        """Apply edges written since the last snapshot."""
+        if not os.path.exists(self.log_path):
+            return
+        replayed = 0
+        with open(self.log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json_loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-write
+                    logger.warning("Skipping unreadable graph log line")
+                    continue
+                self.graph.add_edge(
+                    entry["s"], entry["t"], key=entry["r"], **entry.get("d", {})
+                )
+                replayed += 1
+        self._writes_since_snapshot = replayed
+        if replayed:
+            logger.info(f"Replayed {replayed} edges from {self.log_path}")
 
     def _load_graph(self):
-        """Load graph from a JSON file."""
+        """Load graph from the JSON snapshot, then replay the edge log."""
         if os.path.exists(self.persistence_path):
             try:
-                with open(self.persistence_path, "r") as f:
-                    data = json.load(f)
+                with open(self.persistence_path, "rb") as f:
+                    data = json_loads(f.read())
                     # Simple node/edge reconstruction
                     for node in data.get("nodes", []):
                         self.graph.add_node(node["id"], **node.get("data", {}))
@@ -39,25 +114,47 @@ class GraphManager:
                 )
             except Exception as e:
                 logger.error(f"Failed to load graph: {e}")
-
-    def save_graph(self):
-        """Save graph to a JSON file."""
         try:
-            data = {
-                "nodes": [
-                    {"id": node, "data": self.graph.nodes[node]}
-                    for node in self.graph.nodes()
-                ],
-                "edges": [
-                    {"source": u, "target": v, "relation": key, "data": data}
-                    for u, v, key, data in self.graph.edges(keys=True, data=True)
-                ],
-            }
-            with open(self.persistence_path, "w") as f:
-                json.dump(data, f, indent=2)
-            logger.info(f"Graph saved to {self.persistence_path}")
+            self._replay_log()
         except Exception as e:
-            logger.error(f"Failed to save graph: {e}")
+            logger.error(f"Failed to replay graph log: {e}")
+
+    def save_graph(self):
+        """
+        Write a full snapshot to the JSON file (atomically) and truncate the
+        edge log it now contains.
+        """
+        with self._write_lock:
+            try:
+                data = {
+                    "nodes": [
+                        {"id": node, "data": self.graph.nodes[node]}
+                        for node in self.graph.nodes()
+                    ],
+                    "edges": [
+                        {"source": u, "target": v, "relation": key, "data": data}
+                        for u, v, key, data in self.graph.edges(keys=True, data=True)
+                    ],
+                }
+                tmp_path = f"{self.persistence_path}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(json_dumps(data))
+                os.replace(tmp_path, self.persistence_path)
+                if self._log is not None:
+                    self._log.truncate(0)
+                self._writes_since_snapshot = 0
+                logger.info(f"Graph saved to {self.persistence_path}")
+            except Exception as e:
+                logger.error(f"Failed to save graph: {e}")
+
+    def close(self):
+        """Fold the edge log into the snapshot and close it."""
+        with self._write_lock:
+            if self._writes_since_snapshot:
+                self.save_graph()
+            if self._log is not None:
+                self._log.close()
+                self._log = None
 
     def add_relationship(
         self, entity1: str, relation: str, entity2: str, metadata: Dict[str, Any] = None
@@ -65,16 +162,47 @@ class GraphManager:
         """
         Add a triplet (entity1, relation, entity2) to the graph.
         """
-        entity1 = entity1.strip().title()
-        entity2 = entity2.strip().title()
-        relation = relation.strip().lower()
+        self.add_relationships([(entity1, relation, entity2, metadata)])
 
-        self.graph.add_node(entity1)
-        self.graph.add_node(entity2)
-        self.graph.add_edge(entity1, entity2, key=relation, **(metadata or {}))
+    def add_relationships(
+        self, triplets: List[Tuple[str, str, str, Optional[Dict[str, Any]]]]
+    ):
+        """
+        Add several (entity1, relation, entity2, metadata) triplets with one
+        lock acquisition, one cache reset and one log write.
+        """
+        lines = []
+        with self._write_lock:
+            for entity1, relation, entity2, metadata in triplets:
+                entity1 = entity1.strip().title()
+                entity2 = entity2.strip().title()
+                relation = relation.strip().lower()
+
+                self.graph.add_node(entity1)
+                self.graph.add_node(entity2)
+                self.graph.add_edge(entity1, entity2, key=relation, **(metadata or {}))
+                self._index_node(entity1)
+                self._index_node(entity2)
+                self._index_edge(entity1, relation, entity2)
+                lines.append(
+                    json_dumps(
+                        {"s": entity1, "r": relation, "t": entity2, "d": metadata or {}}
+                    ).decode()
+                )
+            if not lines:
+                return
+            with self._cache_lock:
+                self._related_cache.clear()
 
-        # Proactive: Also save on every significant update for persistence
-        self.save_graph()
+            # Persist just these edges; the full snapshot is rewritten rarely
+            if self._log is not None:
+                try:
+                    self._log.write("\n".join(lines) + "\n")
+                except Exception as e:
+                    logger.error(f"Failed to append to graph log: {e}")
+            self._writes_since_snapshot += len(lines)
+            if self._writes_since_snapshot >= SNAPSHOT_EVERY:
+                self.save_graph()
 
     def get_related_entities(
         self, entity: str, depth: int = 1
@@ -87,33 +215,63 @@ class GraphManager:
         if not self.graph.has_node(entity):
             return []
 
+        key = (entity, depth)
+        now = time.monotonic()
+        with self._cache_lock:
+            cached = self._related_cache.get(key)
+            if cached and cached[0] > now:
+                self._related_cache.move_to_end(key)
+                return list(cached[1])
+
         triplets = []
-        # Use Breadth-First Search to find neighbors
-        edges = nx.bfs_edges(self.graph, entity, depth_limit=depth)
-        for u, v in edges:
-            # MultiDiGraph might have multiple edges between nodes
-            edge_data = self.graph.get_edge_data(u, v)
-            for relation in edge_data:
-                triplets.append((u, relation, v))
+        # The traversal and the cache fill hold the write lock: a concurrent
+        # add would change the graph mid-BFS, or clear the cache before a
+        # stale result is stored
+        with self._write_lock:
+            # Use Breadth-First Search to find neighbors
+            edges = nx.bfs_edges(self.graph, entity, depth_limit=depth)
+            for u, v in edges:
+                # MultiDiGraph might have multiple edges between nodes
+                edge_data = self.graph.get_edge_data(u, v)
+                for relation in edge_data:
+                    triplets.append((u, relation, v))
 
+            with self._cache_lock:
+                self._related_cache[key] = (now + RELATED_CACHE_TTL, tuple(triplets))
+                self._related_cache.move_to_end(key)
+                if len(self._related_cache) > RELATED_CACHE_SIZE:
+                    self._related_cache.popitem(last=False)
         return triplets
 
     def search_graph(self, query: str) -> List[str]:
         """
         Simple keyword-based search in the graph's nodes/edges.
+        Every word of the query must appear in the entity or relation name.
         """
         query_lower = query.lower()
-        results = []
-        for node in self.graph.nodes():
-            if query_lower in node.lower():
-                results.append(f"Entity: {node}")
+        words = query_lower.split()
+        if not words:
+            return []
 
-        for u, v, key in self.graph.edges(keys=True):
-            if query_lower in key.lower():
-                results.append(f"Relationship: {u} --({key})--> {v}")
+        def lookup(index: Dict[str, set]) -> set:
+            hits = set(index.get(words[0], ()))
+            for word in words[1:]:
+                hits &= index.get(word, set())
+            return hits
 
+        results = [
+            f"Entity: {node}"
+            for node in sorted(lookup(self._node_tokens))
+            if query_lower in self._node_lower[node]
+        ]
+        results.extend(
+            f"Relationship: {u} --({key})--> {v}"
+            for u, key, v in sorted(lookup(self._edge_tokens))
+            if query_lower in key.lower()
+        )
         return results
 
 
 # Global instance
 graph_memory = GraphManager()
+atexit.register(graph_memory.close)
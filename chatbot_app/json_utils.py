@@ -0,0 +1,68 @@
+"""
+JSON helpers for parsing model output.
+Uses orjson when it is installed and falls back to the standard library.
+"""
+
+import datetime
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(data: Any) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _default(obj: Any) -> Any:
+    # Match orjson, which writes dates and datetimes as ISO 8601 strings
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes (ready for an HTTP body)."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(
+        obj, separators=(",", ":"), ensure_ascii=False, default=_default
+    ).encode()
+
+
+def extract_first_json_object(s: str) -> str:
+    """
+    Return the first balanced {...} object in `s`, ignoring surrounding
+    prose or markdown fences. Braces inside string literals are skipped.
+    Raises ValueError when no complete object is found.
+    """
+    start = s.find("{")
+    if start < 0:
+        raise ValueError("no JSON object in model output")
+
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(s)):
+        ch = s[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return s[start : i + 1]
+    raise ValueError("unterminated JSON object in model output")
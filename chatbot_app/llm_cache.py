@@ -0,0 +1,174 @@
+"""
+Response caches that sit in front of agent LLM calls.
+- cached_completion: exact match on (persona, messages, model, temperature)
+- cached_request: exact match on a raw service request (routing, extraction)
+- SemanticCache: near-duplicate user questions per persona (embedding match)
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .agents import AgentPersona
+from .memory import memory_manager
+
+logger = logging.getLogger(__name__)
+
+
+def completion_cache_key(
+    persona: AgentPersona,
+    messages: List[Dict[str, Any]],
+    model: str,
+    temperature: float,
+) -> str:
+    messages_hash = hashlib.sha256(
+        json.dumps(messages, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    return f"llm:{persona.digest}:{messages_hash}:{model}:{temperature}"
+
+
+def request_cache_key(
+    model: str,
+    message: Any,
+    tools: List[Dict[str, Any]] = None,
+    response_format: Dict[str, Any] = None,
+    temperature: float = None,
+) -> str:
+    payload = json.dumps(
+        [model, message, tools, response_format, temperature],
+        sort_keys=True,
+        default=str,
+    )
+    return f"llmreq:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+
+async def cached_request(
+    key: str, ttl: int, generate: Callable[[], Awaitable[Dict[str, Any]]]
+) -> Dict[str, Any]:
+    """Return the cached response stored under `key`, or call `generate`."""
+    try:
+        cached = cache.get(key)
+    except Exception as e:
+        logger.error(f"LLM cache read failed: {e}")
+        cached = None
+    if cached is not None:
+        logger.info(f"LLM cache hit ({key[:24]})")
+        return cached
+
+    response = await generate()
+    try:
+        cache.set(key, response, ttl)
+    except Exception as e:
+        logger.error(f"LLM cache write failed: {e}")
+    return response
+
+
+async def cached_completion(
+    persona: AgentPersona,
+    messages: List[Dict[str, Any]],
+    model: str,
+    temperature: float,
+    generate: Callable[[], Awaitable[Dict[str, Any]]],
+) -> Dict[str, Any]:
+    """
+    Return a cached completion for an identical request, or call `generate`.
+    Only temperature=0 completions are cached (e.g. trivial prompts with
+    AI_TRIVIAL_TEMPERATURE=0); the key includes the persona's digest, so editing
+    a persona invalidates its entries.
+    """
+    if temperature != 0:
+        return await generate()
+
+    return await cached_request(
+        completion_cache_key(persona, messages, model, temperature),
+        getattr(settings, "LLM_CACHE_TTL", 3600),
+        generate,
+    )
+
+
+class SemanticCache:
+    """
+    Caches agent answers keyed by (persona, embedding of the user message).
+    A lookup hits when the cosine similarity to a stored question is above
+    `threshold`. Entries are partitioned by the persona's digest (a hash of
+    its system prompt), so editing a persona never serves stale answers, and
+    expire `ttl` seconds after they are stored.
+    """
+
+    def __init__(
+        self, threshold: float = 0.95, max_entries: int = 500, ttl: float = 3600
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # (name, digest) -> (unit vector, result, expires_at), oldest first
+        self._entries: Dict[
+            Tuple[str, str], Deque[Tuple[np.ndarray, Dict[str, Any], float]]
+        ] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _persona_key(persona: AgentPersona) -> Tuple[str, str]:
+        return persona.name, persona.digest
+
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        embedder = getattr(memory_manager, "embedder", None)
+        if embedder is None:
+            return None
+        try:
+            vector = np.asarray(embedder([text])[0], dtype=np.float32)
+        except Exception as e:
+            logger.error(f"Semantic cache embedding failed: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def get(self, persona: AgentPersona, message: str) -> Optional[Dict[str, Any]]:
+        """Return the cached result for a similar question, or None."""
+        entries = self._entries.get(self._persona_key(persona))
+        if not entries:
+            return None
+        vector = self._embed(message)
+        if vector is None:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            # Entries are appended in expiry order, so expired ones lead
+            while entries and entries[0][2] <= now:
+                entries.popleft()
+            snapshot = list(entries)
+        if not snapshot:
+            return None
+        matrix = np.stack([stored for stored, _, _ in snapshot])
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        if scores[best] >= self.threshold:
+            return snapshot[best][1]
+        return None
+
+    def put(self, persona: AgentPersona, message: str, result: Dict[str, Any]):
+        """Store a result. Callers must only pass deterministic answers."""
+        vector = self._embed(message)
+        if vector is None:
+            return
+        key = self._persona_key(persona)
+        with self._lock:
+            entries = self._entries.setdefault(key, deque(maxlen=self.max_entries))
+            entries.append((vector, result, time.monotonic() + self.ttl))
+
+
+# Global instance
+semantic_cache = SemanticCache(
+    threshold=getattr(settings, "SEMANTIC_CACHE_THRESHOLD", 0.95),
+    max_entries=getattr(settings, "SEMANTIC_CACHE_MAX_ENTRIES", 500),
+    ttl=getattr(settings, "SEMANTIC_CACHE_TTL", 3600),
+)
@@ -2,13 +2,29 @@ import chromadb
 from chromadb.utils import embedding_functions
 from sentence_transformers import CrossEncoder
 from rank_bm25 import BM25Okapi
+from django.conf import settings
 from .observability import observability
+from .json_utils import dumps as json_dumps, loads as json_loads
+from .onnx_models import OnnxCrossEncoder, OnnxEmbeddingFunction
+import atexit
 import logging
+import re
+import threading
+import time
 import uuid
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Questions that differ only in a number ("what is 2+3" / "what is 2+4")
+# embed almost identically, so a cached answer must match the query's numbers
+_NUMBERS = re.compile(r"\d+(?:\.\d+)?").findall
+
+# add_memory buffers documents and embeds them in one batch once this many
+# are pending, or after MEMORY_BATCH_DELAY seconds
+MEMORY_BATCH_SIZE = 8
+MEMORY_BATCH_DELAY = 0.1
+
 
 class MemoryManager:
     """
@@ -21,11 +37,22 @@ class MemoryManager:
     def __init__(self, persistence_path="chroma_db"):
         self.persistence_path = persistence_path
 
+        use_onnx = getattr(settings, "ONNX_INT8_MODELS", False)
+
         # 1. Vector Store (ChromaDB)
         try:
-            self.embedder = embedding_functions.SentenceTransformerEmbeddingFunction(
-                model_name="all-MiniLM-L6-v2"
-            )
+            self.embedder = None
+            if use_onnx:
+                try:
+                    self.embedder = OnnxEmbeddingFunction()
+                except Exception as e:
+                    logger.warning(f"Int8 ONNX embedder unavailable, using FP32: {e}")
+            if self.embedder is None:
+                self.embedder = (
+                    embedding_functions.SentenceTransformerEmbeddingFunction(
+                        model_name="all-MiniLM-L6-v2"
+                    )
+                )
             self.client = chromadb.PersistentClient(path=persistence_path)
             self.collection = self.client.get_or_create_collection(
                 name="chatbot_memory", embedding_function=self.embedder
@@ -35,19 +62,50 @@ class MemoryManager:
             logger.error(f"Failed to initialize ChromaDB: {e}")
             self.collection = None
 
+        # 1.1 Response Cache: past answers keyed by the question's embedding
+        self.response_cache = None
+        self.response_cache_max_entries = getattr(
+            settings, "RESPONSE_CACHE_MAX_ENTRIES", 1000
+        )
+        self.response_cache_ttl = getattr(settings, "RESPONSE_CACHE_TTL", 3600)
+        if self.collection is not None:
+            try:
+                self.response_cache = self.client.get_or_create_collection(
+                    name="response_cache",
+                    embedding_function=self.embedder,
+                    metadata={"hnsw:space": "cosine"},
+                )
+            except Exception as e:
+                logger.error(f"Failed to initialize response cache: {e}")
+
         # 2. Keyword Index (BM25) - In-memory for this demo
         # In a real production system, use Elasticsearch/Opensearch
         self.documents = []  # List of text documents
+        self._tokenized_docs = []  # Parallel to self.documents
         self.bm25 = None
+        # Inserts only mark the index stale; it is rebuilt on the next search
+        self._bm25_dirty = False
+        self._bm25_lock = threading.Lock()
+
+        # Memories waiting to be embedded: (text, metadata, id)
+        self._pending: List[Tuple[str, Dict[str, Any], str]] = []
+        self._pending_lock = threading.Lock()
+        self._flush_timer: Optional[threading.Timer] = None
         self._load_local_indices()
 
         # 3. Reranker (Cross-Encoder)
-        try:
-            # Efficient reranker model
-            self.reranker = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2")
-        except Exception as e:
-            logger.warning(f"Reranker could not be loaded: {e}")
-            self.reranker = None
+        self.reranker = None
+        if use_onnx:
+            try:
+                self.reranker = OnnxCrossEncoder()
+            except Exception as e:
+                logger.warning(f"Int8 ONNX reranker unavailable, using FP32: {e}")
+        if self.reranker is None:
+            try:
+                # Efficient reranker model
+                self.reranker = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2")
+            except Exception as e:
+                logger.warning(f"Reranker could not be loaded: {e}")
 
     def _load_local_indices(self):
         """Rebuild BM25 index from ChromaDB"""
@@ -59,33 +117,132 @@ class MemoryManager:
             data = self.collection.get()
             if data and data["documents"]:
                 self.documents = data["documents"]
-                tokenized_corpus = [doc.split(" ") for doc in self.documents]
-                self.bm25 = BM25Okapi(tokenized_corpus)
+                self._tokenized_docs = [doc.split(" ") for doc in self.documents]
+                self.bm25 = BM25Okapi(self._tokenized_docs)
         except Exception as e:
             logger.error(f"Failed to load BM25 index: {e}")
 
+    def _bm25_snapshot(self) -> Tuple[Optional[BM25Okapi], List[str]]:
+        """
+        Return the BM25 index and the documents it was built from, rebuilding
+        it first if memories were added since the last build. Both are taken
+        under the lock: flush() may extend self.documents right after, and
+        get_top_n needs a corpus of exactly the indexed size.
+        """
+        with self._bm25_lock:
+            if self._bm25_dirty:
+                self.bm25 = BM25Okapi(self._tokenized_docs)
+                self._bm25_dirty = False
+            return self.bm25, list(self.documents)
+
     def add_memory(self, text: str, metadata: Dict[str, Any] = None):
-        """Add memory to both Vector and Keyword indices."""
+        """
+        Queue a memory for both Vector and Keyword indices. Queued memories
+        are embedded together (see MEMORY_BATCH_SIZE / MEMORY_BATCH_DELAY).
+        """
         if not self.collection:
             return
 
+        with self._pending_lock:
+            self._pending.append((text, metadata or {}, str(uuid.uuid4())))
+            flush_now = len(self._pending) >= MEMORY_BATCH_SIZE
+            if not flush_now and self._flush_timer is None:
+                self._flush_timer = threading.Timer(MEMORY_BATCH_DELAY, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+        if flush_now:
+            self.flush()
+
+    def flush(self):
+        """Write all queued memories with one embedding batch."""
+        with self._pending_lock:
+            batch, self._pending = self._pending, []
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+        if not batch:
+            return
+
         try:
-            mem_id = str(uuid.uuid4())
+            texts = [text for text, _, _ in batch]
 
             # Add to Vector Store
             self.collection.add(
-                documents=[text], metadatas=[metadata or {}], ids=[mem_id]
+                documents=texts,
+                metadatas=[metadata for _, metadata, _ in batch],
+                ids=[mem_id for _, _, mem_id in batch],
             )
 
-            # Add to Keyword Index (Rebuild for simplicity in this demo)
-            self.documents.append(text)
-            tokenized_corpus = [doc.split(" ") for doc in self.documents]
-            self.bm25 = BM25Okapi(tokenized_corpus)
+            # Add to Keyword Index (rebuilt lazily by the next search)
+            with self._bm25_lock:
+                self.documents.extend(texts)
+                self._tokenized_docs.extend(text.split(" ") for text in texts)
+                self._bm25_dirty = True
 
-            logger.info(f"Added memory: {text[:50]}...")
+            logger.info(f"Added {len(batch)} memories: {texts[0][:50]}...")
         except Exception as e:
             logger.error(f"Failed to add memory: {e}")
 
+    def get_cached_response(
+        self, message: str, max_distance: float
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Return the stored result for the closest cached question, or None if
+        its cosine distance to `message` is above `max_distance`, it was
+        stored more than RESPONSE_CACHE_TTL seconds ago, or its numbers
+        differ from the message's.
+        """
+        if not self.response_cache:
+            return None
+
+        try:
+            if self.response_cache.count() == 0:
+                return None
+            hits = self.response_cache.query(
+                query_texts=[message],
+                n_results=1,
+                where={"created": {"$gte": time.time() - self.response_cache_ttl}},
+                include=["documents", "metadatas", "distances"],
+            )
+            if not hits["distances"] or not hits["distances"][0]:
+                return None
+            if hits["distances"][0][0] > max_distance:
+                return None
+            if _NUMBERS(hits["documents"][0][0]) != _NUMBERS(message):
+                return None
+            return json_loads(hits["metadatas"][0][0]["payload"])
+        except Exception as e:
+            logger.error(f"Response cache lookup failed: {e}")
+            return None
+
+    def cache_response(self, message: str, result: Dict[str, Any]):
+        """
+        Store a result for `message`, evicting the oldest entries when full.
+        Callers only pass deterministic answers (see route_and_generate).
+        """
+        if not self.response_cache:
+            return
+
+        try:
+            self.response_cache.add(
+                documents=[message],
+                metadatas=[
+                    {"payload": json_dumps(result).decode(), "created": time.time()}
+                ],
+                ids=[str(uuid.uuid4())],
+            )
+
+            excess = self.response_cache.count() - self.response_cache_max_entries
+            if excess > 0:
+                entries = self.response_cache.get(include=["metadatas"])
+                oldest = sorted(
+                    zip(entries["ids"], entries["metadatas"]),
+                    key=lambda entry: entry[1].get("created", 0),
+                )[:excess]
+                self.response_cache.delete(ids=[mem_id for mem_id, _ in oldest])
+        except Exception as e:
+            logger.error(f"Failed to cache response: {e}")
+
     @observability.trace(name="memory_search")
     def search_memory(self, query: str, n_results: int = 5) -> List[str]:
         """
@@ -97,26 +254,28 @@ class MemoryManager:
         if not self.collection:
             return []
 
-        candidates = set()
+        # Ordered set: vector hits first (by similarity), then new BM25 hits
+        candidates: Dict[str, None] = {}
 
         # 1. Vector Search
         try:
             vector_res = self.collection.query(query_texts=[query], n_results=n_results)
             if vector_res["documents"]:
-                for doc in vector_res["documents"][0]:
-                    candidates.add(doc)
+                candidates.update(dict.fromkeys(vector_res["documents"][0]))
         except Exception as e:
             logger.error(f"Vector search failed: {e}")
 
         # 2. Keyword Search (BM25)
-        if self.bm25:
+        try:
+            bm25, documents = self._bm25_snapshot()
+        except Exception as e:
+            logger.error(f"Failed to rebuild BM25 index: {e}")
+            bm25 = None
+        if bm25:
             try:
                 tokenized_query = query.split(" ")
-                keyword_res = self.bm25.get_top_n(
-                    tokenized_query, self.documents, n=n_results
-                )
-                for doc in keyword_res:
-                    candidates.add(doc)
+                keyword_res = bm25.get_top_n(tokenized_query, documents, n=n_results)
+                candidates.update(dict.fromkeys(keyword_res))
             except Exception as e:
                 logger.error(f"Keyword search failed: {e}")
 
@@ -126,12 +285,19 @@ class MemoryManager:
 
         unique_candidates = list(candidates)
 
-        # 3. Reranking
-        if self.reranker:
+        # 3. Reranking. With no more than n_results candidates (e.g. both
+        # searches returned the same documents) it cannot change the returned
+        # set, so the vector order is kept and the forward pass is skipped.
+        if self.reranker and len(unique_candidates) > n_results:
             try:
-                # Pair query with each candidate
+                # Pair query with each candidate, scored in a single batch
                 pairs = [[query, doc] for doc in unique_candidates]
-                scores = self.reranker.predict(pairs)
+                scores = self.reranker.predict(
+                    pairs,
+                    batch_size=min(32, len(pairs)),
+                    convert_to_numpy=True,
+                    show_progress_bar=False,
+                )
 
                 # Sort by score descending
                 scored_results = sorted(
@@ -149,3 +315,4 @@ class MemoryManager:
 
 # Global instance
 memory_manager = MemoryManager()
+atexit.register(memory_manager.flush)
@@ -2,14 +2,55 @@
 Custom middleware for rate limiting and input validation.
 """
 
+import re
 import time
 import logging
 from django.http import JsonResponse
 from django.core.cache import cache
 from django.conf import settings
 
+try:
+    import redis
+except ImportError:
+    redis = None
+
 logger = logging.getLogger(__name__)
 
+# Refill, check and consume in one round trip, atomically per bucket.
+# KEYS[1] = bucket; ARGV = capacity, refill per second, now, ttl
+LEAKY_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[4]))
+return allowed
+"""
+
+# Potential injection attempts, matched case-insensitively in one scan
+DANGEROUS_PATTERNS = [
+    "<script",
+    "</script>",
+    "javascript:",
+    "onload=",
+    "onerror=",
+    "eval(",
+    "exec(",
+    "system(",
+    "import os",
+    "__import__",
+]
+_DANGER_RE = re.compile("|".join(map(re.escape, DANGEROUS_PATTERNS)))
+
 
 class RateLimitMiddleware:
     """
@@ -23,6 +64,12 @@ class RateLimitMiddleware:
         self.capacity = getattr(settings, "RATE_LIMIT_CAPACITY", 5)
         # Leak rate (tokens per minute)
         self.leak_rate = getattr(settings, "RATE_LIMIT_LEAK_RATE", 10)
+        # With Redis the bucket update is one atomic script call (EVALSHA)
+        self.bucket_script = None
+        redis_url = getattr(settings, "REDIS_URL", None)
+        if redis is not None and redis_url:
+            client = redis.Redis.from_url(redis_url)
+            self.bucket_script = client.register_script(LEAKY_BUCKET_LUA)
 
     def __call__(self, request):
         # Only apply to chat endpoints
@@ -30,21 +77,8 @@ class RateLimitMiddleware:
             request.path == "/" or request.path == "/api/webhook/"
         ):
             client_ip = self.get_client_ip(request)
-            cache_key = f"leaky_bucket_{client_ip}"
 
-            # Bucket state: (tokens, last_update_time)
-            bucket = cache.get(cache_key, (self.capacity, time.time()))
-            tokens, last_update = bucket
-
-            # 1. Leak tokens based on elapsed time
-            now = time.time()
-            elapsed = now - last_update
-            # Refill rate is leak_rate/60 tokens per second
-            refill = elapsed * (self.leak_rate / 60.0)
-            tokens = min(self.capacity, tokens + refill)
-
-            # 2. Check if we have tokens to consume
-            if tokens < 1:
+            if not self.consume_token(client_ip):
                 logger.warning(
                     f"Rate limit exceeded (Leaky Bucket) for IP: {client_ip}"
                 )
@@ -56,15 +90,44 @@ class RateLimitMiddleware:
                     status=429,
                 )
 
-            # 3. Consume a token and update bucket
-            tokens -= 1
-            cache.set(
-                cache_key, (tokens, now), 3600
-            )  # Expire after 1 hour of inactivity
-
         response = self.get_response(request)
         return response
 
+    def consume_token(self, client_ip):
+        """Take one token from the client's bucket; False if it is empty."""
+        now = time.time()
+        # Refill rate is leak_rate/60 tokens per second
+        rate = self.leak_rate / 60.0
+
+        if self.bucket_script is not None:
+            try:
+                return bool(
+                    self.bucket_script(
+                        keys=[f"leaky_bucket:{client_ip}"],
+                        args=[self.capacity, rate, now, 3600],
+                    )
+                )
+            except Exception as e:
+                logger.error(f"Redis rate limit failed, using cache: {e}")
+
+        cache_key = f"leaky_bucket_{client_ip}"
+
+        # Bucket state: (tokens, last_update_time)
+        tokens, last_update = cache.get(cache_key, (self.capacity, now))
+
+        # 1. Leak tokens based on elapsed time
+        elapsed = now - last_update
+        tokens = min(self.capacity, tokens + elapsed * rate)
+
+        # 2. Check if we have tokens to consume
+        if tokens < 1:
+            return False
+
+        # 3. Consume a token and update bucket
+        tokens -= 1
+        cache.set(cache_key, (tokens, now), 3600)  # Expire after 1 hour of inactivity
+        return True
+
     def get_client_ip(self, request):
         """Get the client IP address from the request."""
         x_forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR")
@@ -115,25 +178,9 @@ class InputValidationMiddleware:
             return "Message is too long. Please keep it under 1000 characters."
 
         # Check for potential injection attempts
-        dangerous_patterns = [
-            "<script",
-            "</script>",
-            "javascript:",
-            "onload=",
-            "onerror=",
-            "eval(",
-            "exec(",
-            "system(",
-            "import os",
-            "__import__",
-        ]
-
-        user_input_lower = user_input.lower()
-        for pattern in dangerous_patterns:
-            if pattern in user_input_lower:
-                logger.warning(f"Potentially dangerous input detected: {pattern}")
-                return (
-                    "Message contains invalid characters. Please rephrase your message."
-                )
+        match = _DANGER_RE.search(user_input.lower())
+        if match:
+            logger.warning(f"Potentially dangerous input detected: {match.group(0)}")
+            return "Message contains invalid characters. Please rephrase your message."
 
         return None
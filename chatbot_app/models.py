@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.contrib.auth.models import User
 
@@ -105,32 +107,28 @@ class AIServiceUsage(models.Model):
         )
 
     def update_usage(self, success: bool, response_time_ms: int = None):
-        """Update usage statistics."""
-        self.request_count += 1
-        if success:
-            self.success_count += 1
-        else:
-            self.error_count += 1
+        """
+        Update usage statistics with one atomic UPDATE, so concurrent workers
+        never lose counts. The instance is not refreshed; call
+        refresh_from_db() if the new values are needed.
+        Returns the number of rows updated (0 if the row no longer exists).
+        """
+        changes = {
+            "request_count": F("request_count") + 1,
+            "success_count": F("success_count") + (1 if success else 0),
+            "error_count": F("error_count") + (0 if success else 1),
+            "last_used": timezone.now(),
+        }
 
         if response_time_ms is not None:
-            if self.avg_response_time_ms is None:
-                self.avg_response_time_ms = response_time_ms
-            else:
-                # Calculate rolling average
-                self.avg_response_time_ms = (
-                    self.avg_response_time_ms * (self.request_count - 1)
-                    + response_time_ms
-                ) / self.request_count
-
-        self.save(
-            update_fields=[
-                "request_count",
-                "success_count",
-                "error_count",
-                "avg_response_time_ms",
-                "last_used",
-            ]
-        )
+            # Rolling average; the right-hand side sees the pre-update row
+            sample = Value(float(response_time_ms), output_field=FloatField())
+            changes["avg_response_time_ms"] = (
+                Coalesce(F("avg_response_time_ms"), sample) * F("request_count")
+                + sample
+            ) / (F("request_count") + 1)
+
+        return AIServiceUsage.objects.filter(pk=self.pk).update(**changes)
 
 
 class SystemMetrics(models.Model):
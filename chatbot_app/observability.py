@@ -4,7 +4,7 @@ Handles tracing and monitoring using Langfuse (or other providers in the future)
 """
 
 import os
-import functools
+import atexit
 import logging
 from typing import Optional, Dict, Any
 from django.conf import settings
@@ -25,17 +25,13 @@ except ImportError:
 class ObservabilityService:
     """
     Manages observability and tracing.
+    Use the module-level `observability` instance; it is created once, at
+    import time, so there is only ever one Langfuse client.
     """
 
-    _instance = None
+    __slots__ = ("enabled", "langfuse")
 
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(ObservabilityService, cls).__new__(cls)
-            cls._instance._initialize()
-        return cls._instance
-
-    def _initialize(self):
+    def __init__(self):
         """Initialize the observability provider."""
         self.enabled = False
         self.langfuse = None
@@ -54,12 +50,23 @@ class ObservabilityService:
             settings, "LANGFUSE_HOST", "https://cloud.langfuse.com"
         ) or os.environ.get("LANGFUSE_HOST")
 
+        # Spans are batched client-side and sent by the SDK's worker thread;
+        # the observe() decorator has its own client, configured the same way
+        client_settings = {
+            "public_key": public_key,
+            "secret_key": secret_key,
+            "host": host,
+            "flush_at": int(os.environ.get("LANGFUSE_FLUSH_AT", "50")),
+            "flush_interval": float(os.environ.get("LANGFUSE_FLUSH_INTERVAL", "5")),
+        }
+
         if public_key and secret_key:
             try:
-                self.langfuse = Langfuse(
-                    public_key=public_key, secret_key=secret_key, host=host
-                )
+                self.langfuse = Langfuse(**client_settings)
+                langfuse_context.configure(**client_settings)
                 self.enabled = True
+                # Whatever is still batched is sent when the process exits
+                atexit.register(self.flush)
                 logger.info("Langfuse observability initialized successfully.")
             except Exception as e:
                 logger.error(f"Failed to initialize Langfuse: {e}")
@@ -74,28 +81,31 @@ class ObservabilityService:
             def my_function(): ...
         """
 
-        def decorator(func):
-            if not self.enabled:
-                return func
+        if not self.enabled:
+            return lambda func: func
 
-            # Use Langfuse's native decorator if available
-            # We wrap it to handle our custom logic if needed
-            @observe(**kwargs)
-            @functools.wraps(func)
-            def wrapper(*args, **func_kwargs):
-                return func(*args, **func_kwargs)
+        # Langfuse's decorator directly: no pass-through frame, and it sees
+        # coroutine functions as such, so async calls are timed to completion
+        return observe(**kwargs)
 
-            return wrapper
-
-        return decorator
+    def update_current_observation(self, **kwargs):
+        """Attach metadata to the observation currently being traced."""
+        if not self.enabled:
+            return
+        try:
+            langfuse_context.update_current_observation(**kwargs)
+        except Exception as e:
+            logger.error(f"Failed to update Langfuse observation: {e}")
 
     def flush(self):
-        """Flush any buffered events."""
-        if self.enabled and self.langfuse:
-            try:
-                self.langfuse.flush()
-            except Exception as e:
-                logger.error(f"Failed to flush Langfuse: {e}")
+        """Flush any buffered events (client and decorator spans); blocks."""
+        if not (self.enabled and self.langfuse):
+            return
+        try:
+            self.langfuse.flush()
+            langfuse_context.flush()
+        except Exception as e:
+            logger.error(f"Failed to flush Langfuse: {e}")
 
 
 # Global instance
@@ -0,0 +1,95 @@
+"""
+Int8-quantized ONNX Runtime versions of the memory models.
+- OnnxEmbeddingFunction: drop-in for SentenceTransformerEmbeddingFunction
+- OnnxCrossEncoder: drop-in for CrossEncoder.predict
+Models are exported and dynamically quantized once into ONNX_MODEL_DIR.
+Requires `optimum[onnxruntime]`; callers fall back to the FP32 models when
+it is missing or loading fails.
+"""
+
+import logging
+import os
+from typing import Any, List, Sequence
+
+import numpy as np
+from chromadb import EmbeddingFunction
+
+try:
+    from optimum.onnxruntime import (
+        ORTModelForFeatureExtraction,
+        ORTModelForSequenceClassification,
+        ORTQuantizer,
+    )
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+except ImportError:
+    ORTModelForFeatureExtraction = None
+
+logger = logging.getLogger(__name__)
+
+ONNX_MODEL_DIR = "onnx_models"
+QUANTIZED_FILE = "model_quantized.onnx"
+
+
+def _load_quantized(model_cls, model_name: str):
+    """Load `model_name` as int8 ONNX, exporting and quantizing it on first use."""
+    if ORTModelForFeatureExtraction is None:
+        raise ImportError("optimum[onnxruntime] is not installed")
+
+    target = os.path.join(ONNX_MODEL_DIR, model_name.replace("/", "__"))
+    if not os.path.exists(os.path.join(target, QUANTIZED_FILE)):
+        logger.info(f"Exporting {model_name} to int8 ONNX in {target}")
+        model = model_cls.from_pretrained(model_name, export=True)
+        quantizer = ORTQuantizer.from_pretrained(model)
+        quantizer.quantize(
+            save_dir=target,
+            quantization_config=AutoQuantizationConfig.avx2(
+                is_static=False, per_channel=False
+            ),
+        )
+        AutoTokenizer.from_pretrained(model_name).save_pretrained(target)
+
+    model = model_cls.from_pretrained(target, file_name=QUANTIZED_FILE)
+    return model, AutoTokenizer.from_pretrained(target)
+
+
+class OnnxEmbeddingFunction(EmbeddingFunction):
+    """Mean-pooled, L2-normalized sentence embeddings (as sentence-transformers)."""
+
+    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
+        self.model, self.tokenizer = _load_quantized(
+            ORTModelForFeatureExtraction, model_name
+        )
+
+    def __call__(self, input: Sequence[str]) -> List[np.ndarray]:
+        encoded = self.tokenizer(
+            list(input), padding=True, truncation=True, return_tensors="np"
+        )
+        hidden = self.model(**encoded).last_hidden_state
+        mask = encoded["attention_mask"][..., None].astype(hidden.dtype)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return list((pooled / np.clip(norms, 1e-12, None)).astype(np.float32))
+
+
+class OnnxCrossEncoder:
+    """Relevance scores for (query, document) pairs; higher is more relevant."""
+
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"):
+        self.model, self.tokenizer = _load_quantized(
+            ORTModelForSequenceClassification, model_name
+        )
+
+    def predict(self, pairs: List[List[str]], batch_size: int = 32, **_: Any):
+        scores = []
+        for start in range(0, len(pairs), batch_size):
+            batch = pairs[start : start + batch_size]
+            encoded = self.tokenizer(
+                [query for query, _ in batch],
+                [doc for _, doc in batch],
+                padding=True,
+                truncation=True,
+                return_tensors="np",
+            )
+            scores.append(self.model(**encoded).logits[:, 0])
+        return np.concatenate(scores) if scores else np.array([])
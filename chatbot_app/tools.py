@@ -1,5 +1,24 @@
+import ast
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import operator
+import re
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Max tool calls from one model turn that run at the same time.
+TOOL_CONCURRENCY_LIMIT = 4
+# Seconds a single tool call may take before its result is replaced by an error.
+TOOL_CALL_TIMEOUT = 15.0
 
 
 class Tool(ABC):
@@ -10,6 +29,10 @@ class Tool(ABC):
     name: str = "base_tool"
     description: str = "Base tool description"
     parameters: Dict[str, Any] = {}
+    # Results are cached per (name, arguments) for cache_ttl seconds
+    # (None = never expire). Tools with side effects set cacheable = False.
+    cacheable: bool = True
+    cache_ttl: Optional[int] = 600
 
     @abstractmethod
     def execute(self, **kwargs) -> str:
@@ -29,6 +52,56 @@ class Tool(ABC):
         }
 
 
+# Calculator input: digits, + - * / ( ) . and spaces only
+_SAFE_EXPRESSION = re.compile(r"[0-9+\-*/(). ]+").fullmatch
+_BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Pow: operator.pow,
+}
+_UNARY_OPS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+# Keeps "9**9**9"-style input from tying up a worker: exponents are capped,
+# and integer powers/products whose result would exceed the bit budget
+# ("((9**999)**999)**999", repeated multiplication of huge numbers) fail
+MAX_EXPONENT = 1000
+MAX_RESULT_BITS = 10_000
+
+
+def _result_bits(op: ast.operator, left, right) -> int:
+    """Upper bound on the bit length of an integer `left op right`."""
+    if type(left) is not int or type(right) is not int:
+        return 0  # float results overflow instead of growing
+    if isinstance(op, ast.Pow):
+        return abs(left).bit_length() * right if right > 0 else 0
+    if isinstance(op, ast.Mult):
+        return left.bit_length() + right.bit_length()
+    return 0
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_expression(expression: str) -> ast.expr:
+    return ast.parse(expression.strip(), mode="eval").body
+
+
+def _evaluate(node: ast.expr):
+    """Evaluate an arithmetic AST; anything but numbers and operators fails."""
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+        left, right = _evaluate(node.left), _evaluate(node.right)
+        if isinstance(node.op, ast.Pow) and abs(right) > MAX_EXPONENT:
+            raise ValueError("exponent too large")
+        if _result_bits(node.op, left, right) > MAX_RESULT_BITS:
+            raise ValueError("result too large")
+        return _BINARY_OPS[type(node.op)](left, right)
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+        return _UNARY_OPS[type(node.op)](_evaluate(node.operand))
+    raise ValueError("unsupported expression")
+
+
 class CalculatorTool(Tool):
     name = "calculator"
     description = (
@@ -44,31 +117,26 @@ class CalculatorTool(Tool):
         },
         "required": ["expression"],
     }
+    cache_ttl = None  # arithmetic never changes
 
     def execute(self, expression: str) -> str:
         try:
-            # Safe evaluation of simple math
-            allowed_chars = "0123456789+-*/(). "
-            if not all(c in allowed_chars for c in expression):
+            # Safe evaluation of simple math (no eval)
+            if not _SAFE_EXPRESSION(expression):
                 return "Error: Invalid characters in expression."
 
-            result = eval(expression, {"__builtins__": {}}, {})
+            result = _evaluate(_parse_expression(expression))
             return str(result)
         except Exception as e:
             return f"Error: {str(e)}"
 
 
-try:
-    from duckduckgo_search import DDGS
-except ImportError:
-    DDGS = None
-
-try:
-    import requests
-    from bs4 import BeautifulSoup
-except ImportError:
-    requests = None
-    BeautifulSoup = None
+# read_url returns at most URL_TEXT_CHARS of text, so it never needs to
+# download or parse more than URL_MAX_BYTES of the page
+URL_MAX_BYTES = 256 * 1024
+URL_TEXT_CHARS = 4000
+_WHITESPACE_RE = re.compile(r"\s+")
+URL_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
 
 
 class WebSearchTool(Tool):
@@ -84,28 +152,22 @@ class WebSearchTool(Tool):
         },
         "required": ["query"],
     }
+    # duckduckgo_search is imported on first use, not at startup
+    _DDGS = None
+
+    def __init__(self, verify: bool = True):
+        self.verify = verify
 
     def execute(self, query: str) -> str:
-        if not DDGS:
-            return "Error: duckduckgo-search library not installed."
+        if WebSearchTool._DDGS is None:
+            try:
+                from duckduckgo_search import DDGS
+            except ImportError:
+                return "Error: duckduckgo-search library not installed."
+            WebSearchTool._DDGS = DDGS
 
         try:
-            # Note: duckduckgo_search might not expose SSL options directly,
-            # but usually handles it. If it fails, we might need a workaround or env var.
-            # trying standard call first, if it fails we might need to patch libraries
-            # or skip SSL verify globally for this session.
-
-            # Simple workaround for DDGS if it uses requests under the hood:
-            # We can try to set env var but let's see if we can just catch the error more gracefully.
-            # Actually, let's try to monkeypatch requests.adapters.HTTPAdapter if needed,
-            # but for now let's assume the user might have cert issues.
-
-            # For the purpose of this environment which seems to have SSL issues:
-            import ssl
-
-            ssl._create_default_https_context = ssl._create_unverified_context
-
-            results = DDGS().text(query, max_results=3)
+            results = WebSearchTool._DDGS(verify=self.verify).text(query, max_results=3)
             if not results:
                 return "No results found."
 
@@ -133,40 +195,74 @@ class URLReaderTool(Tool):
         },
         "required": ["url"],
     }
+    # requests / bs4 (and lxml) are imported on first use, not at startup;
+    # the pooled session is shared by every instance
+    _session = None
+    _BeautifulSoup = None
+    _html_parser = "html.parser"
+
+    def __init__(self, verify: bool = True):
+        self.verify = verify
+
+    @classmethod
+    def _load_dependencies(cls) -> bool:
+        if cls._BeautifulSoup is None:
+            try:
+                import requests
+                from bs4 import BeautifulSoup
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+            except ImportError:
+                return False
+            # BeautifulSoup uses libxml2's C parser when lxml is installed
+            try:
+                import lxml  # noqa: F401  (presence check only)
+
+                cls._html_parser = "lxml"
+            except ImportError:
+                pass
+            # Keep-alive connections are reused across calls (no TLS handshake
+            # per page from the same host)
+            session = requests.Session()
+            session.headers["User-Agent"] = URL_USER_AGENT
+            adapter = HTTPAdapter(
+                pool_connections=10,
+                pool_maxsize=20,
+                max_retries=Retry(total=2, backoff_factor=0.2),
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            cls._session = session
+            cls._BeautifulSoup = BeautifulSoup
+        return True
 
     def execute(self, url: str) -> str:
-        if not requests or not BeautifulSoup:
+        if not self._load_dependencies():
             return "Error: requests or beautifulsoup4 libraries not installed."
 
         try:
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-            }
-            # Disable SSL verify for local dev environment issues
-            import urllib3
+            if not self.verify:
+                import urllib3
 
-            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+                urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-            response = requests.get(url, headers=headers, timeout=10, verify=False)
-            response.raise_for_status()
+            with self._session.get(
+                url, timeout=10, verify=self.verify, stream=True
+            ) as response:
+                response.raise_for_status()
+                content = response.raw.read(URL_MAX_BYTES, decode_content=True)
 
-            soup = BeautifulSoup(response.content, "html.parser")
+            soup = self._BeautifulSoup(content, self._html_parser)
 
             # Remove script and style elements
             for script in soup(["script", "style", "nav", "footer"]):
                 script.decompose()
 
-            text = soup.get_text()
-
-            # Break into lines and remove leading and trailing space on each
-            lines = (line.strip() for line in text.splitlines())
-            # Break multi-headlines into a line each
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            # Drop blank lines
-            text = "\n".join(chunk for chunk in chunks if chunk)
+            # One whitespace-collapsing pass over the joined text nodes
+            text = _WHITESPACE_RE.sub(" ", soup.get_text(" ", strip=True))
 
             # Cap length to avoid context overflow
-            return text[:4000] + ("..." if len(text) > 4000 else "")
+            return text[:URL_TEXT_CHARS] + ("..." if len(text) > URL_TEXT_CHARS else "")
 
         except Exception as e:
             return f"Error reading URL: {str(e)}"
@@ -175,19 +271,144 @@ class URLReaderTool(Tool):
 class ToolRegistry:
     def __init__(self):
         self.tools: Dict[str, Tool] = {}
+        # Built on first use and dropped on register; callers must not mutate it
+        self._schemas: Optional[List[Dict[str, Any]]] = None
 
     def register(self, tool: Tool):
         self.tools[tool.name] = tool
+        self._schemas = None
 
     def get_tool(self, name: str) -> Tool:
         return self.tools.get(name)
 
     def get_schemas(self) -> List[Dict[str, Any]]:
-        return [tool.to_schema() for tool in self.tools.values()]
+        schemas = self._schemas
+        if schemas is None:
+            schemas = self._schemas = [tool.to_schema() for tool in self.tools.values()]
+        return schemas
+
+
+class ToolCache:
+    """Tool results in the Django cache, keyed by tool name and arguments."""
+
+    @staticmethod
+    def key(function_name: str, kwargs: Dict[str, Any]) -> str:
+        canonical = json.dumps(kwargs, sort_keys=True, separators=(",", ":"))
+        digest = hashlib.blake2b(f"{function_name}:{canonical}".encode()).hexdigest()
+        return f"tool:{digest}"
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            return cache.get(key)
+        except Exception as e:
+            logger.error(f"Tool cache read failed: {e}")
+            return None
+
+    def set(self, key: str, result: str, ttl: Optional[int]):
+        try:
+            cache.set(key, result, ttl)
+        except Exception as e:
+            logger.error(f"Tool cache write failed: {e}")
+
+
+class ToolExecutor:
+    """
+    Runs the tool calls from one model turn concurrently.
+    Tools are synchronous (network I/O), so each call is offloaded to a
+    bounded thread pool; results keep the order of the input tool calls so
+    they can be matched back to their tool_call ids.
+    """
+
+    def __init__(
+        self,
+        registry: ToolRegistry,
+        max_workers: int = TOOL_CONCURRENCY_LIMIT,
+        timeout: float = TOOL_CALL_TIMEOUT,
+    ):
+        self.registry = registry
+        self.timeout = timeout
+        self.cache = ToolCache()
+        self.pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="tool"
+        )
+
+    def run(self, function_name: str, function_args_str: str) -> str:
+        """Parse model-provided arguments and execute a single tool."""
+        tool = self.registry.get_tool(function_name)
+        if not tool:
+            return f"Error: Tool {function_name} not found"
+
+        try:
+            # Parse args
+            try:
+                kwargs = json.loads(function_args_str)
+            except json.JSONDecodeError:
+                # Fallback hacks for bad JSON
+                kwargs = (
+                    {"expression": function_args_str}
+                    if function_name == "calculator"
+                    else {"query": function_args_str}
+                )
+
+            cache_key = None
+            if tool.cacheable and isinstance(kwargs, dict):
+                cache_key = self.cache.key(function_name, kwargs)
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    logger.info(f"Tool cache hit for '{function_name}'")
+                    return cached
+
+            # Execute
+            try:
+                result = tool.execute(**kwargs)
+            except TypeError:
+                if kwargs:
+                    result = tool.execute(list(kwargs.values())[0])
+                else:
+                    result = tool.execute()
+
+            # Errors are retried next time rather than cached
+            if cache_key and not str(result).startswith("Error"):
+                self.cache.set(cache_key, result, tool.cache_ttl)
+            return result
+        except Exception as e:
+            return f"Error executing tool: {e}"
+
+    async def _run_with_timeout(self, tool_call: Dict[str, Any]) -> str:
+        loop = asyncio.get_running_loop()
+        function_name = tool_call["function"]["name"]
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(
+                    self.pool,
+                    self.run,
+                    function_name,
+                    tool_call["function"]["arguments"],
+                ),
+                timeout=self.timeout,
+            )
+        except asyncio.TimeoutError:
+            # The worker thread finishes in the background; its result is dropped.
+            return f"Error: Tool {function_name} timed out after {self.timeout:g}s"
+
+    async def execute_parallel(self, tool_calls: List[Dict[str, Any]]) -> List[str]:
+        """Execute all tool calls concurrently, returning results in input order."""
+        results = await asyncio.gather(
+            *[self._run_with_timeout(tool_call) for tool_call in tool_calls],
+            return_exceptions=True,
+        )
+        return [
+            f"Error executing tool: {result}"
+            if isinstance(result, BaseException)
+            else result
+            for result in results
+        ]
 
 
 # Global registry
 tool_registry = ToolRegistry()
 tool_registry.register(CalculatorTool())
-tool_registry.register(WebSearchTool())
-tool_registry.register(URLReaderTool())
+tool_registry.register(WebSearchTool(verify=settings.TOOLS_VERIFY_SSL))
+tool_registry.register(URLReaderTool(verify=settings.TOOLS_VERIFY_SSL))
+
+tool_executor = ToolExecutor(tool_registry)
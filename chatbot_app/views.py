@@ -1,40 +1,108 @@
 from django.shortcuts import render
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.cache import cache_control
 from django.views.decorators.http import require_http_methods
-from django.db.models import Count, Avg
+from django.db.models import Count, Avg, Q, Sum
 from datetime import datetime, timedelta
 import json
 import logging
-import traceback
 import asyncio
+import concurrent.futures
+import functools
+import operator
+import random
+import threading
+import time
+from typing import Any, Dict
+from django.conf import settings
+from django.core.cache import cache
 from .fallback_responses import fallback
+from .json_utils import dumps as json_dumps
+from .agents import classify_complexity
 from .ai_services import ai_manager, orchestrator
 from .models import ChatMessage, ChatSession, AIServiceUsage
 
 logger = logging.getLogger(__name__)
 
+# One event loop for the whole process, on a daemon thread. asyncio.run per
+# request built and tore down a loop every time, and with it the per-loop
+# HTTP clients (and their pooled connections) in ai_services.
+_loop = asyncio.new_event_loop()
+threading.Thread(target=_loop.run_forever, name="views-loop", daemon=True).start()
+
+# Upper bound on a single view's wait for the orchestrator
+VIEW_TIMEOUT = 120.0
+
+
+def _run(coro):
+    """Run `coro` on the shared loop and block this worker until it finishes."""
+    future = asyncio.run_coroutine_threadsafe(coro, _loop)
+    try:
+        return future.result(timeout=VIEW_TIMEOUT)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise
+
+
+# Short repeated prompts ("hi", "hello", FAQ repeats) are answered from an
+# in-process cache for this many seconds (0 disables). Only answers the
+# orchestrator marks cacheable are stored: trivial prompts answered at
+# temperature 0 without tools or errors.
+ROUTE_CACHE_TTL = getattr(settings, "ROUTE_CACHE_TTL", 300)
+ROUTE_CACHE_SIZE = 1024
+# normalized input -> (expires_at, result)
+_route_cache: Dict[str, Any] = {}
+_route_cache_lock = threading.Lock()
+
+
+def _route(user_input: str) -> Dict[str, Any]:
+    """Route a message; repeated trivial prompts are served from _route_cache."""
+    if not ROUTE_CACHE_TTL or classify_complexity(user_input) != "trivial":
+        return _run(orchestrator.route_and_generate(user_input))
+
+    key = user_input.strip().lower()
+    now = time.monotonic()
+    with _route_cache_lock:
+        entry = _route_cache.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+    result = _run(orchestrator.route_and_generate(user_input))
+    if result.get("cacheable"):
+        with _route_cache_lock:
+            if len(_route_cache) >= ROUTE_CACHE_SIZE:
+                for stale in [k for k, (exp, _) in _route_cache.items() if exp <= now]:
+                    del _route_cache[stale]
+                if len(_route_cache) >= ROUTE_CACHE_SIZE:
+                    # Still full: drop the oldest insertion
+                    del _route_cache[next(iter(_route_cache))]
+            _route_cache[key] = (now + ROUTE_CACHE_TTL, result)
+    return result
+
+
+# Empty POSTs (mostly probes) get one of the "help" fallbacks, serialized once
+EMPTY_INPUT_BODIES = tuple(
+    json_dumps({"message": message, "fallback": True, "fallback_reason": "empty_input"})
+    for message in fallback.responses["help"]
+)
+
 
 def index(request):
     if request.method == "GET":
         return render(request, "chatbot_app/index.html")
 
     elif request.method == "POST":
-        user_input = (request.POST.get("user-input") or "").strip()
-
-        if not user_input:
-            return JsonResponse(
-                {
-                    "message": fallback.get_response("help"),
-                    "fallback": True,
-                    "fallback_reason": "empty_input",
-                },
-                status=200,
+        raw_input = request.POST.get("user-input")
+        if not raw_input or raw_input.isspace():
+            return HttpResponse(
+                random.choice(EMPTY_INPUT_BODIES), content_type="application/json"
             )
+        user_input = raw_input.strip()
 
         try:
             # Use the Orchestrator to route and generate response
-            result = asyncio.run(orchestrator.route_and_generate(user_input))
+            result = _route(user_input)
 
             return JsonResponse(
                 {"message": result["response"], "agent": result["agent"]}
@@ -42,7 +110,7 @@ def index(request):
 
         except Exception as e:
             # Log the error with traceback and use fallback response
-            logger.error(f"AI service error: {str(e)}\n{traceback.format_exc()}")
+            logger.error("AI service error: %s", e, exc_info=True)
             fallback_message = fallback.get_response(user_input)
             return JsonResponse(
                 {
@@ -54,6 +122,64 @@ def index(request):
             )
 
 
+def _sse(event: str, data: Dict[str, Any]) -> bytes:
+    """One Server-Sent Events frame; the JSON payload repeats the type."""
+    return b"event: %s\ndata: %s\n\n" % (
+        event.encode(),
+        json_dumps({"type": event, **data}),
+    )
+
+
+async def _next_event(events):
+    try:
+        return await events.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+def _stream_events(message: str, platform: str, user_id: str):
+    """
+    SSE stream for api_webhook?stream=true: one `meta` event, `delta` events
+    as the answer is generated, then `final` (the post-processed answer,
+    which replaces the deltas) or `error` (carrying a fallback answer).
+    The async generator runs on the shared loop, one event per _run.
+    """
+    yield _sse("meta", {"platform": platform, "user_id": user_id})
+    events = orchestrator.stream_route_and_generate(message)
+    try:
+        while (event := _run(_next_event(events))) is not None:
+            if event["type"] == "delta":
+                yield _sse("delta", {"content": event["content"]})
+            elif event["type"] == "final":
+                yield _sse(
+                    "final",
+                    {
+                        "response": event["response"],
+                        "agent": event["agent"],
+                        "suggestions": event.get("suggestions", []),
+                        "charts": event.get("charts", []),
+                        "platform": platform,
+                        "user_id": user_id,
+                    },
+                )
+    except Exception as e:
+        logger.error("Webhook stream error: %s", e, exc_info=True)
+        yield _sse(
+            "error",
+            {
+                "error": str(e),
+                "response": fallback.get_response(message),
+                "fallback": True,
+            },
+        )
+    finally:
+        # Also runs when the client disconnects and Django closes the stream
+        try:
+            _run(events.aclose())
+        except Exception as e:
+            logger.warning("Failed to close webhook stream: %s", e)
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def api_webhook(request):
@@ -69,8 +195,17 @@ def api_webhook(request):
         if not message:
             return JsonResponse({"error": "No message provided"}, status=400)
 
+        if request.GET.get("stream") == "true":
+            response = StreamingHttpResponse(
+                _stream_events(message, platform, user_id),
+                content_type="text/event-stream",
+            )
+            response["Cache-Control"] = "no-cache"
+            response["X-Accel-Buffering"] = "no"  # don't let nginx hold events
+            return response
+
         # Use the Orchestrator to route and generate response
-        result = asyncio.run(orchestrator.route_and_generate(message))
+        result = _route(message)
 
         return JsonResponse(
             {
@@ -85,7 +220,7 @@ def api_webhook(request):
         )
 
     except Exception as e:
-        logger.error(f"Webhook error: {str(e)}\n{traceback.format_exc()}")
+        logger.error("Webhook error: %s", e, exc_info=True)
         user_msg = message if "message" in locals() else "hello"
         fallback_message = fallback.get_response(user_msg)
         return JsonResponse(
@@ -93,11 +228,6 @@ def api_webhook(request):
             status=200,
         )
 
-        return JsonResponse(
-            {"response": fallback_message, "fallback": True, "fallback_reason": str(e)},
-            status=200,
-        )
-
 
 @csrf_exempt
 @require_http_methods(["POST"])
@@ -110,18 +240,18 @@ def transcribe_audio(request):
         audio_file = request.FILES["audio"]
 
         # Use the AI manager to transcribe
-        text = asyncio.run(ai_manager.transcribe_audio(audio_file))
+        text = _run(ai_manager.transcribe_audio(audio_file))
 
         return JsonResponse({"text": text})
 
     except Exception as e:
-        logger.error(f"Transcription error: {str(e)}\n{traceback.format_exc()}")
+        logger.error("Transcription error: %s", e, exc_info=True)
         return JsonResponse({"error": str(e)}, status=500)
 
 
-def embed_code(request):
-    """Return HTML embed code for websites"""
-    embed_script = """
+# The embed snippet never changes: encode it once and let browsers/CDNs
+# cache it for a day
+EMBED_CODE = """
 <!-- Chatbot Embed Code -->
 <script>
 (function() {
@@ -239,42 +369,45 @@ def embed_code(request):
 })();
 </script>
 <!-- End Chatbot Embed Code -->
-    """
+    """.encode()
 
-    return HttpResponse(embed_script, content_type="text/html")
 
+@cache_control(max_age=86400, public=True)
+def embed_code(request):
+    """Return HTML embed code for websites"""
+    return HttpResponse(EMBED_CODE, content_type="text/html; charset=utf-8")
 
-def integration_guide(request):
-    """Return integration guide for different platforms"""
-    guide = {
+
+@functools.lru_cache(maxsize=8)
+def _build_guide(base_url: str) -> Dict[str, Any]:
+    """Integration guide for one site root (one entry per hostname served)."""
+    return {
         "website": {
-            "embed_code": f'<script src="{request.build_absolute_uri()}/embed/"></script>',
+            "embed_code": f'<script src="{base_url}/embed/"></script>',
             "instructions": "Add this script to your website HTML before the closing </body> tag",
         },
         "facebook_messenger": {
-            "webhook_url": f"{request.build_absolute_uri()}/api/webhook/",
+            "webhook_url": f"{base_url}/api/webhook/",
             "instructions": [
                 "1. Create a Facebook Page and Facebook Developer account",
                 "2. Create a Facebook App with Messenger product",
-                "3. Set webhook URL to: "
-                + f"{request.build_absolute_uri()}/api/webhook/",
+                "3. Set webhook URL to: " + f"{base_url}/api/webhook/",
                 "4. Verify webhook with your verification token",
                 "5. Get Page Access Token and configure",
             ],
         },
         "whatsapp": {
-            "webhook_url": f"{request.build_absolute_uri()}/api/webhook/",
+            "webhook_url": f"{base_url}/api/webhook/",
             "instructions": [
                 "1. Create a WhatsApp Business Account",
                 "2. Get WhatsApp Business API access",
-                "3. Set webhook URL to: "
-                + f"{request.build_absolute_uri()}/api/webhook/",
+                "3. Set webhook URL to: " + f"{base_url}/api/webhook/",
                 "4. Configure phone number and message templates",
                 "5. Test webhook endpoints",
             ],
         },
         "api": {
-            "endpoint": f"{request.build_absolute_uri()}/api/webhook/",
+            "endpoint": f"{base_url}/api/webhook/",
             "method": "POST",
             "headers": {"Content-Type": "application/json"},
             "body_format": {
@@ -285,40 +418,32 @@ def integration_guide(request):
         },
     }
 
-    return JsonResponse(guide)
-
 
-def dashboard_stats(request):
-    """Return real-time dashboard statistics"""
-    now = datetime.now()
-    last_24h = now - timedelta(hours=24)
-    last_7d = now - timedelta(days=7)
+def integration_guide(request):
+    """Return integration guide for different platforms"""
+    return JsonResponse(_build_guide(request.build_absolute_uri("/").rstrip("/")))
 
-    # Message statistics
-    messages_24h = ChatMessage.objects.filter(timestamp__gte=last_24h)
-    messages_7d = ChatMessage.objects.filter(timestamp__gte=last_7d)
 
-    # Session statistics
-    active_sessions_24h = ChatSession.objects.filter(updated_at__gte=last_24h).count()
-    total_sessions_7d = ChatSession.objects.filter(created_at__gte=last_7d).count()
+# The dashboard polls stats every few seconds; the 24h/7d aggregates are
+# shared by all viewers and recomputed at most this often
+DASHBOARD_STATS_TTL = 15
 
-    # AI Service statistics
-    ai_services = AIServiceUsage.objects.all()
 
-    # Performance metrics
-    avg_response_time = (
-        ai_services.aggregate(avg_time=Avg("avg_response_time_ms"))["avg_time"] or 0
+def dashboard_stats(request):
+    """Return real-time dashboard statistics"""
+    return JsonResponse(
+        cache.get_or_set(
+            "dashboard_stats_v1", _compute_dashboard_stats, DASHBOARD_STATS_TTL
+        )
     )
 
-    # Error rate
-    total_messages = messages_24h.count()
-    fallback_messages = messages_24h.filter(is_fallback=True).count()
-    error_rate = (fallback_messages / total_messages * 100) if total_messages > 0 else 0
 
-    # Popular conversation flows
-    popular_flows = {}
-    user_messages = messages_24h.filter(message_type="user")
+def _compute_dashboard_stats() -> Dict[str, Any]:
+    now = datetime.now()
+    last_24h = now - timedelta(hours=24)
+    last_7d = now - timedelta(days=7)
 
+    # Popular conversation flows
     flow_keywords = {
         "contact": ["contact", "phone", "email", "address"],
         "services": ["service", "offer", "provide"],
@@ -326,13 +451,44 @@ def dashboard_stats(request):
         "location": ["location", "where", "direction"],
         "human": ["human", "person", "agent"],
     }
+    recent = Q(timestamp__gte=last_24h)
+    recent_user = recent & Q(message_type="user")
+    flow_counts = {
+        f"flow_{flow}": Count(
+            "id",
+            filter=recent_user
+            & functools.reduce(
+                operator.or_, (Q(content__icontains=kw) for kw in keywords)
+            ),
+        )
+        for flow, keywords in flow_keywords.items()
+    }
+
+    # Message statistics (one query over the last 7 days)
+    message_stats = ChatMessage.objects.filter(timestamp__gte=last_7d).aggregate(
+        total_7d=Count("id"),
+        total_24h=Count("id", filter=recent),
+        fallbacks_24h=Count("id", filter=recent & Q(is_fallback=True)),
+        **flow_counts,
+    )
+    popular_flows = {flow: message_stats[f"flow_{flow}"] for flow in flow_keywords}
 
-    for flow, keywords in flow_keywords.items():
-        count = 0
-        for msg in user_messages:
-            if any(keyword in msg.content.lower() for keyword in keywords):
-                count += 1
-        popular_flows[flow] = count
+    # Session statistics
+    session_stats = ChatSession.objects.aggregate(
+        active_24h=Count("id", filter=Q(updated_at__gte=last_24h)),
+        total_7d=Count("id", filter=Q(created_at__gte=last_7d)),
+    )
+
+    # AI Service statistics / Performance metrics
+    service_stats = AIServiceUsage.objects.aggregate(
+        avg_time=Avg("avg_response_time_ms"), total_requests=Sum("request_count")
+    )
+    avg_response_time = service_stats["avg_time"] or 0
+
+    # Error rate
+    total_messages = message_stats["total_24h"]
+    fallback_messages = message_stats["fallbacks_24h"]
+    error_rate = (fallback_messages / total_messages * 100) if total_messages > 0 else 0
 
     # AI Service status
     ai_status = {
@@ -347,20 +503,23 @@ def dashboard_stats(request):
     stats = {
         "messages": {
             "last_24h": total_messages,
-            "last_7d": messages_7d.count(),
+            "last_7d": message_stats["total_7d"],
             "error_rate": round(error_rate, 2),
         },
-        "sessions": {"active_24h": active_sessions_24h, "total_7d": total_sessions_7d},
+        "sessions": {
+            "active_24h": session_stats["active_24h"],
+            "total_7d": session_stats["total_7d"],
+        },
         "performance": {
             "avg_response_time_ms": round(avg_response_time, 2),
-            "total_requests": sum(service.request_count for service in ai_services),
+            "total_requests": service_stats["total_requests"] or 0,
         },
         "popular_flows": popular_flows,
         "ai_services": ai_status,
         "last_updated": now.isoformat(),
     }
 
-    return JsonResponse(stats)
+    return stats
 
 
 def dashboard_view(request):
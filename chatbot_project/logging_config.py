@@ -3,29 +3,94 @@ Logging configuration for the chatbot project.
 Provides structured logging with timestamps and context.
 """
 
+import atexit
+import copy
 import logging
+import logging.handlers
+import queue
 import sys
-from datetime import datetime
+import time
+from contextvars import ContextVar
 from pathlib import Path
 
+# Id of the request being handled on this thread/task ('-' outside requests);
+# set by chatbot_project.middleware.RequestIdMiddleware
+REQUEST_ID: ContextVar[str] = ContextVar('request_id', default='-')
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp each record with the current request id (as record.rid)."""
+    
+    def filter(self, record):
+        record.rid = REQUEST_ID.get()
+        return True
+
 
 class StructuredFormatter(logging.Formatter):
     """Custom formatter for structured log output."""
     
+    # UTC timestamps like 2024-01-01T12:00:00.123Z
+    converter = time.gmtime
+    default_time_format = '%Y-%m-%dT%H:%M:%S'
+    default_msec_format = '%s.%03dZ'
+    
+    def __init__(self):
+        super().__init__(
+            '[%(asctime)s] %(levelname)s | %(rid)s | %(module)s:%(funcName)s:%(lineno)d | %(message)s'
+        )
+    
     def format(self, record):
-        timestamp = datetime.utcnow().isoformat() + 'Z'
-        level = record.levelname
-        module = record.module
-        function = record.funcName
-        line = record.lineno
-        message = record.getMessage()
+        if not hasattr(record, 'rid'):
+            record.rid = '-'
+        record.message = record.getMessage()
+        record.asctime = self.formatTime(record)
+        output = self.formatMessage(record)
         
-        # Add exception info if present
-        exception_info = ''
-        if record.exc_info:
-            exception_info = f' | Exception: {self.formatException(record.exc_info)}'
+        # Add exception info if present (formatted once per record)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            output = f'{output} | Exception: {record.exc_text}'
         
-        return f"[{timestamp}] {level} | {module}:{function}:{line} | {message}{exception_info}"
+        return output
+
+
+# Records waiting for the listener thread; beyond this they are dropped
+# rather than blocking the request that logged them
+LOG_QUEUE_SIZE = 10000
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting (including tracebacks) to the
+    listener thread; only the message arguments are merged on the caller.
+    """
+    
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+    
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+# Runs the real handlers on a background thread (see setup_logging)
+_log_listener = None
+
+
+def _stop_log_listener():
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+
+atexit.register(_stop_log_listener)
 
 
 def setup_logging():
@@ -46,19 +111,38 @@ def setup_logging():
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(StructuredFormatter())
-    root_logger.addHandler(console_handler)
     
     # File handler for errors
-    error_file_handler = logging.FileHandler(logs_dir / 'errors.log')
+    error_file_handler = logging.handlers.RotatingFileHandler(
+        logs_dir / 'errors.log', maxBytes=10 * 1024 * 1024, backupCount=5
+    )
     error_file_handler.setLevel(logging.ERROR)
     error_file_handler.setFormatter(StructuredFormatter())
-    root_logger.addHandler(error_file_handler)
     
     # File handler for all logs
-    debug_file_handler = logging.FileHandler(logs_dir / 'debug.log')
+    debug_file_handler = logging.handlers.RotatingFileHandler(
+        logs_dir / 'debug.log', maxBytes=10 * 1024 * 1024, backupCount=5
+    )
     debug_file_handler.setLevel(logging.DEBUG)
     debug_file_handler.setFormatter(StructuredFormatter())
-    root_logger.addHandler(debug_file_handler)
+    
+    # Request threads only enqueue records; one listener thread formats them
+    # and does the console and file I/O
+    global _log_listener
+    _stop_log_listener()
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    # The filter runs on the logging thread, so it sees that request's id
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+    root_logger.addHandler(queue_handler)
+    _log_listener = logging.handlers.QueueListener(
+        log_queue,
+        console_handler,
+        error_file_handler,
+        debug_file_handler,
+        respect_handler_level=True,
+    )
+    _log_listener.start()
     
     # Suppress noisy third-party loggers
     logging.getLogger('django.db.backends').setLevel(logging.WARNING)
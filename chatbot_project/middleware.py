@@ -4,21 +4,53 @@ Custom middleware for error handling and request logging.
 
 import logging
 import traceback
-from django.http import JsonResponse
+import uuid
+from django.http import HttpResponse
 from django.conf import settings
 import time
 
+from chatbot_app.json_utils import dumps as json_dumps
+from .logging_config import REQUEST_ID
+from .views import json_response
+
 
 logger = logging.getLogger(__name__)
 
 
+class RequestIdMiddleware:
+    """
+    Assigns each request an id for log correlation (the %(rid)s log field)
+    and returns it in the X-Request-ID header. Install it first.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        request_id = uuid.uuid4().hex
+        token = REQUEST_ID.set(request_id)
+        try:
+            response = self.get_response(request)
+        finally:
+            REQUEST_ID.reset(token)
+        response['X-Request-ID'] = request_id
+        return response
+
+
 class ErrorHandlingMiddleware:
     """
     Middleware to catch unhandled exceptions and return structured error responses.
     """
     
+    # Production error body; it never varies, so it is serialized once
+    PRODUCTION_ERROR_BODY = json_dumps({
+        'error': 'Internal Server Error',
+        'message': 'Sorry, something went wrong. Please try again later.',
+    })
+    
     def __init__(self, get_response):
         self.get_response = get_response
+        self._debug = settings.DEBUG
     
     def __call__(self, request):
         try:
@@ -27,14 +59,15 @@ class ErrorHandlingMiddleware:
         except Exception as exc:
             # Log the full exception with traceback
             logger.error(
-                f"Unhandled exception in {request.method} {request.path}: {str(exc)}",
+                "Unhandled exception in %s %s: %s",
+                request.method, request.path, exc,
                 exc_info=True
             )
             
             # Return user-friendly error response
-            if settings.DEBUG:
+            if self._debug:
                 # In debug mode, include detailed error information
-                return JsonResponse({
+                return json_response({
                     'error': 'Internal Server Error',
                     'message': str(exc),
                     'traceback': traceback.format_exc(),
@@ -43,11 +76,9 @@ class ErrorHandlingMiddleware:
                 }, status=500)
             else:
                 # In production, return generic error message
-                return JsonResponse({
-                    'error': 'Internal Server Error',
-                    'message': 'Sorry, something went wrong. Please try again later.',
-                    'request_id': id(request)
-                }, status=500)
+                return HttpResponse(
+                    self.PRODUCTION_ERROR_BODY, content_type='application/json', status=500
+                )
 
 
 class RequestLoggingMiddleware:
@@ -59,30 +90,30 @@ class RequestLoggingMiddleware:
         self.get_response = get_response
     
     def __call__(self, request):
-        start_time = time.time()
+        start_ns = time.perf_counter_ns()
         
         # Log request start
-        logger.info(f"Request started: {request.method} {request.path}")
+        logger.info("Request started: %s %s", request.method, request.path)
         
         try:
             response = self.get_response(request)
             
-            # Calculate duration
-            duration = (time.time() - start_time) * 1000  # Convert to milliseconds
+            # Calculate duration in milliseconds
+            duration_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
             
             # Log request completion
             logger.info(
-                f"Request completed: {request.method} {request.path} - "
-                f"Status: {response.status_code}, Duration: {duration:.2f}ms"
+                "Request completed: %s %s - Status: %d, Duration: %dms",
+                request.method, request.path, response.status_code, duration_ms
             )
             
             return response
             
         except Exception as exc:
-            duration = (time.time() - start_time) * 1000
+            duration_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
             logger.error(
-                f"Request failed: {request.method} {request.path} - "
-                f"Duration: {duration:.2f}ms, Error: {str(exc)}"
+                "Request failed: %s %s - Duration: %dms, Error: %s",
+                request.method, request.path, duration_ms, exc
             )
             raise
 
@@ -92,16 +123,22 @@ class SecurityHeadersMiddleware:
     Middleware to add security headers to responses.
     """
     
+    HEADERS = (
+        ('X-Content-Type-Options', 'nosniff'),
+        ('X-Frame-Options', 'DENY'),
+        ('X-XSS-Protection', '1; mode=block'),
+        ('Referrer-Policy', 'strict-origin-when-cross-origin'),
+    )
+    
     def __init__(self, get_response):
         self.get_response = get_response
+        self._headers = self.HEADERS
     
     def __call__(self, request):
         response = self.get_response(request)
         
         # Add security headers
-        response['X-Content-Type-Options'] = 'nosniff'
-        response['X-Frame-Options'] = 'DENY'
-        response['X-XSS-Protection'] = '1; mode=block'
-        response['Referrer-Policy'] = 'strict-origin-when-cross-origin'
+        for name, value in self._headers:
+            response[name] = value
         
         return response
@@ -2,17 +2,99 @@
 Enhanced monitoring middleware for request/response logging and metrics.
 """
 
+import collections
+import functools
 import logging
+import re
+import threading
 import time
 import psutil
+from django.core.exceptions import MiddlewareNotUsed
 from django.http import JsonResponse
 from django.utils import timezone
 from django.db import connection
 from chatbot_app.models import AIServiceUsage, SystemMetrics
 
+# Vectorized multi-pattern matching when Hyperscan is installed (Linux/macOS)
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
 logger = logging.getLogger(__name__)
 
 
+class LiteralScanner:
+    """
+    Case-insensitive search for any of a list of literal patterns in bytes.
+    Uses one Hyperscan database when available, else one compiled regex.
+    """
+    
+    def __init__(self, patterns):
+        self.patterns = [p.lower() for p in patterns]
+        self._db = None
+        if hyperscan is not None:
+            try:
+                db = hyperscan.Database()
+                db.compile(
+                    expressions=[re.escape(p).encode() for p in self.patterns],
+                    ids=list(range(len(self.patterns))),
+                    elements=len(self.patterns),
+                    flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH]
+                    * len(self.patterns),
+                )
+                self._db = db
+            except Exception as e:
+                logger.warning("Hyperscan compile failed, using re: %s", e)
+        self._re = re.compile(
+            b'|'.join(re.escape(p.encode()) for p in self.patterns), re.IGNORECASE
+        )
+    
+    def search(self, data):
+        """Return the first pattern found in `data` (lowercase), or None."""
+        if self._db is None:
+            match = self._re.search(data)
+            return match.group(0).decode().lower() if match else None
+        
+        hits = []
+        
+        def on_match(pattern_id, start, end, flags, context):
+            hits.append(pattern_id)
+            return True  # stop at the first hit
+        
+        try:
+            self._db.scan(data, match_event_handler=on_match)
+        except hyperscan.error:
+            # Terminating the scan from the callback is reported as an error
+            if not hits:
+                raise
+        return self.patterns[hits[0]] if hits else None
+
+
+def _client_ip(meta):
+    """Get the client IP address from request.META."""
+    x_forwarded_for = meta.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        # First hop is the client; partition avoids building a list
+        return x_forwarded_for.partition(',')[0].strip()
+    return meta.get('REMOTE_ADDR')
+
+
+@functools.lru_cache(maxsize=16)
+def _usage_row_id(service_name):
+    """Primary key of the AIServiceUsage row for a service (created on first use)."""
+    usage_record, created = AIServiceUsage.objects.get_or_create(
+        service_name=service_name,
+        defaults={
+            'model_used': 'unknown',
+            'request_count': 0,
+            'success_count': 0,
+            'error_count': 0,
+        }
+    )
+    return usage_record.pk
+
+
 class DetailedLoggingMiddleware:
     """
     Enhanced middleware for detailed request/response logging.
@@ -22,143 +104,167 @@ class DetailedLoggingMiddleware:
         self.get_response = get_response
     
     def __call__(self, request):
-        start_time = time.time()
+        start_ns = time.perf_counter_ns()
         
-        # Log request details
-        request_data = {
-            'method': request.method,
-            'path': request.path,
-            'ip': self.get_client_ip(request),
-            'user_agent': request.META.get('HTTP_USER_AGENT', 'Unknown')[:200],
-            'content_length': len(request.body) if hasattr(request, 'body') else 0,
-        }
-        
-        logger.info(f"Request started: {request_data}")
+        # Log request details; the body length comes from the header so the
+        # body is not read here
+        if logger.isEnabledFor(logging.INFO):
+            meta = request.META
+            logger.info("Request started: %s %s ip=%s user_agent=%.200s content_length=%s",
+                        request.method, request.path, _client_ip(meta),
+                        meta.get('HTTP_USER_AGENT', 'Unknown'), meta.get('CONTENT_LENGTH') or 0)
         
         try:
             response = self.get_response(request)
             
-            # Calculate duration
-            duration = (time.time() - start_time) * 1000
+            # Calculate duration in milliseconds
+            duration_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
             
             # Log response details
-            response_data = {
-                'status_code': response.status_code,
-                'duration_ms': round(duration, 2),
-                'response_size': len(response.content) if hasattr(response, 'content') else 0,
-            }
-            
-            logger.info(f"Request completed: {request_data['method']} {request_data['path']} - "
-                       f"Status: {response_data['status_code']}, Duration: {response_data['duration_ms']}ms")
+            logger.info("Request completed: %s %s - Status: %d, Duration: %dms",
+                        request.method, request.path, response.status_code, duration_ms)
             
             # Log AI service usage for chat requests
             if request.method == 'POST' and request.path == '/' and response.status_code == 200:
-                self._log_ai_service_usage(request, response, duration)
+                self._log_ai_service_usage(request, response, duration_ms)
             
             return response
             
         except Exception as e:
-            duration = (time.time() - start_time) * 1000
-            logger.error(f"Request failed: {request_data['method']} {request_data['path']} - "
-                        f"Duration: {duration:.2f}ms, Error: {str(e)}")
+            duration_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
+            logger.error("Request failed: %s %s - Duration: %dms, Error: %s",
+                         request.method, request.path, duration_ms, e)
             raise
     
-    def get_client_ip(self, request):
-        """Get the client IP address from the request."""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
-    
-    def _log_ai_service_usage(self, request, response, duration):
+    def _log_ai_service_usage(self, request, response, duration_ms):
         """Log AI service usage for monitoring."""
         try:
-            # Try to parse response to determine if fallback was used
-            if hasattr(response, 'content'):
-                import json
-                try:
-                    response_data = json.loads(response.content.decode('utf-8'))
-                    is_fallback = response_data.get('fallback', False)
-                    service_name = 'fallback' if is_fallback else 'gemini'  # Simplified detection
-                except:
-                    service_name = 'unknown'
-                    is_fallback = False
+            # Detect the fallback flag without parsing the whole reply
+            content = getattr(response, 'content', None)
+            if content and content.lstrip()[:1] == b'{':
+                is_fallback = b'"fallback": true' in content or b'"fallback":true' in content
+                service_name = 'fallback' if is_fallback else 'gemini'  # Simplified detection
             else:
                 service_name = 'unknown'
                 is_fallback = False
             
-            # Update or create AI service usage record
-            usage_record, created = AIServiceUsage.objects.get_or_create(
-                service_name=service_name,
-                defaults={
-                    'model_used': 'unknown',
-                    'request_count': 0,
-                    'success_count': 0,
-                    'error_count': 0,
-                }
-            )
-            
-            usage_record.update_usage(
-                success=response.status_code == 200,
-                response_time_ms=int(duration)
-            )
+            # One UPDATE per request; the row lookup/creation is cached
+            success = response.status_code == 200
+            usage_record = AIServiceUsage(pk=_usage_row_id(service_name))
+            if not usage_record.update_usage(success=success, response_time_ms=duration_ms):
+                # Row was deleted since it was cached
+                _usage_row_id.cache_clear()
+                usage_record = AIServiceUsage(pk=_usage_row_id(service_name))
+                usage_record.update_usage(success=success, response_time_ms=duration_ms)
             
         except Exception as e:
-            logger.warning(f"Failed to log AI service usage: {str(e)}")
+            logger.warning("Failed to log AI service usage: %s", e)
 
 
 class MetricsCollectionMiddleware:
     """
-    Middleware to collect system metrics periodically.
+    Starts a background thread that collects system metrics periodically.
+    Sampling happens off the request path, so the middleware removes itself
+    from the chain once the thread is running.
     """
     
+    metrics_interval = 300  # Collect metrics every 5 minutes
+    # Samples are written with one bulk_create once this many are buffered,
+    # or when flush_interval seconds have passed since the last write
+    flush_every = 16
+    flush_interval = 60
+    _sampler = None
+    _sampler_lock = threading.Lock()
+    
     def __init__(self, get_response):
-        self.get_response = get_response
-        self.last_metrics_time = time.time()
-        self.metrics_interval = 300  # Collect metrics every 5 minutes
+        with self._sampler_lock:
+            if MetricsCollectionMiddleware._sampler is None:
+                # Prime cpu_percent so later non-blocking calls report the
+                # usage since the previous sample
+                psutil.cpu_percent(interval=None)
+                MetricsCollectionMiddleware._sampler = threading.Thread(
+                    target=self._run_sampler, name='metrics-sampler', daemon=True
+                )
+                MetricsCollectionMiddleware._sampler.start()
+        raise MiddlewareNotUsed()
     
-    def __call__(self, request):
-        response = self.get_response(request)
-        
-        # Check if it's time to collect metrics
-        current_time = time.time()
-        if current_time - self.last_metrics_time >= self.metrics_interval:
-            self._collect_system_metrics()
-            self.last_metrics_time = current_time
-        
-        return response
+    def _run_sampler(self):
+        buffer = collections.deque(maxlen=128)
+        last_flush = time.monotonic()
+        while True:
+            time.sleep(self.metrics_interval)
+            try:
+                sample = self._collect_system_metrics()
+                if sample is not None:
+                    buffer.append(sample)
+                now = time.monotonic()
+                if buffer and (
+                    len(buffer) >= self.flush_every or now - last_flush >= self.flush_interval
+                ):
+                    self._flush_metrics(buffer)
+                    last_flush = now
+            finally:
+                # Don't hold a DB connection open between samples
+                connection.close()
+    
+    def _flush_metrics(self, buffer):
+        """Write buffered samples in one statement; kept for retry on failure."""
+        try:
+            SystemMetrics.objects.bulk_create(list(buffer), batch_size=64)
+            buffer.clear()
+        except Exception as e:
+            logger.error("Failed to store system metrics: %s", e)
+    
+    def _table_row_counts(self, tables):
+        """
+        Row counts per table. On PostgreSQL these are the planner's estimates
+        (O(1)); elsewhere, or for tables never analyzed, an exact COUNT(*).
+        """
+        counts = {}
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    "SELECT relname, reltuples::bigint FROM pg_class WHERE relname = ANY(%s)",
+                    [list(tables)]
+                )
+                counts = {name: rows for name, rows in cursor.fetchall() if rows >= 0}
+            
+            for table in tables:
+                if table not in counts:
+                    cursor.execute(f"SELECT COUNT(*) FROM {connection.ops.quote_name(table)}")
+                    counts[table] = cursor.fetchone()[0]
+        return counts
     
     def _collect_system_metrics(self):
-        """Collect and store system performance metrics."""
+        """Collect system performance metrics as an unsaved SystemMetrics row."""
         try:
             # Get system metrics
             memory_info = psutil.virtual_memory()
-            cpu_percent = psutil.cpu_percent(interval=1)
+            cpu_percent = psutil.cpu_percent(interval=None)
             
             # Get database metrics
-            with connection.cursor() as cursor:
-                cursor.execute("SELECT COUNT(*) FROM chatbot_app_chatsession")
-                active_sessions = cursor.fetchone()[0]
-                
-                cursor.execute("SELECT COUNT(*) FROM chatbot_app_chatmessage")
-                total_messages = cursor.fetchone()[0]
+            counts = self._table_row_counts(
+                ('chatbot_app_chatsession', 'chatbot_app_chatmessage')
+            )
+            active_sessions = counts['chatbot_app_chatsession']
+            total_messages = counts['chatbot_app_chatmessage']
             
-            # Store metrics
-            SystemMetrics.objects.create(
+            sample = SystemMetrics(
                 active_sessions=active_sessions,
                 total_messages=total_messages,
                 memory_usage_mb=memory_info.used / (1024 * 1024),
                 cpu_usage_percent=cpu_percent,
             )
             
-            logger.info(f"System metrics collected: {active_sessions} sessions, "
-                       f"{total_messages} messages, Memory: {memory_info.percent:.1f}%, "
-                       f"CPU: {cpu_percent:.1f}%")
+            logger.info("System metrics collected: %d sessions, %d messages, "
+                        "Memory: %.1f%%, CPU: %.1f%%",
+                        active_sessions, total_messages, memory_info.percent, cpu_percent)
             
         except Exception as e:
-            logger.error(f"Failed to collect system metrics: {str(e)}")
+            logger.error("Failed to collect system metrics: %s", e)
+            return None
+        
+        return sample
 
 
 class SecurityMonitoringMiddleware:
@@ -173,6 +279,18 @@ class SecurityMonitoringMiddleware:
             'eval(', 'exec(', 'system(', '__import__',
             'union select', 'drop table', 'insert into',
         ]
+        self.sensitive_patterns = [
+            'password', 'secret', 'token', 'api_key',
+            'private_key', 'database', 'admin'
+        ]
+        # One scan per body over all patterns. Bodies are matched as bytes, so
+        # they are never decoded or lowered.
+        self._suspicious_re = re.compile(
+            '|'.join(map(re.escape, self.suspicious_patterns)), re.IGNORECASE
+        )
+        self._suspicious_scanner = LiteralScanner(self.suspicious_patterns)
+        self._sensitive_scanner = LiteralScanner(self.sensitive_patterns)
+        self._error_re_b = re.compile(b'error', re.IGNORECASE)
     
     def __call__(self, request):
         # Monitor for suspicious activity
@@ -190,43 +308,31 @@ class SecurityMonitoringMiddleware:
     def _check_suspicious_content(self, request):
         """Check request content for suspicious patterns."""
         try:
-            content = request.body.decode('utf-8', errors='ignore').lower()
-            user_input = request.POST.get('user-input', '').lower()
+            pattern = self._suspicious_scanner.search(request.body)
+            if not pattern and request.content_type == 'application/x-www-form-urlencoded':
+                # URL-encoded form bodies hide the text from the raw scan; check the
+                # decoded field too (JSON and multipart bodies carry it verbatim)
+                match = self._suspicious_re.search(request.POST.get('user-input', ''))
+                pattern = match.group(0).lower() if match else None
             
-            for pattern in self.suspicious_patterns:
-                if pattern in content or pattern in user_input:
-                    ip = self.get_client_ip(request)
-                    logger.warning(f"Suspicious pattern detected from {ip}: {pattern}")
-                    
-                    # Could implement IP blocking here
-                    break
+            if pattern:
+                ip = _client_ip(request.META)
+                logger.warning("Suspicious pattern detected from %s: %s", ip, pattern)
+                
+                # Could implement IP blocking here
         except Exception as e:
-            logger.debug(f"Error checking suspicious content: {str(e)}")
+            logger.debug("Error checking suspicious content: %s", e)
     
     def _check_data_exposure(self, request, response):
         """Check response for potential data exposure."""
         try:
             if hasattr(response, 'content'):
-                content = response.content.decode('utf-8', errors='ignore').lower()
+                content = response.content
                 
-                # Check for potential sensitive data exposure
-                sensitive_patterns = [
-                    'password', 'secret', 'token', 'api_key',
-                    'private_key', 'database', 'admin'
-                ]
-                
-                for pattern in sensitive_patterns:
-                    if pattern in content and 'error' in content:
-                        logger.warning(f"Potential data exposure in response: {pattern}")
-                        break
+                # Check for potential sensitive data exposure (in error output)
+                if self._error_re_b.search(content):
+                    pattern = self._sensitive_scanner.search(content)
+                    if pattern:
+                        logger.warning("Potential data exposure in response: %s", pattern)
         except Exception as e:
-            logger.debug(f"Error checking data exposure: {str(e)}")
-    
-    def get_client_ip(self, request):
-        """Get the client IP address from the request."""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+            logger.debug("Error checking data exposure: %s", e)
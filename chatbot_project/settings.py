@@ -37,13 +37,77 @@ ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 # AI Service Configuration
 AI_TIMEOUT = 30.0
 AI_MAX_RETRIES = 3
+AI_TEMPERATURE = float(os.getenv("AI_TEMPERATURE", "0.7"))
+# Temperature for trivial prompts (short, single line, no code); defaults to
+# AI_TEMPERATURE. Set it to 0 to make their answers deterministic, which is
+# what the response caches replay (until their TTLs expire)
+AI_TRIVIAL_TEMPERATURE = float(os.getenv("AI_TRIVIAL_TEMPERATURE", str(AI_TEMPERATURE)))
+# Seconds to wait on a service before racing the next one (0 disables hedging)
+AI_HEDGE_DELAY = float(os.getenv("AI_HEDGE_DELAY", "0.8"))
 GEMINI_MODEL = "models/gemini-2.5-flash"
 OPENROUTER_GROQ_MODEL = "llama-3.1-8b-instant"
-GROQ_MODEL = "llama-3.1-8b-instant"
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
+# Cheaper model for trivial prompts, routing and extraction (used when it
+# differs from GROQ_MODEL, e.g. GROQ_MODEL=llama-3.3-70b-versatile)
+GROQ_FAST_MODEL = os.getenv("GROQ_FAST_MODEL", "llama-3.1-8b-instant")
 
 # AI Service Priority Configuration
 AI_PRIMARY_SERVICE = os.getenv("AI_PRIMARY_SERVICE", "groq")  # Default to Groq
 
+# Start a generalist answer while the router LLM decides (costs an extra call
+# whenever routing picks another agent)
+SPECULATIVE_GENERALIST = os.getenv("SPECULATIVE_GENERALIST", "False") == "True"
+
+# Route the message and extract graph entities in one LLM call
+COMBINED_PREFLIGHT = os.getenv("COMBINED_PREFLIGHT", "True") == "True"
+
+# Have the Reviewer sub-agent check every Coder answer (one extra LLM call)
+CODER_AUTO_REVIEW = os.getenv("CODER_AUTO_REVIEW", "False") == "True"
+
+# Semantic response cache (only used for temperature=0 answers, e.g. trivial
+# prompts with AI_TRIVIAL_TEMPERATURE=0); entries expire after the TTL
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_MAX_ENTRIES = 500
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+
+# Persistent (Chroma) cache of whole answers, checked before routing and
+# retrieval. Like the semantic cache it only stores successful, tool-free
+# temperature=0 answers, i.e. trivial prompts while AI_TRIVIAL_TEMPERATURE is 0;
+# with a non-zero AI_TRIVIAL_TEMPERATURE it stays empty
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "True") == "True"
+# Cosine distance: short prompts that differ in a name are often within 0.15
+RESPONSE_CACHE_MAX_DISTANCE = float(os.getenv("RESPONSE_CACHE_MAX_DISTANCE", "0.05"))
+RESPONSE_CACHE_MAX_ENTRIES = 1000
+# Seconds a cached answer may be replayed (it persists across restarts)
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+# In-process cache of verbatim repeats, checked before the Chroma cache
+EXACT_CACHE_TTL = int(os.getenv("EXACT_CACHE_TTL", "300"))
+
+# Views answer repeated short prompts from an in-process cache for this many
+# seconds (only tool-free, temperature=0 answers; 0 disables)
+ROUTE_CACHE_TTL = int(os.getenv("ROUTE_CACHE_TTL", "300"))
+
+# Run the memory embedder and reranker as int8 ONNX models (needs
+# optimum[onnxruntime]; exported on first start, FP32 fallback on failure)
+ONNX_INT8_MODELS = os.getenv("ONNX_INT8_MODELS", "False") == "True"
+
+# Answer concurrent temperature=0, tool-free calls to the same persona (the
+# sub-agent calls, e.g. CODER_AUTO_REVIEW reviews) with one batched LLM request
+LLM_COALESCE_REQUESTS = os.getenv("LLM_COALESCE_REQUESTS", "False") == "True"
+
+# With COMBINED_PREFLIGHT off, extract message and context entities with one
+# batched call instead of two parallel ones (fewer calls, not always faster)
+LLM_BATCH_EXTRACTION = os.getenv("LLM_BATCH_EXTRACTION", "False") == "True"
+
+# TLS certificate checks for the web_search / read_url tools (turn off only
+# for local environments with broken CA bundles)
+TOOLS_VERIFY_SSL = os.getenv("TOOLS_VERIFY_SSL", "True") == "True"
+
+# Exact-match LLM completion cache TTL in seconds (temperature=0 agent calls)
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "3600"))
+# Routing / entity-extraction prompts depend only on their input
+DETERMINISTIC_CACHE_TTL = int(os.getenv("DETERMINISTIC_CACHE_TTL", "86400"))
+
 
 # Validate at least one AI service is configured
 def validate_ai_services():
@@ -103,6 +167,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "chatbot_project.middleware.RequestIdMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "chatbot_project.monitoring.DetailedLoggingMiddleware",
@@ -198,10 +263,18 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # Rate limiting configuration
 RATE_LIMIT = 10  # requests per minute per IP
 
-# Cache configuration for rate limiting
+# Cache configuration for rate limiting and LLM response caching
 CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
         "LOCATION": "unique-snowflake",
     }
 }
+
+# Share the cache across workers when Redis is available
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    CACHES["default"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": REDIS_URL,
+    }
@@ -2,22 +2,52 @@
 System views for health checks and monitoring.
 """
 
+import functools
 import logging
-from django.http import JsonResponse
+import time
+from django.http import HttpResponse
 from django.db import connection
 from django.conf import settings
 from django.utils import timezone
 import os
 import psutil
 
+from chatbot_app.json_utils import dumps as json_dumps
+
 logger = logging.getLogger(__name__)
 
 
+def json_response(data, status=200):
+    """JSON HttpResponse serialized with orjson when available (datetimes allowed)."""
+    return HttpResponse(json_dumps(data), content_type="application/json", status=status)
+
+
+# Load balancers probe every few seconds; a healthy result is reused for
+# this long instead of re-running the DB and psutil checks
+HEALTH_CACHE_TTL = 2.0
+_health_cache = {"expires": 0.0, "data": None}
+
+
+# Environment variables are read once; they don't change while running
+REQUIRED_ENV_VARS = ("GEMINI_API_KEY",)
+MISSING_ENV_VARS = [var for var in REQUIRED_ENV_VARS if not os.getenv(var)]
+ENV_STATUS = "unhealthy" if MISSING_ENV_VARS else "healthy"
+
+
+@functools.lru_cache(maxsize=None)
+def _cpu_count():
+    return psutil.cpu_count()
+
+
 def health_check(request):
     """
     Health check endpoint for monitoring and load balancers.
     Returns system status including database connectivity.
     """
+    now = time.monotonic()
+    if _health_cache["data"] is not None and now < _health_cache["expires"]:
+        return json_response(_health_cache["data"])
+    
     try:
         # Check database connection
         with connection.cursor() as cursor:
@@ -27,15 +57,9 @@ def health_check(request):
         logger.error(f"Database health check failed: {str(e)}")
         db_status = "unhealthy"
     
-    # Check environment variables
-    env_status = "healthy"
-    missing_vars = []
-    required_vars = ["GEMINI_API_KEY"]
-    
-    for var in required_vars:
-        if not os.getenv(var):
-            env_status = "unhealthy"
-            missing_vars.append(var)
+    # Environment variables (checked at import)
+    env_status = ENV_STATUS
+    missing_vars = MISSING_ENV_VARS
     
     # System metrics
     try:
@@ -45,7 +69,7 @@ def health_check(request):
         system_metrics = {
             "memory_usage_percent": memory_info.percent,
             "disk_usage_percent": disk_info.percent,
-            "cpu_count": psutil.cpu_count(),
+            "cpu_count": _cpu_count(),
         }
     except Exception as e:
         logger.warning(f"Could not collect system metrics: {str(e)}")
@@ -56,7 +80,7 @@ def health_check(request):
     
     response_data = {
         "status": overall_status,
-        "timestamp": timezone.now().isoformat(),
+        "timestamp": timezone.now(),
         "version": "1.0.0",
         "checks": {
             "database": db_status,
@@ -70,17 +94,29 @@ def health_check(request):
     
     status_code = 200 if overall_status == "healthy" else 503
     
-    return JsonResponse(response_data, status=status_code)
+    # Only success is cached, so a recovery or failure shows up immediately
+    if status_code == 200:
+        _health_cache["data"] = response_data
+        _health_cache["expires"] = now + HEALTH_CACHE_TTL
+    
+    return json_response(response_data, status=status_code)
+
+
+SYSTEM_INFO_DISABLED_BODY = json_dumps({"error": "Not available in production"})
+
 
+def _system_info_disabled(request):
+    """system_info outside DEBUG: always a 404."""
+    return HttpResponse(
+        SYSTEM_INFO_DISABLED_BODY, content_type="application/json", status=404
+    )
 
-def system_info(request):
+
+def _system_info(request):
     """
     Detailed system information endpoint for debugging.
     Only available in DEBUG mode.
     """
-    if not settings.DEBUG:
-        return JsonResponse({"error": "Not available in production"}, status=404)
-    
     try:
         # Django settings info
         settings_info = {
@@ -100,15 +136,19 @@ def system_info(request):
             "content_type": request.content_type,
         }
         
-        return JsonResponse({
+        return json_response({
             "django_settings": settings_info,
             "request_info": request_info,
-            "timestamp": timezone.now().isoformat(),
+            "timestamp": timezone.now(),
         })
         
     except Exception as e:
         logger.error(f"System info endpoint failed: {str(e)}")
-        return JsonResponse({
+        return json_response({
             "error": "Failed to collect system information",
             "details": str(e) if settings.DEBUG else None
         }, status=500)
+
+
+# DEBUG is fixed for the life of the process, so the handler is chosen once
+system_info = _system_info if settings.DEBUG else _system_info_disabled
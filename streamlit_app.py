@@ -1,7 +1,20 @@
+import collections
+import hashlib
 import streamlit as st
 import requests
-import time
 import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+json_loads = orjson.loads if orjson is not None else json.loads
 
 # --- Configuration ---
 st.set_page_config(
@@ -11,68 +24,51 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
-# Custom CSS for SaaS look
-st.markdown(
-    """
-<style>
-    /* Global Font */
-    html, body, [class*="css"] {
-        font-family: 'Inter', sans-serif;
-    }
-    
-    /* Chat Message Container */
-    .stChatMessage {
-        background-color: transparent;
-        border: 1px solid rgba(255, 255, 255, 0.1);
-        border-radius: 12px;
-        padding: 1rem;
-        transition: all 0.3s ease;
-    }
-    
-    .stChatMessage:hover {
-        background-color: rgba(255, 255, 255, 0.05);
-        border-color: rgba(255, 255, 255, 0.2);
-    }
-    
-    /* User Message Bubble */
-    div[data-testid="stChatMessageContent"] {
-        background-color: transparent;
-    }
+# --- Constants ---
+BACKEND_URL = "http://127.0.0.1:8000"
+API_URL = f"{BACKEND_URL}/api/webhook/"
+# Static files are fetched by the viewer's browser, not by this server, so
+# deployments must point this at a URL browsers can reach
+STATIC_BASE_URL = os.getenv("STATIC_BASE_URL", f"{BACKEND_URL}/static").rstrip("/")
+# Streaming render batching (see read_stream)
+RENDER_EVERY = 8
+RENDER_INTERVAL = 0.05
+RESPONSE_CACHE_SIZE = 64
+# Messages rendered per turn; "Load earlier messages" shows this many more
+HISTORY_WINDOW = 20
+# Avatar per agent (others get 🤖)
+AVATARS = {
+    "coder": "👨‍💻",
+    "researcher": "🔍",
+    "reviewer": "🛡️",
+}
 
-    /* Sidebar Styling */
-    section[data-testid="stSidebar"] {
-        background-color: #0e1117;
-        border-right: 1px solid rgba(255, 255, 255, 0.1);
-    }
-    
-    /* Input Box */
-    .stChatInputContainer {
-        border-radius: 12px;
-        border: 1px solid rgba(255, 255, 255, 0.2);
-    }
-    
-    /* Buttons */
-    .stButton button {
-        border-radius: 8px;
-        font-weight: 600;
-        transition: transform 0.1s ease;
-    }
-    .stButton button:active {
-        transform: scale(0.98);
-    }
-    
-    /* Suggestion Buttons Styling */
-    .suggestion-btn {
-        margin-right: 10px;
-        margin-bottom: 10px;
-    }
-</style>
-""",
+# Custom CSS for SaaS look, served (and cached by the browser) as a Django
+# static file. Emitted on every rerun: Streamlit drops elements a run skips.
+st.markdown(
+    f'<link rel="stylesheet" href="{STATIC_BASE_URL}/chatbot_app/streamlit.css">',
     unsafe_allow_html=True,
 )
 
-# --- Constants ---
-API_URL = "http://127.0.0.1:8000/api/webhook/"
+
+# --- HTTP Session ---
+@st.cache_resource
+def get_session():
+    """Pooled keep-alive session, shared across script reruns."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=16,
+        max_retries=Retry(
+            total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504]
+        ),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+SESSION = get_session()
 
 # --- Session State ---
 if "messages" not in st.session_state:
@@ -83,6 +79,15 @@ if "next_prompt" not in st.session_state:
     st.session_state.next_prompt = None
 if "is_typing" not in st.session_state:
     st.session_state.is_typing = False
+if "stop_requested" not in st.session_state:
+    st.session_state.stop_requested = False
+if "partial_response" not in st.session_state:
+    st.session_state.partial_response = ""
+if "visible_window" not in st.session_state:
+    st.session_state.visible_window = HISTORY_WINDOW
+if "response_cache" not in st.session_state:
+    # LRU of recent answers, see response_cache_key
+    st.session_state.response_cache = collections.OrderedDict()
 
 # --- Top-Level Functions ---
 
@@ -102,16 +107,32 @@ def login():
                 st.error("Please enter valid credentials.")
 
 
+@st.cache_resource
+def get_cleanup_executor():
+    """Single worker that frees discarded chat histories off the script thread."""
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-cleanup")
+
+
+def clear_history():
+    # Swap in a new list; the old one is emptied (and its messages freed) by
+    # the cleanup worker instead of during this run
+    old = st.session_state.messages
+    st.session_state.messages = []
+    st.session_state.visible_window = HISTORY_WINDOW
+    if old:
+        get_cleanup_executor().submit(old.clear)
+
+
 def sidebar():
     with st.sidebar:
         st.title("🤖 Chat Settings")
         st.write(f"Logged in as: **{st.session_state.user_id}**")
         if st.button("Clear History"):
-            st.session_state.messages = []
+            clear_history()
             st.rerun()
         if st.button("Log Out"):
             st.session_state.user_id = None
-            st.session_state.messages = []
+            clear_history()
             st.rerun()
         st.markdown("---")
         st.markdown("### 📊 Agent Status")
@@ -124,40 +145,26 @@ def sidebar():
 def chat_interface():
     st.title("💬 Enterprise Assistant")
 
-    # Display chat history
-    for idx, message in enumerate(st.session_state.messages):
+    # Display chat history (the most recent messages; older ones on demand)
+    messages = st.session_state.messages
+    if len(messages) > st.session_state.visible_window:
+        st.button("⬆ Load earlier messages", on_click=load_earlier_messages)
+    for message in messages[-st.session_state.visible_window :]:
         with st.chat_message(message["role"], avatar=message.get("avatar")):
             st.markdown(message["content"])
 
             # --- RENDER CHARTS (Generative UI) ---
             if message.get("charts"):
-                for chart in message["charts"]:
-                    with st.expander(
-                        f"📊 {chart.get('title', 'Data View')}", expanded=True
-                    ):
-                        if chart.get("type") == "bar":
-                            st.bar_chart(chart["data"])
-                        elif chart.get("type") == "line":
-                            st.line_chart(chart["data"])
-                        elif chart.get("type") == "metric":
-                            cols = st.columns(len(chart["data"]))
-                            for i, (label, value) in enumerate(chart["data"].items()):
-                                cols[i].metric(label, value)
-
-    # Render Suggestions (only for the very last assistant message)
-    if (
-        st.session_state.messages
-        and st.session_state.messages[-1]["role"] == "assistant"
-    ):
-        last_msg = st.session_state.messages[-1]
+                render_charts(message["charts"])
+
+    # Render Suggestions (only for the very last assistant message); in a slot
+    # so they can be cleared once a new prompt is sent
+    suggestions_slot = st.empty()
+    if messages and messages[-1]["role"] == "assistant":
+        last_msg = messages[-1]
         if last_msg.get("suggestions"):
-            st.write("---")
-            st.caption("✨ Smart Suggestions")
-            cols = st.columns(len(last_msg["suggestions"]))
-            for i, suggestion in enumerate(last_msg["suggestions"]):
-                if cols[i].button(suggestion, key=f"sugg_btn_{i}"):
-                    st.session_state.next_prompt = suggestion
-                    st.rerun()
+            with suggestions_slot.container():
+                render_suggestions(last_msg["suggestions"], len(messages) - 1)
 
     # Handle Input or Suggestion
     prompt = st.chat_input("How can I help you today?")
@@ -166,6 +173,9 @@ def chat_interface():
         st.session_state.next_prompt = None
 
     if prompt:
+        suggestions_slot.empty()
+        cache_key = response_cache_key(prompt)
+
         # Add user message to history
         st.session_state.messages.append(
             {"role": "user", "content": prompt, "avatar": "👤"}
@@ -176,62 +186,229 @@ def chat_interface():
         # Get bot response
         with st.chat_message("assistant", avatar="🤖"):
             message_placeholder = st.empty()
-            full_response = ""
-
-            # Show a loading spinner while waiting for the backend
-            with st.spinner("Processing..."):
-                try:
-                    payload = {
-                        "message": prompt,
-                        "user_id": st.session_state.user_id,
-                        "platform": "streamlit",
-                    }
-                    response = requests.post(API_URL, json=payload, timeout=60)
-
-                    if response.status_code == 200:
-                        data = response.json()
-                        bot_text = data.get("response", "I didn't get a response.")
-                        agent = data.get("agent", "generalist")
-
-                        # Avatar mapping
-                        avatar_map = {
-                            "coder": "👨‍💻",
-                            "researcher": "🔍",
-                            "reviewer": "🛡️",
-                        }
-                        avatar = avatar_map.get(agent, "🤖")
-
-                        # Streaming loop with STOP support
-                        stop_col = st.columns([0.1, 0.9])
-                        stop_gen = stop_col[0].button("🛑 Stop")
-
-                        for chunk in bot_text.split(" "):
-                            if stop_gen:
-                                full_response += " ... [Stopped]"
-                                break
-                            full_response += chunk + " "
-                            time.sleep(0.02)
-                            message_placeholder.markdown(full_response + "▌")
-
-                        message_placeholder.markdown(full_response)
-                        st.caption(f"Agent: **{agent.title()}**")
-
-                        # Save Assistant response
-                        st.session_state.messages.append(
-                            {
-                                "role": "assistant",
-                                "content": full_response,
-                                "avatar": avatar,
-                                "agent": agent,
-                                "suggestions": data.get("suggestions", []),
-                                "charts": data.get("charts", []),
-                            }
-                        )
-                        st.rerun()
-                    else:
-                        st.error(f"Error: {response.status_code}")
-                except Exception as e:
-                    st.error(f"Connection Failed: {e}")
+
+            cache = st.session_state.response_cache
+            if cache_key in cache:
+                # Same prompt after the same recent history: replay the answer
+                cache.move_to_end(cache_key)
+                show_answer(message_placeholder, cache[cache_key])
+            else:
+                fetch_answer(message_placeholder, prompt, cache_key)
+
+        # The new answer is already on screen, so its suggestions are added in
+        # this run rather than by rerunning the whole script
+        messages = st.session_state.messages
+        if messages[-1]["role"] == "assistant" and messages[-1].get("suggestions"):
+            render_suggestions(messages[-1]["suggestions"], len(messages) - 1)
+
+
+def fetch_answer(placeholder, prompt, cache_key):
+    """Ask the backend for an answer to `prompt`, streaming it into `placeholder`."""
+    try:
+        payload = {
+            "message": prompt,
+            "user_id": st.session_state.user_id,
+            "platform": "streamlit",
+        }
+        st.session_state.stop_requested = False
+        st.session_state.partial_response = ""
+        # Show a loading spinner until the backend starts answering
+        with st.spinner("Processing..."):
+            response = SESSION.post(
+                API_URL,
+                params={"stream": "true"},
+                json=payload,
+                stream=True,
+                timeout=(5, 60),
+            )
+
+        with response:
+            if response.status_code == 200:
+                # Stop button; the callback flags the stream to stop and the
+                # rerun it triggers interrupts this run
+                stop_slot = st.empty()
+                with stop_slot.container():
+                    stop_col = st.columns([0.1, 0.9])
+                    stop_col[0].button("🛑 Stop", on_click=request_stop)
+
+                content_type = response.headers.get("Content-Type", "")
+                if content_type.startswith("text/event-stream"):
+                    data = read_stream(response, placeholder)
+                else:
+                    # Server without streaming support: one JSON reply
+                    data = response.json()
+                stop_slot.empty()
+
+                # Only complete, non-fallback answers are reused
+                if data.get("type", "final") == "final" and not data.get("fallback"):
+                    cache = st.session_state.response_cache
+                    cache[cache_key] = data
+                    if len(cache) > RESPONSE_CACHE_SIZE:
+                        cache.popitem(last=False)
+
+                show_answer(placeholder, data)
+            else:
+                st.error(f"Error: {response.status_code}")
+    except Exception as e:
+        st.error(f"Connection Failed: {e}")
+
+
+def set_next_prompt(prompt):
+    st.session_state.next_prompt = prompt
+
+
+def render_suggestions(suggestions, message_index):
+    st.write("---")
+    st.caption("✨ Smart Suggestions")
+    cols = st.columns(len(suggestions))
+    for i, suggestion in enumerate(suggestions):
+        # The callback sets the prompt before the rerun the click triggers
+        cols[i].button(
+            suggestion,
+            key=f"sugg_btn_{message_index}_{i}",
+            on_click=set_next_prompt,
+            args=(suggestion,),
+        )
+
+
+def response_cache_key(prompt):
+    """Key for a prompt given the last few messages before it."""
+    recent = [m["content"] for m in st.session_state.messages[-6:]]
+    raw = json.dumps([st.session_state.user_id] + recent + [prompt])
+    return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+
+def show_answer(placeholder, data):
+    """Render a backend answer (and its charts) and save it to the history."""
+    full_response = data.get("response") or "I didn't get a response."
+    agent = data.get("agent", "generalist")
+
+    avatar = AVATARS.get(agent, "🤖")
+
+    placeholder.markdown(full_response)
+    if data.get("charts"):
+        render_charts(data["charts"])
+    st.caption(f"Agent: **{agent.title()}**")
+
+    # Save Assistant response; suggestions/charts are rare, so the keys are
+    # only stored when present (readers use .get)
+    message = {
+        "role": "assistant",
+        "content": full_response,
+        "avatar": avatar,
+        "agent": agent,
+    }
+    for key in ("suggestions", "charts"):
+        if data.get(key):
+            message[key] = data[key]
+    st.session_state.messages.append(message)
+
+
+def load_earlier_messages():
+    st.session_state.visible_window += HISTORY_WINDOW
+
+
+def render_charts(charts):
+    for chart in charts:
+        with st.expander(f"📊 {chart.get('title', 'Data View')}", expanded=True):
+            renderer = CHART_RENDERERS.get(chart.get("type"))
+            if renderer:
+                renderer(chart)
+
+
+def render_metric(chart):
+    cols = st.columns(len(chart["data"]))
+    for i, (label, value) in enumerate(chart["data"].items()):
+        cols[i].metric(label, value)
+
+
+CHART_RENDERERS = {
+    "bar": lambda chart: st.bar_chart(chart_frame(chart)),
+    "line": lambda chart: st.line_chart(chart_frame(chart)),
+    "metric": render_metric,
+}
+
+
+def chart_frame(chart):
+    """
+    DataFrame for a chart's data. Built on first render and kept on the chart
+    (in session state), so reruns reuse it; pandas is only imported for
+    conversations that have charts.
+    """
+    frame = chart.get("_df")
+    if frame is None:
+        import pandas as pd
+
+        data = chart["data"]
+        if isinstance(data, dict) and not any(
+            isinstance(v, (list, dict)) for v in data.values()
+        ):
+            # {"Label": value, ...}: one bar/point per label
+            frame = pd.DataFrame.from_dict(data, orient="index", columns=["value"])
+        else:
+            frame = pd.DataFrame(data)
+        chart["_df"] = frame
+    return frame
+
+
+def request_stop():
+    """
+    Stop button callback. Runs before the rerun that interrupts the stream,
+    so the text received so far is saved here; leaving the `with response:`
+    block closes the connection and the backend stops generating.
+    """
+    st.session_state.stop_requested = True
+    if st.session_state.partial_response:
+        st.session_state.messages.append(
+            {
+                "role": "assistant",
+                "content": st.session_state.partial_response + " ... [Stopped]",
+                "avatar": "🤖",
+            }
+        )
+        st.session_state.partial_response = ""
+
+
+def read_stream(response, placeholder):
+    """
+    Render a Server-Sent Events answer as it arrives.
+    `delta` events are appended to the placeholder; the `final` event (the
+    post-processed answer) is returned. An `error` event is shown and its
+    fallback answer returned. A requested stop closes the response.
+    """
+    full_response = ""
+    # Re-render at most every RENDER_EVERY deltas or RENDER_INTERVAL seconds
+    pending = 0
+    last_render = time.monotonic()
+    # Lines stay bytes; only `data:` payloads are parsed (orjson if installed)
+    for line in response.iter_lines():
+        if line[:6] != b"data: ":
+            continue
+        event = json_loads(line[6:])
+        kind = event.get("type")
+        if kind == "delta":
+            if st.session_state.stop_requested:
+                response.close()
+                st.session_state.partial_response = ""
+                return {"type": "stopped", "response": full_response + " ... [Stopped]"}
+            full_response += event.get("content", "")
+            pending += 1
+            now = time.monotonic()
+            if pending >= RENDER_EVERY or now - last_render >= RENDER_INTERVAL:
+                placeholder.markdown(full_response + "▌")
+                st.session_state.partial_response = full_response
+                pending = 0
+                last_render = now
+        elif kind == "final":
+            st.session_state.partial_response = ""
+            return event
+        elif kind == "error":
+            st.session_state.partial_response = ""
+            st.error(f"Error: {event.get('error')}")
+            return event
+    # Stream ended without a final event
+    st.session_state.partial_response = ""
+    return {"type": "incomplete", "response": full_response}
 
 
 # --- Main App Logic ---
@@ -4,13 +4,15 @@ Startup validation script for the chatbot application.
 Validates environment, dependencies, and system requirements before starting the server.
 """
 
+import importlib.metadata
 import os
+import re
 import sys
 import logging
-import subprocess
 from pathlib import Path
 import sqlite3
-from django.core.management import execute_from_command_line
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # Configure basic logging for startup validation
 logging.basicConfig(
@@ -20,8 +22,6 @@ logging.basicConfig(
     encoding="utf-8",  # Use utf-8 encoding for file handlers if added, though console might still issue
 )
 # Force console encoding to be safe
-import sys
-
 if sys.platform == "win32":
     sys.stdout.reconfigure(encoding="utf-8")
     sys.stderr.reconfigure(encoding="utf-8")
@@ -29,6 +29,11 @@ if sys.platform == "win32":
 logger = logging.getLogger(__name__)
 
 
+def _normalize_dist_name(name):
+    """Normalize a distribution name for comparison (PEP 503)."""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
 class StartupValidator:
     """Validates system requirements and configuration before startup."""
 
@@ -36,12 +41,22 @@ class StartupValidator:
         self.base_dir = Path(__file__).resolve().parent
         self.errors = []
         self.warnings = []
+        # Independent checks run on a thread pool (see run_all_validations)
+        self._lock = threading.Lock()
+
+    def _add_error(self, message):
+        with self._lock:
+            self.errors.append(message)
+
+    def _add_warning(self, message):
+        with self._lock:
+            self.warnings.append(message)
 
     def validate_python_version(self):
         """Check if Python version meets requirements."""
         version = sys.version_info
         if version.major < 3 or (version.major == 3 and version.minor < 8):
-            self.errors.append(
+            self._add_error(
                 f"Python 3.8+ required. Current version: {version.major}.{version.minor}.{version.micro}"
             )
             return False
@@ -54,24 +69,28 @@ class StartupValidator:
         """Check if .env file exists and contains required variables."""
         env_file = self.base_dir / ".env"
         if not env_file.exists():
-            self.errors.append(
+            self._add_error(
                 ".env file not found. Please create it with required environment variables."
             )
             return False
 
-        # Load and check required environment variables
+        # Collect the defined keys in one pass, then check required variables
+        defined = set()
         with open(env_file, "r") as f:
-            env_content = f.read()
+            for line in f:
+                line = line.lstrip()
+                if not line or line.startswith("#"):
+                    continue
+                key, sep, _ = line.partition("=")
+                if sep:
+                    key = key.strip()
+                    defined.add(key[7:].lstrip() if key.startswith("export ") else key)
 
         required_vars = ["GROQ_API_KEY"]
-        missing_vars = []
-
-        for var in required_vars:
-            if f"{var}=" not in env_content:
-                missing_vars.append(var)
+        missing_vars = [var for var in required_vars if var not in defined]
 
         if missing_vars:
-            self.errors.append(
+            self._add_error(
                 f"Missing required environment variables: {', '.join(missing_vars)}"
             )
             return False
@@ -84,7 +103,7 @@ class StartupValidator:
         requirements_file = self.base_dir / "requirements.txt"
 
         if not requirements_file.exists():
-            self.errors.append("requirements.txt not found")
+            self._add_error("requirements.txt not found")
             return False
 
         try:
@@ -93,39 +112,22 @@ class StartupValidator:
 
             logger.info(f"[OK] Django version: {django.get_version()}")
         except ImportError:
-            self.errors.append("Django is not installed")
+            self._add_error("Django is not installed")
             return False
 
-        # Check other critical dependencies
-        # Map package name to import name
-        critical_deps = {
-            "google-genai": "google.genai",
-            "python-dotenv": "dotenv",
-            "whitenoise": "whitenoise",
+        # Check other critical dependencies by installed distribution
+        # metadata, without importing them (google-genai pulls in protobuf/gRPC)
+        installed = {
+            _normalize_dist_name(dist.metadata["Name"] or "")
+            for dist in importlib.metadata.distributions()
         }
-        missing_deps = []
-
-        for pkg, module in critical_deps.items():
-            try:
-                # specific check for google-genai which might be a namespace package
-                if pkg == "google-genai":
-                    import google.genai
-                else:
-                    __import__(module)
-            except ImportError:
-                # Fallback for google-genai old versions or if it's installed differently
-                if pkg == "google-genai":
-                    try:
-                        import google_genai
-                    except ImportError:
-                        missing_deps.append(pkg)
-                else:
-                    missing_deps.append(pkg)
+        critical_deps = ["google-genai", "python-dotenv", "whitenoise"]
+        missing_deps = [
+            pkg for pkg in critical_deps if _normalize_dist_name(pkg) not in installed
+        ]
 
         if missing_deps:
-            self.errors.append(
-                f"Missing critical dependencies: {', '.join(missing_deps)}"
-            )
+            self._add_error(f"Missing critical dependencies: {', '.join(missing_deps)}")
             return False
 
         logger.info("✓ Dependencies validation passed")
@@ -135,19 +137,26 @@ class StartupValidator:
         """Check if database is accessible and properly configured."""
         db_path = self.base_dir / "db.sqlite3"
 
+        if not db_path.exists():
+            self._add_warning(
+                "db.sqlite3 not found. Run 'python manage.py migrate' first."
+            )
+            return True
+
         try:
-            # Test database connection
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-            tables = cursor.fetchall()
-            conn.close()
-
-            logger.info(f"[OK] Database accessible. Found {len(tables)} tables")
+            # Test database connection; read-only, and the schema version is
+            # read from the file header instead of scanning sqlite_master
+            conn = sqlite3.connect(f"{db_path.as_uri()}?mode=ro", uri=True)
+            try:
+                version = conn.execute("PRAGMA schema_version").fetchone()[0]
+            finally:
+                conn.close()
+
+            logger.info(f"[OK] Database accessible (schema_version={version})")
             return True
 
         except sqlite3.Error as e:
-            self.errors.append(f"Database validation failed: {str(e)}")
+            self._add_error(f"Database validation failed: {str(e)}")
             return False
 
     def validate_static_files(self):
@@ -155,7 +164,7 @@ class StartupValidator:
         staticfiles_dir = self.base_dir / "staticfiles"
 
         if not staticfiles_dir.exists():
-            self.warnings.append(
+            self._add_warning(
                 "staticfiles directory not found. Run 'python manage.py collectstatic' first."
             )
             return False
@@ -181,35 +190,47 @@ class StartupValidator:
             return True
 
         except Exception as e:
-            self.errors.append(f"Django system checks failed: {str(e)}")
+            self._add_error(f"Django system checks failed: {str(e)}")
             return False
 
     def validate_port_availability(self, port=8000):
         """Check if the specified port is available."""
         import socket
 
-        try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.bind(("127.0.0.1", port))
-            logger.info(f"[OK] Port {port} is available")
-            return True
-        except socket.error:
-            self.warnings.append(f"Port {port} appears to be in use by another process")
+        # Probe with connect rather than bind: a port left in TIME_WAIT by a
+        # previous server isn't reported as busy, and SO_REUSEADDR semantics
+        # (which differ on Windows) don't matter
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.settimeout(0.1)
+            try:
+                s.connect(("127.0.0.1", port))
+                in_use = True  # something is listening
+            except OSError:
+                in_use = False
+
+        if in_use:
+            self._add_warning(f"Port {port} appears to be in use by another process")
             return False
+        logger.info(f"[OK] Port {port} is available")
+        return True
 
     def run_all_validations(self):
         """Run all validation checks."""
         logger.info("Starting startup validation...")
 
-        validations = [
-            self.validate_python_version(),
-            self.validate_environment_file(),
-            self.validate_dependencies(),
-            self.validate_database(),
-            self.validate_static_files(),
-            self.run_django_checks(),
-            self.validate_port_availability(),
+        # The I/O-bound checks are independent, so they run concurrently;
+        # Django checks run afterwards since django.setup() changes global state
+        checks = [
+            self.validate_python_version,
+            self.validate_environment_file,
+            self.validate_dependencies,
+            self.validate_database,
+            self.validate_static_files,
+            self.validate_port_availability,
         ]
+        with ThreadPoolExecutor(max_workers=len(checks)) as executor:
+            validations = list(executor.map(lambda check: check(), checks))
+        validations.append(self.run_django_checks())
 
         all_passed = all(validations)
 
@@ -238,6 +259,8 @@ def main():
     validator = StartupValidator()
 
     if validator.run_all_validations():
+        from django.core.management import execute_from_command_line
+
         logger.info("Starting Django development server...")
         # Start the server if validation passes
         execute_from_command_line(["manage.py", "runserver", "127.0.0.1:8000"])